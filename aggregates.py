@@ -0,0 +1,214 @@
+import threading
+
+import pandas as pd
+
+from dimensions import concat_frames
+from filter_index import MonthIndex, sort_by_month, normalize_filters, filter_frame
+from material_combos import Combinations, rank_by_name
+from memo_cache import ByteLRUCache
+from parallel_agg import POSITION_COLUMN, partition_frames, map_partitions, parallel_groupby
+
+# 立方体的维度和可加指标（只保留数据中存在的列）
+CUBE_DIMENSIONS = ['发运月份', '所属区域', '省份', '城市', '经销商名称', '客户代码', '申请人']
+CUBE_MEASURES = ['物料数量', '物料总成本', '销售总额', '求和项:数量（箱）']
+
+# 物料与销售数据的关联键
+LINK_KEYS = ['发运月份', '客户代码']
+
+# 多进程构建时的分区列：客户代码是立方体维度和关联键之一，每个分组和关联单元只落在一个分区
+PARTITION_COLUMN = '客户代码'
+
+# 聚合存储中筛选结果缓存的字节预算
+STORE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+# 按最细粒度预聚合的指标立方体：每个维度组合一行，列名与原始数据相同
+# 缺失的维度值保留为单独的组，汇总时与原始数据一样被排除；结果按发运月份排序，可以用月份偏移索引切片
+# workers>1时按客户代码分区在进程池中汇总，结果（包括行顺序）与单进程相同
+def build_cube(df, dimensions=CUBE_DIMENSIONS, measures=CUBE_MEASURES, workers=None):
+    dims = [column for column in dimensions if column in df.columns]
+    values = [column for column in measures if column in df.columns]
+    if workers and workers > 1 and PARTITION_COLUMN in dims:
+        cube = parallel_groupby(df, dims, {value: (value, 'sum') for value in values}, PARTITION_COLUMN,
+                                workers=workers, dropna=False, sort=False)
+    else:
+        cube = df.groupby(dims, observed=True, dropna=False, sort=False)[values].sum().reset_index()
+    return sort_by_month(cube)
+
+
+def _link_cells(df_material, df_sales, positions=False):
+    material_aggs = {'物料数量': ('物料数量', 'sum'), '物料行数': ('物料数量', 'size')}
+    sales_aggs = {
+        '求和项:数量（箱）': ('求和项:数量（箱）', 'sum'),
+        '销售总额': ('销售总额', 'sum'),
+        '销售行数': ('销售总额', 'size')
+    }
+    if positions:
+        # 分区计算时记录每组在原数据中的首行，合并后按它恢复单进程计算的行顺序
+        material_aggs['物料首行'] = (POSITION_COLUMN, 'min')
+        sales_aggs['销售首行'] = (POSITION_COLUMN, 'min')
+    material = df_material.groupby(
+        LINK_KEYS + ['所属区域', '省份', '物料代码', '物料名称'], observed=True, dropna=False, sort=False
+    ).agg(**material_aggs).reset_index()
+    sales = df_sales.groupby(
+        LINK_KEYS + ['所属区域', '省份', '产品代码', '产品名称'], observed=True, dropna=False, sort=False
+    ).agg(**sales_aggs).reset_index()
+
+    cells = pd.merge(material, sales, on=LINK_KEYS, how='inner', suffixes=('', '_销售'))
+    # 物料侧每行与销售侧每行各组成一条关联记录
+    cells['物料数量'] = cells['物料数量'] * cells['销售行数']
+    cells['求和项:数量（箱）'] = cells['求和项:数量（箱）'] * cells['物料行数']
+    cells['销售总额'] = cells['销售总额'] * cells['物料行数']
+    cells['关联行数'] = cells['物料行数'] * cells['销售行数']
+    return cells.drop(columns=['物料行数', '销售行数'])
+
+
+def _link_partition(df_material, df_sales):
+    return _link_cells(df_material, df_sales, positions=True)
+
+
+# 物料与销售按(发运月份, 客户代码)关联后的汇总单元
+# 两侧先各自按维度汇总再关联，每个单元的指标等于逐行关联后对应行的合计，但不展开多对多的行
+# 两侧的区域和省份都保留（销售侧加"_销售"后缀），筛选时两侧都要满足，与先筛选再关联一致
+# workers>1时两张表按客户代码的哈希切分到相同的分区，各分区在进程池中独立关联后拼接
+def build_link_cells(df_material, df_sales, workers=None):
+    if workers and workers > 1:
+        parts = partition_frames([df_material, df_sales], PARTITION_COLUMN, workers)
+        pieces = map_partitions(_link_partition, parts, workers)
+        if pieces:
+            # 与pd.merge的inner关联顺序一致：按物料侧分组顺序，同一物料分组内按销售侧分组顺序
+            cells = pd.concat(pieces, ignore_index=True).sort_values(
+                ['物料首行', '销售首行'], kind='stable', ignore_index=True).drop(columns=['物料首行', '销售首行'])
+            return sort_by_month(cells)
+    return sort_by_month(_link_cells(df_material, df_sales))
+
+
+def _with_ratios(metrics):
+    metrics['费比'] = (metrics['物料总成本'] / metrics['销售总额']) * 100
+    metrics['物料单位效益'] = metrics['销售总额'] / metrics['物料数量']
+    return metrics
+
+
+# 聚合存储：加载时构建物料立方体、销售立方体和物料-销售关联单元，按筛选条件汇总出各类指标
+# 筛选结果按条件缓存；追加新月份的数据时只为新月份构建单元并拼接，不重建已有月份
+# workers>1时立方体和关联单元按客户代码分区并行构建
+class AggregationStore:
+    def __init__(self, df_material, df_sales, cache_max_bytes=STORE_CACHE_MAX_BYTES, workers=None):
+        self._lock = threading.RLock()
+        self._cache = ByteLRUCache(max_bytes=cache_max_bytes)
+        self.workers = workers
+        self.version = 0
+        self.tables = {}
+        self._month_indexes = {}
+        self._set_tables(self._build(df_material, df_sales))
+
+    def _build(self, df_material, df_sales):
+        return {
+            'material': build_cube(df_material, workers=self.workers),
+            'sales': build_cube(df_sales, workers=self.workers),
+            'link': build_link_cells(df_material, df_sales, workers=self.workers)
+        }
+
+    def _set_tables(self, tables):
+        with self._lock:
+            self.tables = tables
+            self._month_indexes = {name: MonthIndex(table) for name, table in tables.items()}
+            self.version += 1
+            self._cache.clear()
+
+    @property
+    def months(self):
+        return set(self.tables['material']['发运月份'].dropna()) | set(self.tables['sales']['发运月份'].dropna())
+
+    # 新数据的月份与同一张表已有的月份重叠时报错，避免同一月份重复计入
+    # 物料和销售分别检查（与append_segment按文件检查一致），已有销售数据的月份仍可以追加物料数据
+    def check_new_months(self, new_material, new_sales):
+        problems = []
+        for name, new in (('material', new_material), ('sales', new_sales)):
+            overlap = set(new['发运月份'].dropna()) & set(self.tables[name]['发运月份'].dropna())
+            if overlap:
+                months = ', '.join(sorted(month.strftime('%Y-%m') for month in overlap))
+                problems.append(f"{'物料' if name == 'material' else '销售'}数据: {months}")
+        if problems:
+            raise ValueError("月份已存在于聚合数据中: " + '；'.join(problems))
+
+    # 追加新月份的原始数据（只包含新增的行），由MaterialAnalytics.append调用，与明细和关联索引一起更新
+    def append(self, new_material, new_sales):
+        self.check_new_months(new_material, new_sales)
+
+        additions = self._build(new_material, new_sales)
+        with self._lock:
+            tables = {name: sort_by_month(concat_frames([self.tables[name], additions[name]]))
+                      for name in self.tables}
+            self._set_tables(tables)
+
+    def _cached(self, key, compute):
+        with self._lock:
+            version = self.version
+        return self._cache.get_or_compute((version,) + key, compute)
+
+    # 筛选后的单元（material/sales立方体或link关联单元），结果共享，调用方不能原地修改
+    def cells(self, name, regions=None, provinces=None, start_date=None, end_date=None):
+        filters = normalize_filters(regions, provinces, start_date, end_date)
+        table = self.tables[name]
+        if filters == (None, None, None):
+            return table
+
+        if name == 'link':
+            columns = {'region_columns': ('所属区域', '所属区域_销售'), 'province_columns': ('省份', '省份_销售')}
+        else:
+            columns = {}
+        month_index = self._month_indexes[name]
+        return self._cached(('cells', name) + filters, lambda: filter_frame(
+            table, month_index, regions, provinces, start_date, end_date, **columns))
+
+    # 按维度汇总物料和销售指标并合并，how与pd.merge相同
+    def metrics(self, by, material_measures, sales_measures, regions=None, provinces=None, start_date=None,
+                end_date=None, how='outer'):
+        material = self.cells('material', regions, provinces, start_date, end_date).groupby(
+            by, observed=True).agg({measure: 'sum' for measure in material_measures}).reset_index()
+        sales = self.cells('sales', regions, provinces, start_date, end_date).groupby(
+            by, observed=True).agg({measure: 'sum' for measure in sales_measures}).reset_index()
+        return pd.merge(material, sales, on=by, how=how)
+
+    # 物料-产品关联度量
+    def material_product_corr(self, regions=None, provinces=None, start_date=None, end_date=None):
+        links = self.cells('link', regions, provinces, start_date, end_date)
+        corr = links.groupby(['物料代码', '物料名称', '产品代码', '产品名称'], observed=True).agg({
+            '物料数量': 'sum',
+            '求和项:数量（箱）': 'sum',
+            '销售总额': 'sum'
+        }).reset_index()
+        corr['关联强度'] = corr['销售总额'] / corr['物料数量']
+        return corr
+
+    # 物料组合效益：每个客户每月使用的物料代码组合及其关联销售额
+    def material_combo_performance(self, regions=None, provinces=None, start_date=None, end_date=None):
+        links = self.cells('link', regions, provinces, start_date, end_date)
+        combinations = Combinations(links, ['客户代码', '发运月份'], '物料代码')
+        sales = combinations.group_values(links['销售总额'], 'sum')
+        performance = combinations.combo_stats(sales, ['mean', 'sum', 'count'])
+        performance.columns = ['平均销售额', '总销售额', '使用次数']
+        return rank_by_name(performance.reset_index(drop=True), combinations.names(performance.index, ','),
+                            '平均销售额')
+
+    # 兼容原来的聚合字典：按名称取未筛选的汇总表
+    def __getitem__(self, name):
+        full = ['物料数量', '物料总成本'], ['求和项:数量（箱）', '销售总额']
+        if name == 'region_metrics':
+            return _with_ratios(self.metrics('所属区域', *full))
+        if name == 'province_metrics':
+            return _with_ratios(self.metrics('省份', *full))
+        if name == 'customer_metrics':
+            return _with_ratios(self.metrics(['客户代码', '经销商名称'], *full))
+        if name == 'time_metrics':
+            return _with_ratios(self.metrics('发运月份', *full))
+        if name == 'salesperson_metrics':
+            metrics = self.metrics('申请人', ['物料总成本'], ['销售总额'], how='inner')
+            metrics['费比'] = (metrics['物料总成本'] / metrics['销售总额']) * 100
+            return metrics
+        if name == 'material_product_corr':
+            return self.material_product_corr()
+        if name == 'material_combo_performance':
+            return self.material_combo_performance()
+        raise KeyError(name)
@@ -0,0 +1,184 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# 每条响应曲线对应的(客户, 物料)
+PAIR_COLUMNS = ['客户代码', '经销商名称', '物料代码', '物料名称']
+
+# 响应曲线 销售额 = 规模系数 × 月投入^弹性 的弹性：数据不足以估计时使用默认值，估计值限制在区间内（边际收益递减）
+DEFAULT_ELASTICITY = 0.5
+ELASTICITY_BOUNDS = (0.1, 0.9)
+# 估计某种物料的弹性至少需要的有效月度单元数
+MIN_ELASTICITY_CELLS = 8
+# 每个组合的建议月投入不超过历史月均投入的倍数：响应曲线只在历史投入附近可信，不向远处外推
+SPEND_CAP_MULTIPLE = 3.0
+
+
+# 各(客户, 物料)的边际收益递减响应曲线：月投入x元时的预计月销售额为 scale × x^elasticity
+# elasticity按物料估计（同一物料的客户共用），scale按客户-物料对校准到历史水平
+@dataclass
+class ResponseCurves:
+    pairs: pd.DataFrame
+    material_ids: np.ndarray
+    scale: np.ndarray
+    elasticity: np.ndarray  # 每种物料一个值，按material_ids索引
+    unit_price: np.ndarray
+    current_spend: np.ndarray  # 历史月均投入
+
+    # 每个组合的月投入上限：历史月均投入的SPEND_CAP_MULTIPLE倍，至少可以投放一件
+    @property
+    def spend_cap(self) -> np.ndarray:
+        return np.maximum(self.current_spend * SPEND_CAP_MULTIPLE, self.unit_price)
+
+    def predict(self, spend: np.ndarray) -> np.ndarray:
+        return self.scale * np.power(spend, self.elasticity[self.material_ids])
+
+
+# 同一(客户, 物料)内去均值后的对数回归斜率：月投入变化1%时销售额变化的百分比
+def _elasticities(pair_ids, material_of_pair, n_materials, spend, sales):
+    valid = (spend > 0) & (sales > 0)
+    log_spend = pd.Series(np.log(spend[valid]))
+    log_sales = pd.Series(np.log(sales[valid]))
+    ids = pair_ids[valid]
+    dx = (log_spend - log_spend.groupby(ids).transform('mean')).to_numpy()
+    dy = (log_sales - log_sales.groupby(ids).transform('mean')).to_numpy()
+    materials = material_of_pair[ids]
+
+    sxx = np.bincount(materials, weights=dx * dx, minlength=n_materials)
+    sxy = np.bincount(materials, weights=dx * dy, minlength=n_materials)
+    cells = np.bincount(materials, minlength=n_materials)
+    elasticity = np.full(n_materials, DEFAULT_ELASTICITY)
+    fitted = (cells >= MIN_ELASTICITY_CELLS) & (sxx > 1e-12)
+    elasticity[fitted] = sxy[fitted] / sxx[fitted]
+    return np.clip(elasticity, *ELASTICITY_BOUNDS)
+
+
+# 由归因后的月度物料单元（attribute_sales的结果，需要PAIR_COLUMNS、发运月份、物料总成本和销售总额）拟合响应曲线
+# unit_prices: {物料代码: 单价（元）}，没有单价的物料不参与分配
+def fit_response_curves(attributed: pd.DataFrame, unit_prices) -> ResponseCurves:
+    cells = attributed[attributed['物料总成本'] > 0]
+    grouped = cells.groupby(PAIR_COLUMNS, observed=True, sort=False)
+    pair_ids = grouped.ngroup().to_numpy()
+    pairs = grouped.size().reset_index()[PAIR_COLUMNS]
+    n_months = max(cells['发运月份'].nunique(), 1)
+
+    material_ids, materials = pd.factorize(pairs['物料代码'].astype(str))
+    prices = pd.Series(unit_prices, dtype=float)
+    prices.index = prices.index.astype(str)
+    unit_price = prices.reindex(materials).to_numpy()[material_ids]
+
+    spend = cells['物料总成本'].to_numpy(dtype=np.float64)
+    sales = cells['销售总额'].to_numpy(dtype=np.float64)
+    elasticity = _elasticities(pair_ids, material_ids, len(materials), spend, sales)
+
+    # 规模系数使曲线在该客户-物料的历史月度单元上的预计合计等于实际合计
+    powered = np.power(spend, elasticity[material_ids[pair_ids]])
+    scale = np.bincount(pair_ids, weights=sales, minlength=len(pairs)) / np.bincount(
+        pair_ids, weights=powered, minlength=len(pairs))
+    current_spend = np.bincount(pair_ids, weights=spend, minlength=len(pairs)) / n_months
+
+    # 没有单价或历史上没有带来销售额的组合不参与分配
+    usable = np.isfinite(unit_price) & (unit_price > 0) & (scale > 0)
+    return ResponseCurves(pairs=pairs[usable].reset_index(drop=True), material_ids=material_ids[usable],
+                          scale=scale[usable], elasticity=elasticity, unit_price=unit_price[usable],
+                          current_spend=current_spend[usable])
+
+
+# 预算约束下的最优连续投入：未达上限的曲线边际收益相等（拉格朗日乘子λ）时总销售额最大
+# 投入 x = min(上限, (scale × e / λ)^k)，k = 1/(1-e)。每条曲线在logλ低于其断点时取上限；
+# 同一物料的曲线k相同，按断点排序后用前缀和（对数空间）求未达上限部分的合计，二分logλ时每步只需按物料查找
+def _continuous_spend(curves, budget):
+    cap = curves.spend_cap
+    if cap.sum() <= budget:
+        return cap.copy()
+    elasticity = curves.elasticity[curves.material_ids]
+    power = 1 / (1 - elasticity)
+    log_base = np.log(curves.scale * elasticity)
+    breakpoints = log_base - np.log(cap) / power
+
+    # 按(物料, 断点)排序，每种物料的曲线连续排列
+    order = np.argsort(breakpoints)
+    order = order[np.argsort(curves.material_ids[order].astype(np.int32), kind='stable')]
+    bounds = np.flatnonzero(np.diff(curves.material_ids[order])) + 1
+    groups = []
+    for members in np.split(order, bounds):
+        k = power[members[0]]
+        groups.append((breakpoints[members], k, np.logaddexp.accumulate(k * log_base[members]),
+                       np.concatenate([np.cumsum(cap[members][::-1])[::-1], [0.0]])))
+
+    def total(log_lambda):
+        spend = 0.0
+        for points, k, prefix, capped in groups:
+            count = np.searchsorted(points, log_lambda, side='right')
+            spend += capped[count]
+            if count:
+                spend += np.exp(prefix[count - 1] - k * log_lambda)
+        return spend
+
+    low, high = -1.0, 1.0
+    while total(low) < budget:
+        low *= 2
+    while total(high) > budget:
+        high *= 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if total(middle) > budget:
+            low = middle
+        else:
+            high = middle
+    return np.minimum(cap, np.exp(power * (log_base - high)))
+
+
+# 连续解按单价取整后，剩余预算按每元边际收益从高到低逐件追加（每个组合最多追加一件，不超过投入上限）
+def _round_to_units(curves, spend, budget):
+    price = curves.unit_price
+    units = np.floor(spend / price)
+    remaining = budget - (units * price).sum()
+    current = curves.predict(units * price)
+    gain = (curves.predict((units + 1) * price) - current) / price
+    candidates = np.flatnonzero((units + 1) * price <= curves.spend_cap)
+    order = candidates[np.argsort(-gain[candidates])]
+    while len(order) and remaining >= price[order].min():
+        order = order[price[order] <= remaining]
+        # 按顺序能放进剩余预算的前n个组合各追加一件
+        n = max(int(np.searchsorted(np.cumsum(price[order]), remaining, side='right')), 1)
+        units[order[:n]] += 1
+        remaining -= price[order[:n]].sum()
+        order = order[n:]
+    return units.astype(np.int64)
+
+
+# 预算约束下的物料分配方案：每个(客户, 物料)的建议数量、投入和预计销售额
+# 所有组合都达到投入上限时预算可能用不完；预计提升相对于把同样的投入按历史结构分配
+def allocate_budget(curves: ResponseCurves, budget: float) -> dict:
+    if budget <= 0 or not len(curves.pairs):
+        units = np.zeros(len(curves.pairs), dtype=np.int64)
+    else:
+        units = _round_to_units(curves, _continuous_spend(curves, budget), budget)
+    spend = units * curves.unit_price
+    expected = curves.predict(spend)
+
+    # 基准：同样的实际投入按历史投入结构等比例分配
+    current_total = curves.current_spend.sum()
+    baseline_spend = curves.current_spend * (spend.sum() / current_total) if current_total > 0 else curves.current_spend
+    baseline_sales = curves.predict(baseline_spend).sum()
+
+    selected = np.flatnonzero(units > 0)
+    plan = curves.pairs.iloc[selected].reset_index(drop=True)
+    plan['当前月均投入'] = curves.current_spend[selected]
+    plan['建议数量'] = units[selected]
+    plan['建议投入'] = spend[selected]
+    plan['预计销售额'] = expected[selected]
+    plan['投入变化'] = spend[selected] - baseline_spend[selected]
+    plan = plan.sort_values('预计销售额', ascending=False, ignore_index=True)
+    expected_sales = expected.sum()
+    return {
+        'plan': plan,
+        'budget': budget,
+        'planned_spend': spend.sum(),
+        'expected_sales': expected_sales,
+        'baseline_sales': baseline_sales,
+        'uplift': expected_sales - baseline_sales,
+        'uplift_rate': (expected_sales / baseline_sales - 1) * 100 if baseline_sales > 0 else 0
+    }
@@ -0,0 +1,450 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregationStore
+from allocation import allocate_budget, fit_response_curves
+from attribution import AttributionWindow, attribute_sales
+from basket_rules import Baskets, mine_rules
+from cooccurrence import co_occurrence_frame
+from dimensions import encode_dimensions
+from filter_index import FilterIndex, MonthIndex, filter_frame, sort_by_month
+from join_index import JoinIndex
+from material_combos import Combinations, rank_by_name
+from memo_cache import ByteLRUCache
+from parallel_agg import parallel_groupby, resolve_workers
+
+# 销售明细中各筛选维度对应的列
+SALES_FILTER_COLUMNS = {
+    'regions': '所属区域',
+    'provinces': '省份',
+    'customers': '客户简称',
+    'products': '产品代码',
+    'applicants': '申请人'
+}
+
+# 客户级指标多进程计算时的分区列：每个客户只落在一个分区，结果与单进程相同
+CUSTOMER_PARTITION_COLUMN = '客户简称'
+
+# 物料分析筛选结果缓存的默认预算
+MATERIAL_FILTER_CACHE_MAX_BYTES = 512 * 1024 * 1024
+MATERIAL_FILTER_CACHE_MAX_ENTRIES = 64
+
+
+def _normalize(values) -> Tuple[str, ...]:
+    return tuple(sorted({str(value) for value in values})) if values else ()
+
+
+# 筛选条件：各维度选中的取值（空元组表示不筛选）和日期范围（起止都给出时才生效）
+# 不可变、可哈希，可以直接作为缓存键
+@dataclass(frozen=True)
+class FilterSpec:
+    regions: Tuple[str, ...] = ()
+    provinces: Tuple[str, ...] = ()
+    customers: Tuple[str, ...] = ()
+    products: Tuple[str, ...] = ()
+    applicants: Tuple[str, ...] = ()
+    start_date: Optional[pd.Timestamp] = None
+    end_date: Optional[pd.Timestamp] = None
+
+    # 由界面上的选择构造：选项去重排序，日期统一为Timestamp
+    @classmethod
+    def of(cls, regions=None, provinces=None, customers=None, products=None, applicants=None,
+           start_date=None, end_date=None) -> 'FilterSpec':
+        has_dates = bool(start_date and end_date)
+        return cls(
+            regions=_normalize(regions),
+            provinces=_normalize(provinces),
+            customers=_normalize(customers),
+            products=_normalize(products),
+            applicants=_normalize(applicants),
+            start_date=pd.Timestamp(start_date) if has_dates else None,
+            end_date=pd.Timestamp(end_date) if has_dates else None
+        )
+
+    @property
+    def has_dates(self) -> bool:
+        return self.start_date is not None and self.end_date is not None
+
+    # {列名: 选中的取值}，只包含有选择的维度
+    def selections(self, columns: Dict[str, str] = SALES_FILTER_COLUMNS) -> Dict[str, Tuple[str, ...]]:
+        return {column: getattr(self, field) for field, column in columns.items() if getattr(self, field)}
+
+
+# ---------------- 销售明细（新品分析看板） ----------------
+
+# 按筛选条件取出销售明细；有筛选索引时在索引覆盖的维度上求行号交集，其余维度和日期逐行判断
+# 没有任何限制时直接返回原数据（不复制），调用方不能原地修改结果
+def select_sales(df: pd.DataFrame, spec: FilterSpec, index: Optional[FilterIndex] = None) -> pd.DataFrame:
+    selections = spec.selections()
+    indexed = set(index.columns) if index is not None else set()
+    selected = index.apply(df, {c: v for c, v in selections.items() if c in indexed}) if indexed else df
+
+    mask = None
+    for column, values in selections.items():
+        if column in indexed:
+            continue
+        column_mask = selected[column].astype(str).isin(values).to_numpy()
+        mask = column_mask if mask is None else mask & column_mask
+    if spec.has_dates:
+        date_mask = ((selected['发运月份'] >= spec.start_date) & (selected['发运月份'] <= spec.end_date)).to_numpy()
+        mask = date_mask if mask is None else mask & date_mask
+    if mask is not None:
+        selected = selected[mask]
+    return selected
+
+
+def _new_product_rows(selected: pd.DataFrame, new_products: Sequence[str]) -> pd.DataFrame:
+    return selected[selected['产品代码'].isin(new_products)]
+
+
+# 各区域销售额
+def region_sales(df: pd.DataFrame, spec: FilterSpec, index: Optional[FilterIndex] = None) -> pd.DataFrame:
+    selected = select_sales(df, spec, index)
+    return selected.groupby('所属区域', observed=True)['销售额'].sum().reset_index()
+
+
+# 客户特征与简单分类：总销售额、购买产品数、新品销售占比及据此划分的客户类型
+# workers>1时按客户分区在进程池中汇总
+def customer_segments(df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                      index: Optional[FilterIndex] = None, workers: Optional[int] = None) -> pd.DataFrame:
+    selected = select_sales(df, spec, index)
+    if workers and workers > 1:
+        features = parallel_groupby(selected, ['客户简称'], {
+            '销售额': ('销售额', 'sum'),
+            '产品代码': ('产品代码', 'nunique'),
+            '数量（箱）': ('数量（箱）', 'sum'),
+            '单价（箱）': ('单价（箱）', 'mean')
+        }, CUSTOMER_PARTITION_COLUMN, workers=workers)
+    else:
+        features = selected.groupby('客户简称', observed=True).agg({
+            '销售额': 'sum',  # 总销售额
+            '产品代码': lambda x: len(set(x)),  # 购买的不同产品数量
+            '数量（箱）': 'sum',  # 总购买数量
+            '单价（箱）': 'mean'  # 平均单价
+        }).reset_index()
+
+    # 添加新品购买指标
+    new_sales = _new_product_rows(selected, new_products).groupby('客户简称', observed=True)[
+        '销售额'].sum().reset_index()
+    features = features.merge(new_sales, on='客户简称', how='left', suffixes=('', '_新品'))
+    features['销售额_新品'] = features['销售额_新品'].fillna(0)
+    return segment_customers(features)
+
+
+# 由客户的总销售额和新品销售额计算新品占比，并据此划分客户类型
+def segment_customers(features: pd.DataFrame) -> pd.DataFrame:
+    features['新品占比'] = features['销售额_新品'] / features['销售额'] * 100
+    features['客户类型'] = pd.cut(
+        features['新品占比'],
+        bins=[0, 10, 30, 100],
+        labels=['保守型客户', '平衡型客户', '创新型客户']
+    )
+    return features
+
+
+# 各客户类型的客户数量、平均销售额和平均新品占比（只列出有客户的类型）
+def segment_summary(features: pd.DataFrame) -> pd.DataFrame:
+    summary = features.groupby('客户类型', observed=True).agg({
+        '客户简称': 'count',
+        '销售额': 'mean',
+        '新品占比': 'mean'
+    }).reset_index()
+    summary.columns = ['客户类型', '客户数量', '平均销售额', '平均新品占比']
+    return summary
+
+
+# 客户-产品购买矩阵：每个客户一行、每个产品一列，购买过（销售额>0）为1，否则为0
+# workers>1时按客户分区在进程池中汇总
+def purchase_matrix(df: pd.DataFrame, spec: FilterSpec, index: Optional[FilterIndex] = None,
+                    workers: Optional[int] = None) -> pd.DataFrame:
+    selected = select_sales(df, spec, index)
+    keys = ['客户简称', '产品代码']
+    if workers and workers > 1:
+        sales = parallel_groupby(selected, keys, {'销售额': ('销售额', 'sum')}, CUSTOMER_PARTITION_COLUMN,
+                                 workers=workers)
+        # 在已汇总的结果上再分组一次，展开后的行列顺序与单进程一致
+        sales = sales.groupby(keys, observed=True)['销售额'].sum()
+    else:
+        sales = selected.groupby(keys, observed=True)['销售额'].sum()
+    transaction_data = sales.unstack().fillna(0)
+    return transaction_data.applymap(lambda x: 1 if x > 0 else 0)
+
+
+# 由购买矩阵计算产品共现矩阵：两个产品被同一客户购买的客户数（对角线为0）
+# 在稀疏的客户×产品关联矩阵上一次相乘得到（XᵀX）
+def co_occurrence_matrix(purchases: pd.DataFrame) -> pd.DataFrame:
+    return co_occurrence_frame(purchases)
+
+
+# 产品共现矩阵
+def co_occurrence(df: pd.DataFrame, spec: FilterSpec, index: Optional[FilterIndex] = None) -> pd.DataFrame:
+    return co_occurrence_matrix(purchase_matrix(df, spec, index))
+
+
+# 新品关联规则：按客户的购买记录挖掘前项或后项包含新品的规则，支持度和置信度低于下限的不保留
+def association_rules(df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                      index: Optional[FilterIndex] = None, min_support: float = 0.05,
+                      min_confidence: float = 0.3, max_length: int = 3) -> pd.DataFrame:
+    baskets = Baskets.from_sales(select_sales(df, spec, index))
+    return mine_rules(baskets, min_support, min_confidence, max_length=max_length, focus=new_products)
+
+
+# 新品总体渗透率：客户总数、购买新品的客户数和渗透率（%），单行
+def penetration(df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                index: Optional[FilterIndex] = None) -> pd.DataFrame:
+    selected = select_sales(df, spec, index)
+    total_customers = selected['客户简称'].nunique()
+    new_product_customers = _new_product_rows(selected, new_products)['客户简称'].nunique()
+    rate = (new_product_customers / total_customers * 100) if total_customers > 0 else 0
+    return pd.DataFrame({'客户总数': [total_customers], '购买新品客户数': [new_product_customers], '渗透率': [rate]})
+
+
+def _penetration_by(selected, new_rows, by, name):
+    customers = selected.groupby(by, observed=True)['客户简称'].nunique().reset_index()
+    customers.columns = [name, '客户总数']
+    new_customers = new_rows.groupby(by, observed=True)['客户简称'].nunique().reset_index()
+    new_customers.columns = [name, '购买新品客户数']
+
+    result = customers.merge(new_customers, on=name, how='left')
+    result['购买新品客户数'] = result['购买新品客户数'].fillna(0)
+    result['渗透率'] = (result['购买新品客户数'] / result['客户总数'] * 100).round(2)
+    return result
+
+
+# 各区域新品渗透率
+def region_penetration(df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                       index: Optional[FilterIndex] = None) -> pd.DataFrame:
+    selected = select_sales(df, spec, index)
+    return _penetration_by(selected, _new_product_rows(selected, new_products), '所属区域', '所属区域')
+
+
+# 按月新品渗透率
+def monthly_penetration(df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                        index: Optional[FilterIndex] = None) -> pd.DataFrame:
+    selected = select_sales(df, spec, index)
+    month = pd.Grouper(key='发运月份', freq='M')
+    result = _penetration_by(selected, _new_product_rows(selected, new_products), month, '月份')
+    result['月份_str'] = result['月份'].dt.strftime('%Y-%m')
+    return result
+
+
+# 多进程的pandas计算引擎：与DuckDBBackend接口相同，客户级指标按客户分区在进程池中汇总，其余指标与单进程相同
+class ParallelSalesMetrics:
+    name = 'parallel'
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = resolve_workers(workers)
+
+    def region_sales(self, df: pd.DataFrame, spec: FilterSpec, index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        return region_sales(df, spec, index)
+
+    def customer_segments(self, df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                          index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        return customer_segments(df, spec, new_products, index, workers=self.workers)
+
+    def purchase_matrix(self, df: pd.DataFrame, spec: FilterSpec, index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        return purchase_matrix(df, spec, index, workers=self.workers)
+
+    def penetration(self, df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                    index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        return penetration(df, spec, new_products, index)
+
+    def region_penetration(self, df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                           index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        return region_penetration(df, spec, new_products, index)
+
+    def monthly_penetration(self, df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                            index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        return monthly_penetration(df, spec, new_products, index)
+
+
+# ---------------- 物料投入与销售（物料分析看板） ----------------
+
+def _replace_inf(frame, column):
+    frame.replace([np.inf, -np.inf], np.nan, inplace=True)
+    frame.dropna(subset=[column], inplace=True)
+    return frame
+
+
+# 物料分析的计算入口：持有按月份排序的物料和销售明细、预聚合存储和关联索引
+# 明细的筛选结果按条件缓存并在各指标之间共享，返回的DataFrame调用方不能原地修改
+# 追加新月份的数据只能通过append，明细、预聚合存储和索引一起更新
+class MaterialAnalytics:
+    def __init__(self, df_material: pd.DataFrame, df_sales: pd.DataFrame,
+                 store: Optional[AggregationStore] = None,
+                 cache_max_bytes: int = MATERIAL_FILTER_CACHE_MAX_BYTES,
+                 cache_max_entries: int = MATERIAL_FILTER_CACHE_MAX_ENTRIES,
+                 window: AttributionWindow = AttributionWindow()):
+        self.window = window
+        self.store = store if store is not None else AggregationStore(df_material, df_sales)
+        self._cache = ByteLRUCache(max_bytes=cache_max_bytes, max_entries=cache_max_entries)
+        self._set_frames(df_material, df_sales)
+
+    def _set_frames(self, df_material, df_sales):
+        self.frames = {'material': df_material, 'sales': df_sales}
+        self._month_indexes = {name: MonthIndex(frame) for name, frame in self.frames.items()}
+        self.join_index = JoinIndex(df_material, df_sales)
+        self._cache.clear()
+
+    # 追加新月份的物料和销售明细（只包含新增的行，已计算物料总成本和销售总额，某一侧没有新数据时传空表）
+    # 预聚合存储只为新月份构建单元并拼接；明细按月份重新排序，月份索引和关联索引随之重建，筛选结果缓存清空
+    # 与已有月份重叠时抛出ValueError，不做任何修改
+    def append(self, new_material: pd.DataFrame, new_sales: pd.DataFrame):
+        self.store.check_new_months(new_material, new_sales)
+        # 维度列按合并后的类别字典重新编码，新数据中出现的区域、经销商等也是分类类型
+        material, sales, new_material, new_sales = encode_dimensions(
+            *(frame.copy(deep=False) for frame in (self.frames['material'], self.frames['sales'],
+                                                     new_material, new_sales)))
+        self.store.append(new_material, new_sales)
+        self._set_frames(sort_by_month(pd.concat([material, new_material], ignore_index=True)),
+                         sort_by_month(pd.concat([sales, new_sales], ignore_index=True)))
+
+    # 按区域、省份和日期筛选物料('material')或销售('sales')明细
+    def select(self, name: str, spec: FilterSpec) -> pd.DataFrame:
+        frame = self.frames[name]
+        if not (spec.regions or spec.provinces or spec.has_dates):
+            return frame
+        return self._cache.get_or_compute(
+            (name, spec.regions, spec.provinces, spec.start_date, spec.end_date),
+            lambda: filter_frame(frame, self._month_indexes[name], list(spec.regions), list(spec.provinces),
+                                 spec.start_date, spec.end_date))
+
+    # 筛选后的物料与销售明细按(发运月份, 客户代码)关联
+    def link(self, spec: FilterSpec, material_columns: Sequence[str], sales_columns: Sequence[str],
+             extra_keys: Sequence[str] = ()) -> pd.DataFrame:
+        return self.join_index.link(self.select('material', spec), self.select('sales', spec),
+                                    list(material_columns), list(sales_columns), extra_keys=list(extra_keys))
+
+    # 筛选后的预聚合单元（material/sales立方体或link关联单元）
+    def cells(self, name: str, spec: FilterSpec) -> pd.DataFrame:
+        return self.store.cells(name, list(spec.regions), list(spec.provinces), spec.start_date, spec.end_date)
+
+    # 按维度汇总物料和销售指标并合并，how与pd.merge相同
+    def metrics(self, by, material_measures: Sequence[str], sales_measures: Sequence[str], spec: FilterSpec,
+                how: str = 'outer') -> pd.DataFrame:
+        return self.store.metrics(by, material_measures, sales_measures, list(spec.regions), list(spec.provinces),
+                                  spec.start_date, spec.end_date, how=how)
+
+    # 各区域销售总额，从高到低
+    def region_sales(self, spec: FilterSpec) -> pd.DataFrame:
+        return self.cells('sales', spec).groupby('所属区域', observed=True).agg({
+            '销售总额': 'sum'
+        }).reset_index().sort_values('销售总额', ascending=False)
+
+    # 按维度汇总的费比（物料总成本/销售总额，%）
+    def cost_sales_ratio(self, by, spec: FilterSpec, how: str = 'outer') -> pd.DataFrame:
+        ratio = self.metrics(by, ['物料总成本'], ['销售总额'], spec, how)
+        ratio['费比'] = (ratio['物料总成本'] / ratio['销售总额']) * 100
+        return ratio
+
+    # 各客户的投入产出比（销售总额/物料总成本），只包含两侧都有数据的客户
+    def customer_roi(self, spec: FilterSpec) -> pd.DataFrame:
+        roi = self.metrics(['客户代码', '经销商名称'], ['物料总成本'], ['销售总额'], spec, 'inner')
+        roi['投入产出比'] = roi['销售总额'] / roi['物料总成本']
+        return roi
+
+    # 按归因窗口把筛选后的销售额分摊给物料后的物料单元（见attribute_sales）
+    # match_distributor为True时物料和销售还要求经销商名称相同
+    def attribution(self, spec: FilterSpec, match_distributor: bool = False) -> pd.DataFrame:
+        keys = ['客户代码', '经销商名称'] if match_distributor else ['客户代码']
+        return self._cache.get_or_compute(
+            ('attribution', spec, match_distributor, self.window),
+            lambda: attribute_sales(self.select('material', spec), self.select('sales', spec), self.window, keys=keys))
+
+    # 每种物料的归因销售额和单位物料销售额
+    def material_sales_correlation(self, spec: FilterSpec) -> pd.DataFrame:
+        correlation = self.attribution(spec).groupby('物料名称', observed=True).agg({
+            '物料数量': 'sum',
+            '销售总额': 'sum'
+        }).reset_index()
+        correlation['单位物料销售额'] = correlation['销售总额'] / correlation['物料数量']
+        return correlation
+
+    # 每个客户每月使用的物料名称组合（位掩码编码），及各组合的平均关联销售额和使用次数（以组合编号为索引）
+    def _combinations(self, spec):
+        link = self.link(spec, ['发运月份', '客户代码', '物料名称'], ['发运月份', '客户代码', '销售总额'])
+        combinations = Combinations(link, ['客户代码', '发运月份'], '物料名称')
+        # 使用平均值，因为每个客户-月份组合只有一个销售总额
+        sales = combinations.group_values(link['销售总额'], 'mean')
+        performance = combinations.combo_stats(sales, ['mean', 'count'])
+        performance.columns = ['平均销售额', '使用次数']
+        return combinations, performance
+
+    # 物料组合表现：每个客户每月使用的物料名称组合，及该组合的平均关联销售额和使用次数
+    def combination_performance(self, spec: FilterSpec) -> pd.DataFrame:
+        combinations, performance = self._combinations(spec)
+        names = combinations.names(performance.index)
+        performance = performance.reset_index(drop=True)
+        performance.insert(0, '物料组合', np.array(names, dtype=object))
+        return performance.sort_values('物料组合', ignore_index=True)
+
+    # 使用次数不少于min_uses的组合中平均销售额最高的n个；只解码入选组合的名称
+    def top_combinations(self, spec: FilterSpec, min_uses: int = 2, n: int = 10) -> pd.DataFrame:
+        combinations, performance = self._combinations(spec)
+        performance = performance[performance['使用次数'] >= min_uses]
+        ranked = performance['平均销售额'].dropna()
+        if n > 0 and len(ranked) >= n:
+            # 与第n名并列的组合都保留，按名称排序后再取前n个
+            performance = performance[performance['平均销售额'] >= ranked.nlargest(n).iloc[-1]]
+        return rank_by_name(performance.reset_index(drop=True), combinations.names(performance.index),
+                            '平均销售额').head(n)
+
+    @staticmethod
+    def _roi(attributed, by):
+        roi = attributed.groupby(by, observed=True).agg({
+            '物料数量': 'sum',
+            '物料总成本': 'sum',
+            '销售总额': 'sum'
+        }).reset_index()
+        roi['ROI'] = roi['销售总额'] / roi['物料总成本']
+        return _replace_inf(roi, 'ROI')
+
+    # 各物料的ROI（归因销售额/物料成本），剔除无穷大值和高于upper_quantile分位数的极端值
+    # match_distributor为True时归因还要求两侧经销商名称相同
+    def material_roi(self, spec: FilterSpec, match_distributor: bool = False,
+                     upper_quantile: float = 0.95) -> pd.DataFrame:
+        roi = self._roi(self.attribution(spec, match_distributor), ['物料代码', '物料名称'])
+        upper_limit = roi['ROI'].quantile(upper_quantile)
+        return roi[roi['ROI'] <= upper_limit]
+
+    # 物料分配建议所需的结果：物料ROI、客户-物料ROI（都只保留物料成本高于min_cost的记录）、
+    # ROI最高/最低的n种物料以及整体ROI
+    def allocation(self, spec: FilterSpec, min_cost: float = 500, n: int = 5) -> dict:
+        attributed = self.attribution(spec, True)
+        material_roi = self._roi(attributed, ['物料代码', '物料名称'])
+        upper_limit = material_roi['ROI'].quantile(0.95)
+        material_roi = material_roi[material_roi['ROI'] <= upper_limit]
+        customer_material = self._roi(attributed, ['客户代码', '经销商名称', '物料代码', '物料名称'])
+
+        material_roi = material_roi[material_roi['物料总成本'] > min_cost]
+        customer_material = customer_material[customer_material['物料总成本'] > min_cost]
+
+        total_material_cost = self.select('material', spec)['物料总成本'].sum()
+        total_sales = self.select('sales', spec)['销售总额'].sum()
+        return {
+            'material_roi': material_roi,
+            'customer_material': customer_material,
+            'high_roi': material_roi.sort_values('ROI', ascending=False).head(n),
+            'low_roi': material_roi.sort_values('ROI').head(n),
+            'total_material_cost': total_material_cost,
+            'total_sales': total_sales,
+            'overall_roi': total_sales / total_material_cost
+        }
+
+    # 预算约束下的物料分配方案（见allocate_budget）：响应曲线由筛选范围内的归因数据拟合，
+    # 物料单价取物料数据中的物料单价列（来自物料单价表）；budget为每月物料预算，默认为当前月均物料投入
+    def budget_allocation(self, spec: FilterSpec, budget: Optional[float] = None) -> dict:
+        curves = self._cache.get_or_compute(('response_curves', spec, self.window), lambda: fit_response_curves(
+            self.attribution(spec, True), self.unit_prices()))
+        if budget is None:
+            budget = curves.current_spend.sum()
+        return allocate_budget(curves, budget)
+
+    # 各物料代码的单价（物料数据中的物料单价列）
+    def unit_prices(self) -> pd.Series:
+        material = self.frames['material']
+        prices = material.groupby('物料代码', observed=True)['物料单价'].first()
+        return prices[prices.notna()]
@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+# 物料单元中用于分摊销售额的权重列
+WEIGHT_COLUMN = '物料总成本'
+
+
+# 归因窗口：物料发运后第min_lag到第max_lag个月的销售额归因于该物料，滞后L个月的权重乘以decay**L
+@dataclass(frozen=True)
+class AttributionWindow:
+    min_lag: int = 0
+    max_lag: int = 3
+    decay: float = 0.5
+
+    def __post_init__(self):
+        if not 0 <= self.min_lag <= self.max_lag:
+            raise ValueError(f"归因窗口无效: {self.min_lag}-{self.max_lag}个月")
+        if self.decay <= 0:
+            raise ValueError(f"衰减系数必须大于0: {self.decay}")
+
+    @property
+    def lags(self) -> range:
+        return range(self.min_lag, self.max_lag + 1)
+
+
+def _month_number(months: pd.Series) -> np.ndarray:
+    months = pd.DatetimeIndex(months)
+    return (months.year * 12 + months.month - 1).to_numpy(dtype=np.int64)
+
+
+# 两侧的键列编码为同一套整数编号（按取值匹配，两侧的分类类别可以不同）
+def _encode_keys(material, sales, keys):
+    combined = np.zeros(len(material) + len(sales), dtype=np.int64)
+    for key in keys:
+        codes, uniques = pd.factorize(pd.concat([material[key].astype(object), sales[key].astype(object)],
+                                                ignore_index=True))
+        combined = combined * (len(uniques) + 1) + codes
+    return combined[:len(material)], combined[len(material):]
+
+
+# 滞后归因：每个客户每月的销售额分摊给窗口内发运给该客户的物料，份额与物料成本×衰减权重成正比
+# （单元内物料成本都为0时按衰减权重平均分摊），每笔销售额分摊后的合计不变，不会像逐行关联那样重复计算
+# 返回按keys、发运月份和material_columns汇总的物料单元：物料数量、物料总成本和归因的销售总额
+# 窗口内没有销售的物料单元归因销售额为0；窗口内没有物料的销售额不归因
+def attribute_sales(df_material: pd.DataFrame, df_sales: pd.DataFrame, window: AttributionWindow,
+                    keys: Sequence[str] = ('客户代码',),
+                    material_columns: Sequence[str] = ('物料代码', '物料名称')) -> pd.DataFrame:
+    keys, material_columns = list(keys), list(material_columns)
+    material = df_material.groupby(keys + ['发运月份'] + material_columns, observed=True, sort=False).agg(
+        物料数量=('物料数量', 'sum'), 物料总成本=('物料总成本', 'sum')).reset_index()
+    sales = df_sales.groupby(keys + ['发运月份'], observed=True, sort=False)['销售总额'].sum().reset_index()
+    attributed = np.zeros(len(material))
+    if len(material) and len(sales):
+        material_keys, sales_keys = _encode_keys(material, sales, keys)
+        material_months = _month_number(material['发运月份'])
+        sales_months = _month_number(sales['发运月份'])
+        first = min(material_months.min(), sales_months.min())
+        # 每个键的月份编号区间留出最大滞后，滞后后的月份不会落到下一个键的区间
+        span = max(material_months.max(), sales_months.max()) - first + 1 + window.max_lag
+        material_cells = material_keys * span + (material_months - first)
+        sales_cells = sales_keys * span + (sales_months - first)
+
+        # 窗口关联：每个滞后在按键排序的销售单元上二分查找，得到(物料单元, 销售单元, 滞后)
+        order = np.argsort(sales_cells, kind='stable')
+        sorted_cells = sales_cells[order]
+        pair_material, pair_sales, pair_decay = [], [], []
+        for lag in window.lags:
+            positions = np.searchsorted(sorted_cells, material_cells + lag)
+            positions = np.minimum(positions, len(sorted_cells) - 1)
+            hit = sorted_cells[positions] == material_cells + lag
+            pair_material.append(np.flatnonzero(hit))
+            pair_sales.append(order[positions[hit]])
+            pair_decay.append(np.full(int(hit.sum()), window.decay ** lag))
+        pair_material = np.concatenate(pair_material)
+        pair_sales = np.concatenate(pair_sales)
+        pair_decay = np.concatenate(pair_decay)
+
+        weights = material[WEIGHT_COLUMN].to_numpy(dtype=np.float64)[pair_material] * pair_decay
+        totals = np.bincount(pair_sales, weights=weights, minlength=len(sales))
+        no_weight = totals[pair_sales] <= 0
+        if no_weight.any():
+            weights = np.where(no_weight, pair_decay, weights)
+            totals = np.bincount(pair_sales, weights=weights, minlength=len(sales))
+        shares = weights / totals[pair_sales]
+        sales_values = sales['销售总额'].to_numpy(dtype=np.float64)
+        attributed = np.bincount(pair_material, weights=shares * sales_values[pair_sales], minlength=len(material))
+    material['销售总额'] = attributed
+    return material
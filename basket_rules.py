@@ -0,0 +1,148 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import sparse
+except ImportError:  # 没有安装scipy时两两组合的支持度也用位集求交计数
+    sparse = None
+
+# 位集每个字的位数
+WORD_BITS = 64
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:  # numpy<2.0没有按位计数，按字节查表
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        as_bytes = np.ascontiguousarray(words).view(np.uint8).reshape(words.shape[:-1] + (-1,))
+        return _BYTE_BITS[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+# 整数编码的客户购物篮：每条(客户, 产品)购买记录一对编号，产品编号按产品代码排序
+# 与购买矩阵一致，客户在该产品上的销售额合计大于0才算购买
+class Baskets:
+    def __init__(self, customer_codes: np.ndarray, product_codes: np.ndarray, n_customers: int, products):
+        self.customer_codes = np.asarray(customer_codes, dtype=np.int64)
+        self.product_codes = np.asarray(product_codes, dtype=np.int64)
+        self.n_customers = int(n_customers)
+        self.products = pd.Index(products)
+        self.item_counts = np.bincount(self.product_codes, minlength=len(self.products))
+
+    @classmethod
+    def from_sales(cls, selected: pd.DataFrame, customer_column='客户简称', product_column='产品代码',
+                   value_column='销售额'):
+        totals = selected.groupby([customer_column, product_column], observed=True)[value_column].sum()
+        totals = totals[totals > 0]
+        customer_codes, customers = pd.factorize(totals.index.get_level_values(0))
+        product_codes, products = pd.factorize(totals.index.get_level_values(1), sort=True)
+        return cls(customer_codes, product_codes, len(customers), products)
+
+    # 指定产品的客户位集：每个产品一行，第c位为1表示客户c购买过
+    def bitsets(self, items: np.ndarray) -> np.ndarray:
+        rows = np.full(len(self.products), -1, dtype=np.int64)
+        rows[items] = np.arange(len(items))
+        selected = rows[self.product_codes] >= 0
+        customers = self.customer_codes[selected]
+        bits = np.zeros((len(items), -(-self.n_customers // WORD_BITS)), dtype=np.uint64)
+        np.bitwise_or.at(bits, (rows[self.product_codes[selected]], customers // WORD_BITS),
+                         np.left_shift(np.uint64(1), (customers % WORD_BITS).astype(np.uint64)))
+        return bits
+
+
+# 频繁两两组合的支持数：{(较小位置, 较大位置): 客户数}，位置是frequent中的下标
+def _pair_counts(baskets, frequent, bits, min_count):
+    if sparse is not None:
+        rows = np.full(len(baskets.products), -1, dtype=np.int64)
+        rows[frequent] = np.arange(len(frequent))
+        selected = rows[baskets.product_codes] >= 0
+        incidence = sparse.csr_matrix(
+            (np.ones(int(selected.sum()), dtype=np.int64),
+             (baskets.customer_codes[selected], rows[baskets.product_codes[selected]])),
+            shape=(baskets.n_customers, len(frequent)))
+        counts = sparse.triu(incidence.T @ incidence, k=1).tocoo()
+        keep = counts.data >= min_count
+        return dict(zip(zip(counts.row[keep].tolist(), counts.col[keep].tolist()), counts.data[keep].tolist()))
+
+    pairs = {}
+    for a in range(len(frequent) - 1):
+        counts = _popcount(bits[a] & bits[a + 1:])
+        for offset in np.flatnonzero(counts >= min_count):
+            pairs[(a, a + 1 + int(offset))] = int(counts[offset])
+    return pairs
+
+
+# 频繁项集（逐层扩展，位集求交计数）：{位置元组: 客户数}
+# focus给出时最后一层只计算包含其中产品的组合，其余层需要完整计算以得到规则前项的支持数
+def frequent_itemsets(baskets: Baskets, min_support: float, max_length: int = 3, focus=None):
+    min_count = max(1, math.ceil(min_support * baskets.n_customers))
+    frequent = np.flatnonzero(baskets.item_counts >= min_count)
+    supports = {(a,): int(baskets.item_counts[item]) for a, item in enumerate(frequent)}
+    if max_length < 2 or len(frequent) < 2:
+        return frequent, supports
+    focus_mask = np.ones(len(frequent), dtype=bool) if focus is None else np.isin(baskets.products[frequent], list(focus))
+
+    bits = baskets.bitsets(frequent)
+    pairs = _pair_counts(baskets, frequent, bits, min_count)
+    level = {pair: count for pair, count in pairs.items() if max_length > 2 or focus_mask[list(pair)].any()}
+    supports.update(level)
+
+    # 每个产品与哪些位置更靠后的产品组成频繁组合，用于剪枝候选
+    neighbors = {}
+    for a, b in sorted(pairs):
+        neighbors.setdefault(a, []).append(b)
+    neighbors = {a: np.array(items, dtype=np.int64) for a, items in neighbors.items()}
+    empty = np.empty(0, dtype=np.int64)
+
+    for length in range(3, max_length + 1):
+        last = length == max_length
+        next_level = {}
+        for itemset in sorted(level):
+            # 候选产品与项集中每个产品都组成频繁组合
+            candidates = neighbors.get(itemset[-1], empty)
+            for item in itemset[:-1]:
+                candidates = np.intersect1d(candidates, neighbors.get(item, empty), assume_unique=True)
+            if last and not focus_mask[list(itemset)].any():
+                candidates = candidates[focus_mask[candidates]]
+            if not len(candidates):
+                continue
+            common = np.bitwise_and.reduce(bits[list(itemset)], axis=0)
+            counts = _popcount(common & bits[candidates])
+            for candidate, count in zip(candidates[counts >= min_count].tolist(), counts[counts >= min_count].tolist()):
+                next_level[itemset + (candidate,)] = count
+        supports.update(next_level)
+        level = next_level
+        if not level:
+            break
+    return frequent, supports
+
+
+# 关联规则（后项为单个产品）：前项 -> 后项的支持度、置信度和提升度，按提升度、置信度、客户数从高到低排列
+# focus给出时只保留前项或后项包含其中产品的规则
+def mine_rules(baskets: Baskets, min_support: float, min_confidence: float, max_length: int = 3,
+               focus=None) -> pd.DataFrame:
+    columns = ['前项', '后项', '客户数', '支持度', '置信度', '提升度']
+    if baskets.n_customers == 0:
+        return pd.DataFrame(columns=columns)
+    frequent, supports = frequent_itemsets(baskets, min_support, max_length, focus)
+    focus_items = set(baskets.products[frequent]) if focus is None else set(focus)
+    labels = baskets.products[frequent].tolist()
+
+    rules = []
+    for itemset, count in supports.items():
+        if len(itemset) < 2 or not focus_items.intersection(labels[i] for i in itemset):
+            continue
+        for consequent in itemset:
+            antecedent = tuple(i for i in itemset if i != consequent)
+            confidence = count / supports[antecedent]
+            if confidence < min_confidence:
+                continue
+            lift = confidence * baskets.n_customers / supports[(consequent,)]
+            rules.append((tuple(labels[i] for i in antecedent), labels[consequent], count,
+                          count / baskets.n_customers, confidence, lift))
+
+    result = pd.DataFrame(rules, columns=columns)
+    return result.sort_values(['提升度', '置信度', '客户数'], ascending=False, kind='stable', ignore_index=True)
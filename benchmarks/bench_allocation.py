@@ -0,0 +1,76 @@
+import heapq
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from allocation import ResponseCurves, allocate_budget
+
+PRICES = [1, 5, 20, 50, 100, 500]
+
+
+# 随机响应曲线：customers个经销商×materials种物料，弹性按物料、规模系数和历史投入按组合随机生成
+def make_curves(customers, materials, seed=0):
+    rng = np.random.default_rng(seed)
+    n = customers * materials
+    material_ids = np.tile(np.arange(materials), customers)
+    pairs = pd.DataFrame({
+        '客户代码': np.repeat([f'C{i:05d}' for i in range(customers)], materials),
+        '经销商名称': np.repeat([f'经销商{i}' for i in range(customers)], materials),
+        '物料代码': np.tile([f'M{i:03d}' for i in range(materials)], customers),
+        '物料名称': np.tile([f'物料{i}' for i in range(materials)], customers)
+    })
+    return ResponseCurves(pairs=pairs, material_ids=material_ids, scale=rng.lognormal(0, 1, n) * 50,
+                          elasticity=rng.uniform(0.2, 0.8, materials),
+                          unit_price=rng.choice(PRICES, materials)[material_ids].astype(float),
+                          current_spend=rng.lognormal(3, 1, n))
+
+
+# 逐件贪心（堆）：每次把一件物料投给每元边际收益最高且放得下的组合，作为小规模下的对照
+def heap_greedy(curves, budget):
+    units = np.zeros(len(curves.pairs))
+    price, cap = curves.unit_price, curves.spend_cap
+    elasticity = curves.elasticity[curves.material_ids]
+
+    def gain(i):
+        sales = curves.scale[i] * ((units[i] + 1) * price[i]) ** elasticity[i] - \
+            curves.scale[i] * (units[i] * price[i]) ** elasticity[i]
+        return sales / price[i]
+
+    heap = [(-gain(i), i) for i in range(len(units))]
+    heapq.heapify(heap)
+    remaining = budget
+    while heap:
+        _, i = heapq.heappop(heap)
+        if price[i] <= remaining and (units[i] + 1) * price[i] <= cap[i]:
+            units[i] += 1
+            remaining -= price[i]
+            heapq.heappush(heap, (-gain(i), i))
+    return curves.predict(units * price).sum()
+
+
+def main(customers=10_000, materials=100):
+    small = make_curves(30, 8)
+    for share in (1.0, 0.4):
+        budget = small.current_spend.sum() * share
+        result = allocate_budget(small, budget)
+        reference = heap_greedy(small, budget)
+        print(f"30×8 预算{share:.0%}: 方案预计销售额 {result['expected_sales']:,.0f}，"
+              f"逐件贪心 {reference:,.0f}（{result['expected_sales'] / reference:.2%}）")
+
+    curves = make_curves(customers, materials)
+    for share in (0.3, 1.0, 2.0):
+        budget = curves.current_spend.sum() * share
+        start = time.perf_counter()
+        result = allocate_budget(curves, budget)
+        elapsed = time.perf_counter() - start
+        print(f"{customers:,}经销商×{materials}物料 预算{share:.0%}: {elapsed * 1000:.0f}ms，"
+              f"投入 {result['planned_spend']:,.0f}/{budget:,.0f}，预计提升 {result['uplift_rate']:.1f}%")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
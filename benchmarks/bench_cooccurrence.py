@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cooccurrence import co_occurrence_frame, top_k
+
+
+# 原来的实现：逐个客户遍历购买的产品，两两累加
+def loop_co_occurrence(purchases):
+    matrix = pd.DataFrame(0, index=purchases.columns, columns=purchases.columns)
+    for _, row in purchases.iterrows():
+        bought_products = row.index[row == 1].tolist()
+        for p1 in bought_products:
+            for p2 in bought_products:
+                if p1 != p2:
+                    matrix.loc[p1, p2] += 1
+    return matrix
+
+
+# 随机的客户-产品购买矩阵，每个客户平均购买per_customer个产品
+def make_purchases(customers, products, per_customer=8, seed=0):
+    rng = np.random.default_rng(seed)
+    bought = rng.random((customers, products)) < per_customer / products
+    return pd.DataFrame(bought.astype(np.int64),
+                        index=[f'C{i:05d}' for i in range(customers)],
+                        columns=[f'P{i:05d}' for i in range(products)])
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    small = make_purchases(300, 60)
+    t_loop, expected = timed(lambda: loop_co_occurrence(small))
+    t_sparse, result = timed(lambda: co_occurrence_frame(small))
+    same = expected.equals(result)
+    print(f"300客户×60产品: 循环 {t_loop * 1000:.0f}ms -> 稀疏矩阵 {t_sparse * 1000:.1f}ms，结果{'一致' if same else '不一致'}")
+
+    for customers, products in [(5_000, 2_000), (20_000, 5_000)]:
+        purchases = make_purchases(customers, products)
+        t_matrix, matrix = timed(lambda: co_occurrence_frame(purchases))
+        t_top, _ = timed(lambda: top_k(matrix.to_numpy(), 5))
+        print(f"{customers}客户×{products}产品: 共现矩阵 {t_matrix * 1000:.0f}ms，每个产品前5 {t_top * 1000:.0f}ms")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dimensions import encode_dimensions
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Q1xlsx.xlsx')
+
+
+# 把Q1数据复制放大到指定行数
+def make_frame(rows):
+    base = pd.read_excel(DATA_FILE)
+    base['销售额'] = base['单价（箱）'] * base['数量（箱）']
+    repeat = int(np.ceil(rows / len(base)))
+    return pd.concat([base] * repeat, ignore_index=True).iloc[:rows].copy()
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# 与仪表盘中相同形态的操作：侧边栏筛选、分组汇总、按维度合并
+def workload(df):
+    regions = df['所属区域'].unique()[:2].tolist()
+    customers = df['客户简称'].unique()[:50].tolist()
+    lookup = df.groupby('客户简称', observed=True)['销售额'].sum().reset_index()
+    return {
+        'isin筛选': lambda: df[df['所属区域'].isin(regions) & df['客户简称'].isin(customers)],
+        '按区域分组': lambda: df.groupby('所属区域', observed=True)['销售额'].sum(),
+        '按客户+产品分组': lambda: df.groupby(['客户简称', '产品代码'], observed=True)['销售额'].sum(),
+        '按客户合并': lambda: df[['客户简称', '销售额']].merge(lookup, on='客户简称', how='left'),
+    }
+
+
+def main(rows=1_000_000):
+    plain = make_frame(rows)
+    encoded = encode_dimensions(plain.copy())[0]
+
+    plain_mb = plain.memory_usage(deep=True).sum() / 1024 / 1024
+    encoded_mb = encoded.memory_usage(deep=True).sum() / 1024 / 1024
+    print(f"行数: {rows:,}")
+    print(f"内存: object {plain_mb:.1f}MB -> categorical {encoded_mb:.1f}MB "
+          f"(节省 {(1 - encoded_mb / plain_mb) * 100:.1f}%)")
+
+    plain_ops = workload(plain)
+    encoded_ops = workload(encoded)
+    for name in plain_ops:
+        t_plain = best_of(plain_ops[name])
+        t_encoded = best_of(encoded_ops[name])
+        print(f"{name}: object {t_plain * 1000:.1f}ms -> categorical {t_encoded * 1000:.1f}ms "
+              f"({t_plain / t_encoded:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dimensions import encode_dimensions
+from filter_index import FilterIndex
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Q1xlsx.xlsx')
+FILTER_COLUMNS = ['所属区域', '客户简称', '产品代码', '申请人']
+
+
+# 把Q1数据复制放大到指定行数
+def make_frame(rows):
+    base = pd.read_excel(DATA_FILE)
+    base['销售额'] = base['单价（箱）'] * base['数量（箱）']
+    repeat = int(np.ceil(rows / len(base)))
+    df = pd.concat([base] * repeat, ignore_index=True).iloc[:rows].copy()
+    return encode_dimensions(df)[0]
+
+
+# 原来的筛选方式：复制整表后逐个维度做isin
+def filter_with_isin(df, selections):
+    filtered_df = df.copy()
+    for column, values in selections.items():
+        if values:
+            filtered_df = filtered_df[filtered_df[column].isin(values)]
+    return filtered_df
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(rows=1_000_000):
+    df = make_frame(rows)
+    start = time.perf_counter()
+    index = FilterIndex(df, FILTER_COLUMNS)
+    print(f"行数: {rows:,}，建立索引 {(time.perf_counter() - start) * 1000:.0f}ms，"
+          f"索引大小 {index.nbytes / 1024 / 1024:.1f}MB")
+
+    regions = sorted(df['所属区域'].astype(str).unique())
+    customers = sorted(df['客户简称'].astype(str).unique())
+    products = sorted(df['产品代码'].astype(str).unique())
+    scenarios = {
+        '默认（全部区域）': {'所属区域': regions},
+        '两个区域': {'所属区域': regions[:2]},
+        '一个客户': {'所属区域': regions, '客户简称': customers[len(customers) // 2:len(customers) // 2 + 1]},
+        '区域+五个产品': {'所属区域': regions[:2], '产品代码': products[:5]},
+    }
+    for name, selections in scenarios.items():
+        expected = filter_with_isin(df, selections)
+        result = index.apply(df, selections)
+        assert result.equals(expected), name
+        t_isin = best_of(lambda: filter_with_isin(df, selections))
+        t_index = best_of(lambda: index.apply(df, selections))
+        print(f"{name}: 选中 {len(result):,} 行，isin {t_isin * 1000:.1f}ms -> 索引 {t_index * 1000:.1f}ms "
+              f"({t_isin / t_index:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
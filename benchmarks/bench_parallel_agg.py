@@ -0,0 +1,100 @@
+import importlib
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import analytics
+from aggregates import AggregationStore
+from analytics import FilterSpec
+from bench_sql_backend import make_frame, NEW_PRODUCTS, FILTER_COLUMNS
+from filter_index import FilterIndex
+from parallel_agg import get_pool
+
+# 物料分析模拟数据的物料行数：模拟数据只有20个客户，关联单元数随行数平方增长
+MATERIAL_ROWS = 20_000
+
+
+# 对比的进程数：1, 2, 4, …直到max_workers（默认为CPU核心数），max_workers不是2的幂时也包含它本身
+def worker_counts(max_workers=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+# 物料分析看板的模拟数据（物料明细和销售明细），行数放大到指定值
+def make_material_frames(rows):
+    app = importlib.import_module('物料分析')
+    app.SYNTHETIC_MATERIAL_ROWS = rows
+    app.SYNTHETIC_SALES_ROWS = rows * 6 // 5
+    app.SYNTHETIC_SEED = 1
+    df_material, df_sales, _ = app.load_data()
+    return df_material, df_sales
+
+
+# 各进程数下的耗时和相对单进程的加速比；每个结果都必须与单进程完全相同
+def scaling(label, compute, same, counts):
+    baseline = None
+    failures = 0
+    for workers in counts:
+        elapsed, result = best_of(lambda: compute(workers))
+        if baseline is None:
+            baseline = (elapsed, result)
+        elif not same(baseline[1], result):
+            failures += 1
+            print(f"不一致 {label} workers={workers}")
+        print(f"{label} workers={workers}: {elapsed * 1000:.0f}ms ({baseline[0] / elapsed:.2f}x)")
+    return failures
+
+
+def main(rows=2_000_000, max_workers=None):
+    warnings.filterwarnings('ignore')
+    counts = worker_counts(max_workers)
+    print(f"CPU核心数: {os.cpu_count()}，对比进程数: {counts}")
+    failures = 0
+
+    # 先启动共享进程池（与仪表盘中一样只启动一次），计时不包含进程启动
+    start = time.perf_counter()
+    pool = get_pool(counts[-1])
+    list(pool.map(abs, range(counts[-1] * 4)))
+    print(f"进程池启动: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    df_material, df_sales = make_material_frames(MATERIAL_ROWS)
+    print(f"物料 {len(df_material):,} 行，销售 {len(df_sales):,} 行")
+    failures += scaling(
+        '聚合存储构建',
+        lambda workers: AggregationStore(df_material, df_sales, workers=workers),
+        lambda a, b: all(a.tables[name].equals(b.tables[name]) for name in a.tables), counts)
+
+    df = make_frame(rows)
+    index = FilterIndex(df, FILTER_COLUMNS)
+    spec = FilterSpec()
+    print(f"销售明细 {len(df):,} 行")
+    failures += scaling(
+        '客户特征',
+        lambda workers: analytics.customer_segments(df, spec, NEW_PRODUCTS, index, workers=workers),
+        lambda a, b: a.equals(b), counts)
+    failures += scaling(
+        '购买矩阵',
+        lambda workers: analytics.purchase_matrix(df, spec, index, workers=workers),
+        lambda a, b: a.equals(b), counts)
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*[int(arg) for arg in sys.argv[1:3]]) else 0)
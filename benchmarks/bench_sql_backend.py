@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import analytics
+from analytics import FilterSpec
+from data_cache import write_arrow_frame
+from dimensions import encode_dimensions
+from filter_index import FilterIndex
+from sql_backend import DuckDBBackend
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Q1xlsx.xlsx')
+FILTER_COLUMNS = ['所属区域', '客户简称', '产品代码', '申请人']
+NEW_PRODUCTS = ['F0110C', 'F0183F', 'F01K8A', 'F0183K', 'F0101P']
+
+# 两个引擎都实现的指标及其额外参数
+METRICS = {
+    'region_sales': (),
+    'customer_segments': (NEW_PRODUCTS,),
+    'purchase_matrix': (),
+    'penetration': (NEW_PRODUCTS,),
+    'region_penetration': (NEW_PRODUCTS,),
+    'monthly_penetration': (NEW_PRODUCTS,),
+}
+
+
+# 把Q1数据复制放大到指定行数（与仪表盘加载后的形态相同）
+def make_frame(rows):
+    base = pd.read_excel(DATA_FILE)
+    base['发运月份'] = pd.to_datetime(base['发运月份'])
+    base['销售额'] = base['单价（箱）'] * base['数量（箱）']
+    repeat = int(np.ceil(rows / len(base)))
+    df = pd.concat([base] * repeat, ignore_index=True).iloc[:rows].copy()
+    return encode_dimensions(df)[0]
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# 两个引擎的结果一致性由 tests/test_sql_backend.py 检查，这里只比较用时：
+# DuckDB分别扫描内存中的DataFrame和列式缓存文件
+def main(rows=1_000_000):
+    df = make_frame(rows)
+    index = FilterIndex(df, FILTER_COLUMNS)
+    with tempfile.TemporaryDirectory() as directory:
+        backend = DuckDBBackend(temp_directory=os.path.join(directory, 'duckdb_tmp'))
+        arrow_path = os.path.join(directory, 'sales.arrow')
+        write_arrow_frame(df, arrow_path)
+        file_backend = backend.over_files([arrow_path])
+
+        spec = FilterSpec()
+        print(f"行数: {rows:,}")
+        for metric, args in METRICS.items():
+            t_pandas = best_of(lambda: getattr(analytics, metric)(df, spec, *args, index=index))
+            t_frame = best_of(lambda: getattr(backend, metric)(df, spec, *args, index=index))
+            t_files = best_of(lambda: getattr(file_backend, metric)(df, spec, *args, index=index))
+            print(f"{metric}: pandas {t_pandas * 1000:.0f}ms -> DuckDB(DataFrame) {t_frame * 1000:.0f}ms "
+                  f"({t_pandas / t_frame:.1f}x)，DuckDB(缓存文件) {t_files * 1000:.0f}ms ({t_pandas / t_files:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
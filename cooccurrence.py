@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import sparse
+except ImportError:  # 没有安装scipy时用稠密的布尔矩阵相乘
+    sparse = None
+
+
+# 客户×产品的关联矩阵：客户购买过该产品（购买矩阵中为1）的位置为1
+# 安装scipy时为CSR稀疏矩阵，只存储非零位置
+def incidence_matrix(purchases: pd.DataFrame):
+    bought = purchases.to_numpy() == 1
+    if sparse is None:
+        return bought.astype(np.int64)
+    rows, cols = np.nonzero(bought)
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=bought.shape)
+
+
+# 产品共现次数 XᵀX：两个产品被同一客户购买的客户数，对角线为0
+def co_occurrence_counts(incidence) -> np.ndarray:
+    product = incidence.T @ incidence
+    counts = product.toarray() if sparse is not None and sparse.issparse(product) else np.asarray(product)
+    counts = counts.astype(np.int64, copy=False)
+    np.fill_diagonal(counts, 0)
+    return counts
+
+
+# 由购买矩阵计算产品共现矩阵，行列都是购买矩阵的产品列
+def co_occurrence_frame(purchases: pd.DataFrame) -> pd.DataFrame:
+    counts = co_occurrence_counts(incidence_matrix(purchases))
+    return pd.DataFrame(counts, index=purchases.columns, columns=purchases.columns)
+
+
+# 每行取值最大的k个位置（argpartition选出，不做整行排序），按取值从大到小排列，取值相同时位置靠前的优先
+def top_k(counts: np.ndarray, k: int) -> np.ndarray:
+    counts = np.atleast_2d(counts)
+    k = min(k, counts.shape[1])
+    if k <= 0:
+        return np.empty((counts.shape[0], 0), dtype=np.int64)
+    # 次数相同时位置越靠前排序键越小，每行的排序键互不相同，选出的k个位置是确定的
+    n = counts.shape[1]
+    keys = -counts.astype(np.int64) * n + np.arange(n)
+    chosen = np.argpartition(keys, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(keys, chosen, axis=1), axis=1)
+    return np.take_along_axis(chosen, order, axis=1)
+
+
+# 某个产品共现次数最多的k个产品及次数，与 matrix.loc[product].sort_values(ascending=False).head(k) 的内容相同
+def top_partners(matrix: pd.DataFrame, product, k: int = 5) -> pd.Series:
+    row = matrix.loc[product]
+    positions = top_k(row.to_numpy(), k)[0]
+    return row.iloc[positions]
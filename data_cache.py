@@ -0,0 +1,322 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # 没有安装pyarrow时退化为直接解析Excel
+    pa = None
+    pa_ipc = None
+
+# 缓存目录放在源文件旁边
+CACHE_DIR_NAME = ".data_cache"
+
+
+# 计算文件内容哈希（分块读取，避免一次性载入大文件）
+def file_content_hash(file_path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 文件指纹：大小、修改时间和内容哈希
+def file_fingerprint(file_path, with_hash=True):
+    stat = os.stat(file_path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        fingerprint['sha256'] = file_content_hash(file_path)
+    return fingerprint
+
+
+# 源文件对应的缓存文件路径（列式数据 + 元数据）
+def cache_paths(file_path, tag=None):
+    directory, name = os.path.split(os.path.abspath(file_path))
+    cache_dir = os.path.join(directory, CACHE_DIR_NAME)
+    stem = f"{name}.{tag}" if tag else name
+    return os.path.join(cache_dir, f"{stem}.arrow"), os.path.join(cache_dir, f"{stem}.json")
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+
+
+# 以内存映射方式读取Arrow IPC文件：文件内容不会先整体读入进程内存，转换为DataFrame时每列复制一次
+# 不做零拷贝转换：零拷贝的列是只读的（调用方会原地修改数据），并且会一直占用映射的文件，导致无法原子替换缓存
+def read_arrow_frame(arrow_path):
+    with pa.memory_map(arrow_path, 'r') as source:
+        table = pa_ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+
+# 原子写入Arrow IPC文件（不压缩，读取时可直接内存映射，无需解压）
+def write_arrow_frame(df, arrow_path):
+    os.makedirs(os.path.dirname(arrow_path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = arrow_path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa_ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, arrow_path)
+
+
+# 检查缓存是否仍然对应当前源文件，返回(是否有效, 当前指纹)
+def check_cache(file_path, meta, version):
+    if meta is None or meta.get('version') != version:
+        return False, None
+
+    quick = file_fingerprint(file_path, with_hash=False)
+    cached = meta.get('source', {})
+    if quick['size'] == cached.get('size') and quick['mtime_ns'] == cached.get('mtime_ns'):
+        return True, None
+
+    # 大小或修改时间变了，再用内容哈希确认文件是否真的改变（例如只是被touch或重新拷贝）
+    if quick['size'] != cached.get('size'):
+        return False, None
+    current = file_fingerprint(file_path)
+    return current['sha256'] == cached.get('sha256'), current
+
+
+# 源文件未变化时读取已有缓存，否则返回None
+def read_valid_cache(file_path, version=1, tag=None):
+    if pa is None:
+        return None
+
+    arrow_path, meta_path = cache_paths(file_path, tag)
+    meta = _read_meta(meta_path)
+    valid, current = check_cache(file_path, meta, version)
+    if not valid or not os.path.exists(arrow_path):
+        return None
+
+    if current is not None:
+        # 内容未变，只刷新指纹中的修改时间，下次无需再计算哈希
+        meta['source'] = current
+        _write_meta(meta_path, meta)
+    try:
+        return read_arrow_frame(arrow_path)
+    except (OSError, pa.ArrowException):
+        return None
+
+
+# 读取带列式缓存的数据：源文件未变化时直接读取缓存，否则调用build重新解析并写入缓存
+# key_column: 写入缓存时在元数据中记录该列的月份集合（见cached_month_keys），列出缓存文件时无需再读取数据
+def load_cached_frame(file_path, build, version=1, tag=None, key_column=None):
+    if pa is None:
+        return build(file_path)
+
+    df = read_valid_cache(file_path, version, tag)
+    if df is not None:
+        return df
+
+    df = build(file_path)
+    arrow_path, meta_path = cache_paths(file_path, tag)
+    try:
+        write_arrow_frame(df, arrow_path)
+        meta = {
+            'version': version,
+            'source': file_fingerprint(file_path),
+            'rows': len(df),
+            'columns': list(df.columns)
+        }
+        if key_column is not None:
+            meta['keys'] = {key_column: sorted(month_keys(df[key_column]))}
+        _write_meta(meta_path, meta)
+    except (OSError, pa.ArrowException) as e:
+        # 缓存写入失败不影响正常使用
+        print(f"列式缓存写入失败: {e}")
+
+    return df
+
+
+# 并行读取多个文件：先在主进程命中缓存，未命中的文件交给进程池同时解析
+# build必须是可被pickle的模块级函数
+def load_cached_frames(file_paths, build, version=1, max_workers=None):
+    frames = {}
+    misses = []
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+        df = read_valid_cache(file_path, version)
+        if df is None:
+            misses.append(file_path)
+        else:
+            frames[file_path] = df
+
+    if len(misses) == 1:
+        frames[misses[0]] = load_cached_frame(misses[0], build, version)
+    elif misses:
+        workers = min(len(misses), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {file_path: pool.submit(load_cached_frame, file_path, build, version)
+                       for file_path in misses}
+            for file_path, future in futures.items():
+                frames[file_path] = future.result()
+
+    return [frames[file_path] for file_path in file_paths]
+
+
+# 把发运月份统一为'YYYY-MM'字符串集合，用于判断月份是否重叠
+def month_keys(values):
+    values = pd.Series(values).drop_duplicates().dropna()
+    months = pd.to_datetime(values, errors='coerce')
+    keys = months.dt.strftime('%Y-%m').where(months.notna(), values.astype(str))
+    return set(keys)
+
+
+# 追加数据段的索引文件和存放目录
+def segment_paths(file_path):
+    arrow_path, _ = cache_paths(file_path)
+    stem = arrow_path[:-len('.arrow')]
+    return stem + '.segments.json', stem + '.segments'
+
+
+def read_segment_index(file_path):
+    index_path, _ = segment_paths(file_path)
+    return _read_meta(index_path) or []
+
+
+# 数据段源文件的内容和文件名；source为文件路径或上传的文件对象
+def _segment_source(source):
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read(), os.path.basename(source)
+    if hasattr(source, 'getvalue'):
+        content = source.getvalue()
+    else:
+        source.seek(0)
+        content = source.read()
+    return content, getattr(source, 'name', 'segment.xlsx')
+
+
+def _remove_segment_files(segment_path):
+    for path in (segment_path,) + cache_paths(segment_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# 追加一个新月份的数据文件：源文件保存到缓存目录并单独建立列式缓存，不重新解析历史数据
+# existing_keys为主文件已有的月份；与已有月份重叠时抛出ValueError
+def append_segment(file_path, source, build, key_column, existing_keys=(), version=1, summarize=None):
+    index_path, directory = segment_paths(file_path)
+    os.makedirs(directory, exist_ok=True)
+
+    content, name = _segment_source(source)
+    digest = hashlib.sha256(content).hexdigest()
+    index = read_segment_index(file_path)
+    if any(segment['sha256'] == digest for segment in index):
+        raise ValueError(f"文件 {name} 已经追加过")
+
+    segment_path = os.path.join(directory, digest[:16] + os.path.splitext(name)[1])
+    with open(segment_path, 'wb') as f:
+        f.write(content)
+
+    df = load_cached_frame(segment_path, build, version)
+    keys = month_keys(df[key_column])
+    taken = set(existing_keys)
+    for segment in index:
+        taken.update(segment['months'])
+    overlap = keys & taken
+    if overlap:
+        # 校验失败，清理刚写入的文件和缓存
+        _remove_segment_files(segment_path)
+        raise ValueError(f"月份与已有数据重叠: {', '.join(sorted(overlap))}")
+
+    index.append({
+        'name': name,
+        'file': os.path.basename(segment_path),
+        'sha256': digest,
+        'months': sorted(keys),
+        'rows': len(df),
+        'summary': summarize(df).to_dict('records') if summarize else None
+    })
+    _write_meta(index_path, index)
+    return df
+
+
+# 撤销append_segment追加的数据段（source与追加时相同）：从索引中移除并删除保存的文件和缓存
+# 用于追加后的其他步骤失败时回滚，避免只保存在磁盘上的数据段在下次启动时被合并
+def remove_segment(file_path, source):
+    index_path, directory = segment_paths(file_path)
+    digest = hashlib.sha256(_segment_source(source)[0]).hexdigest()
+    index = read_segment_index(file_path)
+    for segment in index:
+        if segment['sha256'] == digest:
+            _remove_segment_files(os.path.join(directory, segment['file']))
+    _write_meta(index_path, [segment for segment in index if segment['sha256'] != digest])
+
+
+# 数据文件当前有效的列式缓存文件路径，缓存不存在或已过期时返回None
+def valid_cache_file(file_path, version=1, tag=None):
+    if pa is None:
+        return None
+    arrow_path, meta_path = cache_paths(file_path, tag)
+    valid, _ = check_cache(file_path, _read_meta(meta_path), version)
+    return arrow_path if valid and os.path.exists(arrow_path) else None
+
+
+# 有效缓存中key_column列的月份集合，缓存不存在或已过期时返回None。优先使用写入缓存时记录在元数据中的结果；
+# 没有记录时（旧缓存或写入时未指定key_column）只读取这一列，并补记到元数据中
+def cached_month_keys(file_path, key_column, version=1, tag=None):
+    if pa is None:
+        return None
+    arrow_path, meta_path = cache_paths(file_path, tag)
+    meta = _read_meta(meta_path)
+    valid, _ = check_cache(file_path, meta, version)
+    if not valid or not os.path.exists(arrow_path):
+        return None
+
+    recorded = meta.get('keys', {})
+    if key_column not in recorded:
+        with pa.memory_map(arrow_path, 'r') as source:
+            column = pa_ipc.open_file(source).read_all().select([key_column]).column(0)
+            recorded[key_column] = sorted(month_keys(column.to_pandas()))
+        meta['keys'] = recorded
+        _write_meta(meta_path, meta)
+    return set(recorded[key_column])
+
+
+# 已加载数据对应的列式缓存文件：主文件的缓存和参与合并的追加数据段的缓存（内容与load_cached_frame和
+# load_segment_frames读取的相同）。任何一个缓存不存在或已过期时返回空列表，调用方应改用内存中的数据
+def cached_files(file_path, key_column, version=1):
+    keys = cached_month_keys(file_path, key_column, version)
+    if keys is None:
+        return []
+
+    files = [cache_paths(file_path)[0]]
+    _, directory = segment_paths(file_path)
+    for segment in read_segment_index(file_path):
+        if set(segment['months']) & keys:
+            continue
+        segment_path = valid_cache_file(os.path.join(directory, segment['file']), version)
+        if segment_path is None:
+            return []
+        files.append(segment_path)
+    return files
+
+
+# 读取所有追加的数据段；与主文件月份重叠的段（主文件已包含这些月份）会被跳过
+def load_segment_frames(file_path, build, existing_keys=(), version=1):
+    _, directory = segment_paths(file_path)
+    frames = []
+    for segment in read_segment_index(file_path):
+        if set(segment['months']) & set(existing_keys):
+            print(f"追加数据 {segment['name']} 的月份已包含在主文件中，跳过")
+            continue
+        frames.append(load_cached_frame(os.path.join(directory, segment['file']), build, version))
+    return frames
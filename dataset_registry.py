@@ -0,0 +1,139 @@
+import hashlib
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from data_cache import CACHE_DIR_NAME, file_fingerprint, read_segment_index
+from memo_cache import ByteLRUCache, estimate_nbytes
+
+# 本地数据文件名中的季度前缀，例如 Q1xlsx.xlsx -> Q1
+DATASET_NAME_PATTERN = re.compile(r'^(Q\d)', re.IGNORECASE)
+
+
+# 在目录中查找按季度命名的Excel文件，返回 {数据集名称: 文件路径}
+def discover_datasets(directory='.', pattern=DATASET_NAME_PATTERN):
+    datasets = {}
+    for name in sorted(os.listdir(directory)):
+        match = pattern.match(name)
+        if match and name.lower().endswith(('.xlsx', '.xls')):
+            datasets.setdefault(match.group(1).upper(), os.path.join(directory, name))
+    return datasets
+
+
+# 本地文件的版本标记：文件大小、修改时间和已追加的数据段数，变化时需要重新加载
+def file_version(file_path):
+    fingerprint = file_fingerprint(file_path, with_hash=False)
+    return fingerprint['size'], fingerprint['mtime_ns'], len(read_segment_index(file_path))
+
+
+# 把上传的文件按内容哈希保存到缓存目录，相同内容只保存一次，返回(数据集名称, 文件路径)
+def save_upload(data, file_name, directory='.'):
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    upload_dir = os.path.join(directory, CACHE_DIR_NAME, 'uploads')
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, digest + os.path.splitext(file_name)[1].lower())
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return f"{file_name} ({digest[:8]})", path
+
+
+# 数据集注册表：按名称登记加载函数，已加载的数据集常驻内存，超过字节预算时淘汰最久未使用的
+# 同一名称的版本标记变化时丢弃旧数据，下次访问重新加载
+# 由数据集派生的结构（例如筛选索引）与数据集一起常驻、一起计入预算、一起淘汰
+# 最近使用的数据集始终常驻：单个数据集超过预算时淘汰其他数据集，不会在同一次刷新中反复加载
+class DatasetRegistry:
+    def __init__(self, max_bytes):
+        self._loaders = {}
+        self._info = {}
+        self._resident = ByteLRUCache(max_bytes=max_bytes, keep_newest=True)
+        self._lock = threading.RLock()
+
+    @property
+    def max_bytes(self):
+        return self._resident.max_bytes
+
+    def register(self, name, loader, version=None):
+        with self._lock:
+            previous = self._loaders.get(name)
+            if previous is not None and previous[1] != version:
+                self._resident.pop(name)
+                self._info.pop(name, None)
+            self._loaders[name] = (loader, version)
+
+    def names(self):
+        with self._lock:
+            return list(self._loaders)
+
+    def is_resident(self, name):
+        return name in self._resident
+
+    def invalidate(self, name):
+        with self._lock:
+            self._resident.pop(name)
+            self._info.pop(name, None)
+
+    def _entry(self, name):
+        entry = self._resident.get(name)
+        if entry is not None:
+            return entry
+        loader, _ = self._loaders[name]
+        start = time.perf_counter()
+        df = loader()
+        entry = {'frame': df, 'derived': {}}
+        nbytes = estimate_nbytes(df)
+        self._info[name] = {'rows': len(df), 'bytes': nbytes, 'load_seconds': time.perf_counter() - start}
+        self._resident.put(name, entry, nbytes)
+        return entry
+
+    def get(self, name):
+        with self._lock:
+            return self._entry(name)['frame']
+
+    # 取数据集的派生结构，不存在时用build(df)构建并把其大小计入该数据集
+    def derived(self, name, key, build):
+        with self._lock:
+            entry = self._entry(name)
+            if key not in entry['derived']:
+                value = build(entry['frame'])
+                entry['derived'][key] = value
+                self._info[name]['bytes'] += estimate_nbytes(value)
+                self._resident.put(name, entry, self._info[name]['bytes'])
+            return entry['derived'][key]
+
+    # 各数据集的内存占用，已淘汰的数据集保留上次加载时的大小
+    def footprint(self):
+        with self._lock:
+            rows = []
+            for name in self._loaders:
+                info = self._info.get(name)
+                if info is None:
+                    rows.append({'数据集': name, '行数': None, '内存(MB)': None, '加载用时(秒)': None,
+                                 '状态': '未加载'})
+                    continue
+                if name not in self._resident:
+                    status = '已淘汰'
+                elif info['bytes'] > self.max_bytes:
+                    status = '常驻内存（超出预算）'
+                else:
+                    status = '常驻内存'
+                rows.append({
+                    '数据集': name,
+                    '行数': info['rows'],
+                    '内存(MB)': round(info['bytes'] / 1024 / 1024, 2),
+                    '加载用时(秒)': round(info['load_seconds'], 2),
+                    '状态': status
+                })
+            return pd.DataFrame(rows, columns=['数据集', '行数', '内存(MB)', '加载用时(秒)', '状态'])
+
+    def resident_bytes(self):
+        return self._resident.total_bytes
+
+    # 常驻数据的总大小是否超过预算（只有单个数据集本身就超过预算时才会发生）
+    def over_budget(self):
+        return self._resident.total_bytes > self.max_bytes
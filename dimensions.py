@@ -0,0 +1,67 @@
+import pandas as pd
+
+# 需要编码为分类类型的维度列
+DIMENSION_COLUMNS = ['所属区域', '客户简称', '产品代码', '申请人', '省份', '城市', '经销商名称', '物料名称']
+
+
+def _sorted_categories(values):
+    try:
+        return sorted(values)
+    except TypeError:
+        # 混合类型（例如数字和字符串）时按字符串排序
+        return sorted(values, key=str)
+
+
+# 为多个DataFrame中出现的同名维度列构建共享的分类字典（类别按值排序，结果稳定）
+def shared_dimension_dtypes(frames, columns=DIMENSION_COLUMNS):
+    dtypes = {}
+    for column in columns:
+        values = set()
+        for df in frames:
+            if column in df.columns:
+                series = df[column]
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    values.update(series.cat.categories)
+                else:
+                    values.update(series.dropna().unique())
+        if values:
+            dtypes[column] = pd.CategoricalDtype(_sorted_categories(values))
+    return dtypes
+
+
+# 把列转换为给定的分类类型。CategoricalDtype的相等比较不考虑类别顺序，已经是分类类型的列
+# 用astype不会按新的类别顺序重排，需要用set_categories
+def _as_dtype(series, dtype):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if series.cat.categories.equals(dtype.categories):
+            return series
+        return series.cat.set_categories(dtype.categories)
+    return series.astype(dtype)
+
+
+# 加载时把维度列转换为共享分类字典的categorical，后续isin/groupby/merge都在整数编码上进行
+# 直接在传入的DataFrame上修改，按传入顺序返回
+def encode_dimensions(*frames, columns=DIMENSION_COLUMNS):
+    dtypes = shared_dimension_dtypes(frames, columns)
+    for df in frames:
+        for column, dtype in dtypes.items():
+            if column in df.columns:
+                df[column] = _as_dtype(df[column], dtype)
+    return list(frames)
+
+
+# 纵向拼接多个DataFrame：各表中都是分类类型的同名列先合并类别字典，拼接后仍是分类类型
+# （直接拼接类别不同的分类列会退化为object）。不修改传入的DataFrame
+def concat_frames(frames):
+    frames = [df.copy(deep=False) for df in frames]
+    for column in frames[0].columns:
+        dtypes = [df[column].dtype for df in frames if column in df.columns]
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        # 类别相同但顺序不同时也要统一（dtype相等比较不考虑类别顺序）
+        if any(not dtype.categories.equals(dtypes[0].categories) for dtype in dtypes[1:]):
+            dtype = pd.CategoricalDtype(_sorted_categories(set().union(*(dtype.categories for dtype in dtypes))))
+            for df in frames:
+                if column in df.columns:
+                    df[column] = _as_dtype(df[column], dtype)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,144 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+# 与pd.read_excel默认一致的空值字符串
+NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+DEFAULT_CHUNK_ROWS = 50000
+
+
+# 单元格取值转换，规则与pandas的openpyxl读取器保持一致
+def convert_value(value):
+    if value is None:
+        return np.nan
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        if value.is_integer():
+            return int(value)
+        return value
+    if isinstance(value, str):
+        if value in NA_STRINGS:
+            return np.nan
+        # 维度列大量重复，驻留字符串避免每行各存一份
+        return sys.intern(value)
+    return value
+
+
+# 生成列名，处理空表头和重复表头（与read_excel相同的命名方式）
+def make_column_names(header):
+    names = []
+    seen = {}
+    for i, name in enumerate(header):
+        if name is None or (isinstance(name, str) and name == ''):
+            name = f"Unnamed: {i}"
+        elif isinstance(name, float) and name.is_integer():
+            name = int(name)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(name if count == 0 else f"{name}.{count}")
+    return names
+
+
+# 打印读取进度（可被进程池pickle）
+def print_progress(rows_read, total_rows):
+    if total_rows:
+        print(f"已读取 {rows_read}/{total_rows} 行 ({rows_read / total_rows * 100:.1f}%)")
+    else:
+        print(f"已读取 {rows_read} 行")
+
+
+# 把一个行块转换为按列的类型化Series
+def rows_to_columns(rows, width):
+    columns = []
+    for j in range(width):
+        values = [row[j] if j < len(row) else np.nan for row in rows]
+        columns.append(pd.Series(values))
+    return columns
+
+
+# 合并同一列的多个块，块之间类型不一致时统一推断
+def concat_column(chunks, name):
+    if not chunks:
+        return pd.Series([], dtype=object, name=name)
+    column = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    if column.dtype == object:
+        column = column.infer_objects()
+    column.name = name
+    return column
+
+
+# 流式读取Excel：按固定行数分块构建类型化列，峰值内存接近最终DataFrame大小
+# memory_limit_mb超出时抛出MemoryError，progress(rows_read, total_rows)用于报告进度
+def read_excel_streaming(file_path, sheet_name=0, chunk_rows=DEFAULT_CHUNK_ROWS, memory_limit_mb=None,
+                         progress=None):
+    from openpyxl import load_workbook
+
+    if hasattr(file_path, 'seek'):
+        file_path.seek(0)
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            sheet = workbook.worksheets[sheet_name]
+        else:
+            sheet = workbook[sheet_name]
+        sheet.reset_dimensions()
+
+        row_iter = sheet.iter_rows(values_only=True)
+        header = None
+        for row in row_iter:
+            if any(value is not None for value in row):
+                header = list(row)
+                break
+        if header is None:
+            return pd.DataFrame()
+
+        # 去掉表头右侧的空列
+        while header and header[-1] is None:
+            header.pop()
+        names = make_column_names(header)
+        width = len(names)
+        total_rows = (sheet.max_row - 1) if sheet.max_row else None
+
+        memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        column_chunks = [[] for _ in range(width)]
+        used_bytes = 0
+        rows_read = 0
+        buffer = []
+
+        def flush():
+            nonlocal used_bytes
+            for j, column in enumerate(rows_to_columns(buffer, width)):
+                column_chunks[j].append(column)
+                used_bytes += column.memory_usage(index=False, deep=True)
+            buffer.clear()
+            if memory_limit and used_bytes > memory_limit:
+                raise MemoryError(
+                    f"流式读取已使用约 {used_bytes / 1024 / 1024:.1f}MB，超过内存上限 {memory_limit_mb}MB"
+                    f"（已读取 {rows_read} 行）")
+            if progress:
+                progress(rows_read, total_rows)
+
+        for row in row_iter:
+            if all(value is None for value in row[:width]):
+                continue  # 与read_excel一样跳过空行
+            buffer.append([convert_value(value) for value in row[:width]])
+            rows_read += 1
+            if len(buffer) >= chunk_rows:
+                flush()
+        if buffer:
+            flush()
+    finally:
+        workbook.close()
+
+    data = {}
+    for j, name in enumerate(names):
+        data[name] = concat_column(column_chunks[j], name)
+        # 合并完成后立即释放该列的块
+        column_chunks[j] = None
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+
+# 每行所属取值的编号（按字符串取值归并），缺失值为-1
+def _label_codes(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        labels = series.cat.categories.astype(str)
+    else:
+        codes, labels = pd.factorize(series)
+        labels = pd.Index(labels).astype(str)
+    # 不同取值转为字符串后相同时合并为同一个编号，与按字符串选择的筛选器一致
+    label_ids, unique_labels = pd.factorize(labels)
+    label_ids = np.append(label_ids, -1)
+    return label_ids[codes].astype(np.int32), list(unique_labels)
+
+
+# 维度筛选索引：为每个维度的每个取值预先建立有序行号数组
+# 筛选时从选中行数最少的维度开始取行号，其余维度只在这些行上查表，耗时与选中行数成正比
+class FilterIndex:
+    def __init__(self, df, columns):
+        self.n_rows = len(df)
+        self.columns = list(columns)
+        row_dtype = np.int32 if self.n_rows < 2 ** 31 else np.int64
+        self._codes = {}
+        self._labels = {}
+        self._postings = {}
+        self._complete = {}
+        for column in columns:
+            codes, labels = _label_codes(df[column])
+            order = np.argsort(codes, kind='stable').astype(row_dtype)
+            counts = np.bincount(codes + 1, minlength=len(labels) + 1)
+            bounds = np.cumsum(counts)
+            self._codes[column] = codes
+            self._labels[column] = {label: i for i, label in enumerate(labels)}
+            self._postings[column] = [order[bounds[i]:bounds[i + 1]] for i in range(len(labels))]
+            self._complete[column] = counts[0] == 0
+
+    @property
+    def nbytes(self):
+        total = sum(codes.nbytes for codes in self._codes.values())
+        # 各取值的行号数组是同一个排序数组的切片
+        total += sum(sum(p.nbytes for p in postings) for postings in self._postings.values())
+        return total
+
+    # 把选择转换为取值编号；全部取值都选中且没有缺失值时该维度不构成限制，返回None
+    def _selected_ids(self, column, values):
+        lookup = self._labels[column]
+        ids = sorted({lookup[str(value)] for value in values if str(value) in lookup})
+        if len(ids) == len(lookup) and self._complete[column]:
+            return None
+        return ids
+
+    # 返回满足所有选择的有序行号数组；没有任何限制时返回None表示全部行
+    # selections: {列名: 选中的取值列表}，空列表表示该维度不筛选
+    def row_ids(self, selections):
+        active = {}
+        for column, values in selections.items():
+            if not values:
+                continue
+            ids = self._selected_ids(column, values)
+            if ids is not None:
+                active[column] = ids
+        if not active:
+            return None
+
+        # 选中行数最少的维度作为起点
+        sizes = {column: sum(len(self._postings[column][i]) for i in ids) for column, ids in active.items()}
+        first = min(sizes, key=sizes.get)
+        postings = [self._postings[first][i] for i in active.pop(first)]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        rows = postings[0] if len(postings) == 1 else np.sort(np.concatenate(postings))
+
+        for column, ids in active.items():
+            selected = np.zeros(len(self._labels[column]) + 1, dtype=bool)
+            selected[ids] = True
+            # 编号-1（缺失值）落在最后一个位置，始终为False
+            rows = rows[selected[self._codes[column][rows]]]
+        return rows
+
+    # 按选择取出数据；没有限制时直接返回原DataFrame（不复制），调用方不应原地修改结果
+    def apply(self, df, selections):
+        rows = self.row_ids(selections)
+        if rows is None:
+            return df
+        return df.take(rows)
+
+
+# 按月份列稳定排序并重建行号，缺失的月份排在最后
+def sort_by_month(df, column='发运月份'):
+    return df.sort_values(column, kind='stable', na_position='last', ignore_index=True)
+
+
+# 月份偏移索引：数据按月份排序后，记录每个月份的起始行号
+# 日期范围通过二分查找得到连续的行区间，切片不复制数据
+class MonthIndex:
+    def __init__(self, df, column='发运月份'):
+        values = df[column].to_numpy()
+        valid = len(values) - int(pd.isna(values).sum())
+        if np.any(pd.isna(values[:valid])) or np.any(values[1:valid] < values[:valid - 1]):
+            raise ValueError(f"数据未按 '{column}' 排序，请先调用 sort_by_month")
+        self.months, self.offsets = np.unique(values[:valid], return_index=True)
+        self.offsets = np.append(self.offsets, valid)
+
+    @property
+    def nbytes(self):
+        return self.months.nbytes + self.offsets.nbytes
+
+    # 起止日期（含）对应的行区间[start, stop)
+    def bounds(self, start_date, end_date):
+        first = np.searchsorted(self.months, np.datetime64(pd.Timestamp(start_date)), side='left')
+        last = np.searchsorted(self.months, np.datetime64(pd.Timestamp(end_date)), side='right')
+        if last <= first:
+            return 0, 0
+        return int(self.offsets[first]), int(self.offsets[last])
+
+    def slice(self, df, start_date, end_date):
+        start, stop = self.bounds(start_date, end_date)
+        return df.iloc[start:stop]
+
+
+# 把区域、省份和日期选择规整为可作缓存键的元组：选项去重排序，未选择时为None，日期统一为Timestamp
+def normalize_filters(regions=None, provinces=None, start_date=None, end_date=None):
+    return (tuple(sorted(set(regions), key=str)) if regions else None,
+            tuple(sorted(set(provinces), key=str)) if provinces else None,
+            (pd.Timestamp(start_date), pd.Timestamp(end_date)) if start_date and end_date else None)
+
+
+# 按日期、区域和省份筛选：有月份偏移索引时先取连续的行区间（不复制），区域和省份只在区间内判断
+# region_columns/province_columns可以有多列（例如关联表两侧各一列），每一列都要满足
+def filter_frame(df, month_index=None, regions=None, provinces=None, start_date=None, end_date=None,
+                 region_columns=('所属区域',), province_columns=('省份',)):
+    filtered_df = df
+
+    if start_date and end_date:
+        if month_index is not None:
+            filtered_df = month_index.slice(df, start_date, end_date)
+        else:
+            filtered_df = filtered_df[(filtered_df['发运月份'] >= pd.to_datetime(start_date)) &
+                                      (filtered_df['发运月份'] <= pd.to_datetime(end_date))]
+
+    mask = None
+    for columns, values in ((region_columns, regions), (province_columns, provinces)):
+        if not values:
+            continue
+        for column in columns:
+            column_mask = filtered_df[column].isin(values).to_numpy()
+            mask = column_mask if mask is None else mask & column_mask
+
+    if mask is not None:
+        filtered_df = filtered_df[mask]
+
+    return filtered_df
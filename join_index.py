@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# 物料与销售数据的关联键
+JOIN_KEYS = ['发运月份', '客户代码']
+
+
+# 两侧取值是否相同；与pd.merge一致，两侧都是缺失值也视为相同
+def _same_value(left, right, left_pairs, right_pairs):
+    if (isinstance(left.dtype, pd.CategoricalDtype) and isinstance(right.dtype, pd.CategoricalDtype) and
+            left.cat.categories.equals(right.cat.categories)):
+        # 同一套类别且顺序相同时直接比较整数编码（缺失值编码都是-1）；dtype相等比较不考虑类别顺序，不能用来判断
+        return left.cat.codes.to_numpy()[left_pairs] == right.cat.codes.to_numpy()[right_pairs]
+    left_values = left.to_numpy()[left_pairs]
+    right_values = right.to_numpy()[right_pairs]
+    return (left_values == right_values) | (pd.isna(left_values) & pd.isna(right_values))
+
+
+# 两张表按关联键的持久索引：加载时为每个键组合（例如每个客户每个月）分配整数组号，
+# 并记录右表每组行号的起止位置。关联时按组号直接取出配对的行号，不再对键做哈希和合并。
+# 两张表都必须使用从0开始的默认行号索引，传给link的筛选结果是它们的子集。
+class JoinIndex:
+    def __init__(self, left, right, keys=JOIN_KEYS):
+        if not (left.index.equals(pd.RangeIndex(len(left))) and right.index.equals(pd.RangeIndex(len(right)))):
+            raise ValueError("关联索引要求数据使用默认的整数行号索引")
+        self.keys = list(keys)
+        self.left = left
+        self.right = right
+
+        group_ids = pd.concat([left[self.keys], right[self.keys]], ignore_index=True).groupby(
+            self.keys, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+        self.n_groups = int(group_ids.max()) + 1 if len(group_ids) else 0
+        self.left_ids = group_ids[:len(left)]
+        self.right_ids = group_ids[len(left):]
+
+        # 右表行号按组号排列（组内保持原顺序），以及每组的起始位置
+        self.right_order = np.argsort(self.right_ids, kind='stable')
+        self.right_offsets = self._offsets(self.right_ids)
+
+    def _offsets(self, ids):
+        return np.concatenate([[0], np.cumsum(np.bincount(ids, minlength=self.n_groups))])
+
+    @property
+    def nbytes(self):
+        return self.left_ids.nbytes + self.right_ids.nbytes + self.right_order.nbytes + self.right_offsets.nbytes
+
+    # 返回配对的(左表行号, 右表行号)，顺序与pd.merge(how='inner')相同：按左表顺序，每行依次配上右表同组的行
+    # left_rows/right_rows为参与关联的行号子集，None表示全部行
+    def pairs(self, left_rows=None, right_rows=None):
+        if left_rows is None:
+            left_rows = np.arange(len(self.left))
+        if right_rows is None:
+            order, offsets = self.right_order, self.right_offsets
+        else:
+            selected = np.zeros(len(self.right), dtype=bool)
+            selected[right_rows] = True
+            order = self.right_order[selected[self.right_order]]
+            offsets = self._offsets(self.right_ids[order])
+
+        groups = self.left_ids[left_rows]
+        counts = offsets[groups + 1] - offsets[groups]
+        left_pairs = np.repeat(left_rows, counts)
+        # 每个左表行对应右表同组行的连续区间
+        starts = np.repeat(offsets[groups] - (np.cumsum(counts) - counts), counts)
+        right_pairs = order[starts + np.arange(len(left_pairs))]
+        return left_pairs, right_pairs
+
+    # 生成关联表，结果与 pd.merge(left_frame[left_columns], right_frame[right_columns], on=keys + extra_keys) 相同
+    # left_frame/right_frame是建索引时两张表的筛选结果；extra_keys为额外要求相等的列
+    def link(self, left_frame, right_frame, left_columns, right_columns, extra_keys=()):
+        left_rows = None if left_frame is self.left else left_frame.index.to_numpy()
+        right_rows = None if right_frame is self.right else right_frame.index.to_numpy()
+        left_pairs, right_pairs = self.pairs(left_rows, right_rows)
+
+        on = self.keys + list(extra_keys)
+        for column in extra_keys:
+            same = _same_value(self.left[column], self.right[column], left_pairs, right_pairs)
+            left_pairs, right_pairs = left_pairs[same], right_pairs[same]
+
+        right_only = [column for column in right_columns if column not in on]
+        overlap = set(left_columns) & set(right_only)
+        data = {}
+        for column in left_columns:
+            name = column + '_x' if column in overlap else column
+            data[name] = self.left[column].take(left_pairs).reset_index(drop=True)
+        for column in right_only:
+            name = column + '_y' if column in overlap else column
+            data[name] = self.right[column].take(right_pairs).reset_index(drop=True)
+        return pd.DataFrame(data)
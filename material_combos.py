@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+# 位掩码每个字的位数
+WORD_BITS = 64
+
+
+# 物料组合的整数编码：每个分组（例如每个客户每月）使用的物料集合表示为物料字典上的位掩码，
+# 相同集合的分组得到相同的组合编号。分组和组合上的汇总都按整数编号进行，名称只在展示时解码
+class Combinations:
+    def __init__(self, frame: pd.DataFrame, group_columns, item_column):
+        # 分组编号按分组列排序（与groupby默认一致），分组列缺失的行不属于任何分组
+        group_ids = frame.groupby(group_columns, observed=True).ngroup().to_numpy()
+        item_codes, labels = pd.factorize(frame[item_column])
+        valid = group_ids >= 0
+        self.group_ids = group_ids
+        self.labels = pd.Index(labels)
+        self.n_groups = int(group_ids.max()) + 1 if valid.any() else 0
+
+        # 每个分组的位掩码：组内各物料的位按位或
+        valid &= item_codes >= 0
+        items = item_codes[valid].astype(np.int64)
+        masks = np.zeros((self.n_groups, max(1, -(-len(self.labels) // WORD_BITS))), dtype=np.uint64)
+        np.bitwise_or.at(masks, (group_ids[valid], items // WORD_BITS),
+                         np.left_shift(np.uint64(1), (items % WORD_BITS).astype(np.uint64)))
+        self.masks, combo_ids = np.unique(masks, axis=0, return_inverse=True)
+        self.combo_ids = np.asarray(combo_ids).reshape(-1)
+
+    # 每个分组上的汇总，按分组编号排列
+    def group_values(self, values, func):
+        values = pd.Series(np.asarray(values))
+        valid = self.group_ids >= 0
+        return values[valid].groupby(self.group_ids[valid]).agg(func).to_numpy()
+
+    # 组合的名称：组合中的物料按名称排序后用separator连接
+    def names(self, combos, separator=' + '):
+        names = []
+        for mask in self.masks[np.asarray(combos, dtype=np.int64)]:
+            bits = np.unpackbits(mask.astype('<u8').view(np.uint8), bitorder='little')
+            names.append(separator.join(sorted(str(label) for label in self.labels[np.flatnonzero(bits)])))
+        return names
+
+    # 各组合上对分组汇总值的统计（组合编号为索引），aggs与Series.agg相同
+    def combo_stats(self, group_values, aggs) -> pd.DataFrame:
+        return pd.Series(group_values).groupby(self.combo_ids).agg(aggs)
+
+
+# 按名称排序后再按sort_column从大到小排列（与先按名称分组再排序的顺序一致）
+def rank_by_name(stats: pd.DataFrame, names, sort_column, name_column='物料组合') -> pd.DataFrame:
+    stats = stats.copy()
+    stats.insert(0, name_column, np.array(names, dtype=object))
+    stats = stats.sort_values(name_column, ignore_index=True)
+    return stats.sort_values(sort_column, ascending=False)
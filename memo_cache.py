@@ -0,0 +1,137 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# 估算对象占用的内存字节数（DataFrame按实际列内存计算）
+def estimate_nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray) or hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(item) for item in value.values()) + sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_nbytes(item) for item in value) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+
+# 数据内容的摘要（列名、类型和逐行哈希），内容相同的数据得到相同的摘要，可用作缓存键中的数据集标识
+def frame_digest(df):
+    digest = hashlib.sha1()
+    digest.update(repr([(str(column), str(dtype)) for column, dtype in df.dtypes.items()]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+# 按字节预算和条目数上限做LRU淘汰的缓存，线程安全，并统计命中率
+class ByteLRUCache:
+    # keep_newest: 最近使用的条目始终保留，即使单独超过预算（用于当前正在使用、淘汰后马上又要重新加载的数据）
+    def __init__(self, max_bytes=None, max_entries=None, sizeof=estimate_nbytes, keep_newest=False):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.keep_newest = keep_newest
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.RLock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, nbytes=None):
+        if nbytes is None:
+            nbytes = self.sizeof(value)
+        with self._lock:
+            if not self.keep_newest and self.max_bytes is not None and nbytes > self.max_bytes:
+                # 单个条目超过预算时不缓存，已缓存的同一个键保持不变
+                return value
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            self._evict()
+        return value
+
+    # 取缓存值，不存在时计算并缓存；同一个键同时只计算一次，其他线程等待并共享结果
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                return self.get(key)
+            key_lock = self._pending.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    return self.get(key)
+                self.misses += 1
+            try:
+                return self.put(key, compute())
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, nbytes = self._entries.pop(key)
+            self.total_bytes -= nbytes
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _evict(self):
+        while len(self._entries) > (1 if self.keep_newest else 0) and (
+                (self.max_bytes is not None and self.total_bytes > self.max_bytes) or
+                (self.max_entries is not None and len(self._entries) > self.max_entries)):
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.total_bytes -= nbytes
+            self.evictions += 1
+
+    # 各条目占用的字节数，按最近使用从旧到新排列
+    def sizes(self):
+        with self._lock:
+            return [(key, nbytes) for key, (_, nbytes) in self._entries.items()]
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hit_rate
+            }
@@ -0,0 +1,165 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+# 分区内记录原始行号的列，用于合并后恢复与单进程计算相同的行顺序
+POSITION_COLUMN = '__position__'
+FIRST_COLUMN = '__first__'
+
+# 可以分区计算再合并的汇总方式
+MERGEABLE_FUNCS = ('sum', 'count', 'size', 'min', 'max', 'mean', 'nunique')
+
+# 共享的进程池：第一次使用时创建，之后的调用复用已启动的进程，解释器退出时关闭
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+# 每行所属的分区号：按列取值的哈希对分区数取模，同一取值总在同一分区（不同表之间也一致）
+def partition_ids(series, partitions):
+    hashes = pd.util.hash_pandas_object(series, index=False).to_numpy()
+    return (hashes % np.uint64(partitions)).astype(np.int64)
+
+
+# 按列取值把一个或多个表切分为partitions份，返回 [[各表的第i份], ...]，空分区跳过
+# 每份都带有原始行号列，用于合并时恢复顺序
+def partition_frames(frames, column, partitions):
+    ids = [partition_ids(df[column], partitions) for df in frames]
+    orders = [np.argsort(part_ids, kind='stable') for part_ids in ids]
+    bounds = [np.searchsorted(part_ids[order], np.arange(partitions + 1)) for part_ids, order in zip(ids, orders)]
+
+    parts = []
+    for i in range(partitions):
+        part = []
+        for df, order, bound in zip(frames, orders, bounds):
+            rows = order[bound[i]:bound[i + 1]]
+            piece = df.take(rows)
+            piece[POSITION_COLUMN] = rows
+            part.append(piece)
+        if any(len(piece) for piece in part):
+            parts.append(part)
+    return parts
+
+
+# 取共享进程池，进程数至少为workers（默认按CPU核心数创建，需要更多进程时重建）
+def get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                # 正在执行的任务继续完成，旧进程随后退出
+                _pool.shutdown(wait=False)
+            _pool_workers = max(workers, os.cpu_count() or 1)
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers)
+        return _pool
+
+
+# 丢弃进程池（pool为None时丢弃当前的进程池），下次使用时重新创建；返回被丢弃的进程池
+def _discard_pool(pool=None):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if pool is None or _pool is pool:
+            pool, _pool, _pool_workers = _pool, None, 0
+            return pool
+    return None
+
+
+def shutdown_pool():
+    pool = _discard_pool()
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_pool)
+
+
+# 在共享进程池中对每个分区执行func(*part)，按分区顺序返回结果；workers<=1或只有一个分区时在当前进程执行
+# 同时执行的任务数不超过分区数，调用方按workers切分分区即可限制并行度；func必须是可被pickle的模块级函数
+def map_partitions(func, parts, workers):
+    if workers <= 1 or len(parts) <= 1:
+        return [func(*part) for part in parts]
+    pool = get_pool(workers)
+    try:
+        return list(pool.map(func, *zip(*parts)))
+    except BrokenProcessPool:
+        # 工作进程异常退出后进程池不能再用，下次调用时重新创建
+        _discard_pool(pool)
+        raise
+
+
+def resolve_workers(workers):
+    return workers if workers else os.cpu_count() or 1
+
+
+# 单个分区的部分汇总：每个分组一行，各指标保存可合并的中间值
+# nunique保存分组内去重后的(分组, 取值)对，合并时去重后计数即为精确的去重数
+def partial_aggregate(frame, keys, aggs, dropna=True):
+    grouped = frame.groupby(keys, observed=True, dropna=dropna, sort=False)
+    named = {FIRST_COLUMN: (POSITION_COLUMN, 'min')}
+    distinct = {}
+    for output, (column, func) in aggs.items():
+        if func == 'mean':
+            named[output + '#sum'] = (column, 'sum')
+            named[output + '#count'] = (column, 'count')
+        elif func == 'nunique':
+            pairs = frame[keys + [column]].dropna(subset=keys + [column] if dropna else [column]).drop_duplicates()
+            distinct[output] = pairs.rename(columns={column: output})
+        elif func == 'size':
+            named[output] = (POSITION_COLUMN, 'size')
+        else:
+            named[output] = (column, func)
+    return grouped.agg(**named).reset_index(), distinct
+
+
+# 合并各分区的部分汇总：sum/count/size相加，min/max取极值，mean由合计和计数求得，nunique合并去重对后计数
+# sort=True时按分组列排序（与groupby默认一致），否则按各分组在原数据中首次出现的顺序
+def merge_partials(partials, keys, aggs, dropna=True, sort=True):
+    frames = [frame for frame, _ in partials]
+    combined = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    named = {FIRST_COLUMN: (FIRST_COLUMN, 'min')}
+    for output, (column, func) in aggs.items():
+        if func == 'mean':
+            named[output + '#sum'] = (output + '#sum', 'sum')
+            named[output + '#count'] = (output + '#count', 'sum')
+        elif func in ('sum', 'count', 'size'):
+            named[output] = (output, 'sum')
+        elif func in ('min', 'max'):
+            named[output] = (output, func)
+    merged = combined.groupby(keys, observed=True, dropna=dropna, sort=False).agg(**named).reset_index()
+
+    for output, (column, func) in aggs.items():
+        if func == 'mean':
+            merged[output] = merged.pop(output + '#sum') / merged.pop(output + '#count')
+        elif func == 'nunique':
+            pairs = pd.concat([distinct[output] for _, distinct in partials], ignore_index=True).drop_duplicates()
+            counts = pairs.groupby(keys, observed=True, dropna=dropna, sort=False).size().rename(output).reset_index()
+            merged = merged.merge(counts, on=keys, how='left')
+            merged[output] = merged[output].fillna(0).astype(np.int64)
+
+    merged = merged.sort_values(FIRST_COLUMN, kind='stable', ignore_index=True)
+    if sort:
+        merged = merged.sort_values(keys, kind='stable', na_position='last', ignore_index=True)
+    return merged[keys + list(aggs)]
+
+
+# 分区并行的分组汇总，等价于 df.groupby(keys, observed=True, dropna=dropna, sort=sort).agg(**aggs).reset_index()
+# aggs: {输出列: (列名, 汇总方式)}，汇总方式见MERGEABLE_FUNCS；按partition_column的哈希分区
+# 分区列是分组列之一时每个分组只落在一个分区，结果与单进程计算完全相同；否则浮点合计的末位可能不同
+def parallel_groupby(df, keys, aggs, partition_column, workers=None, partitions=None, dropna=True, sort=True):
+    keys = list(keys)
+    workers = resolve_workers(workers)
+    # 只把用到的列发送给工作进程，减少序列化的数据量
+    columns = list(dict.fromkeys(keys + [column for column, _ in aggs.values()] + [partition_column]))
+    parts = partition_frames([df[columns]], partition_column, partitions or workers)
+    tasks = [(part[0], keys, aggs, dropna) for part in parts]
+    if not tasks:
+        empty = df.iloc[:0].copy()
+        empty[POSITION_COLUMN] = np.empty(0, dtype=np.int64)
+        tasks = [(empty, keys, aggs, dropna)]
+    partials = map_partitions(partial_aggregate, tasks, workers)
+    return merge_partials(partials, keys, aggs, dropna=dropna, sort=sort)
@@ -9,6 +9,20 @@ import seaborn as sns
 from io import BytesIO
 import re
 import os
+from functools import partial
+
+from data_cache import (load_cached_frame, load_segment_frames, append_segment, read_segment_index,
+                        month_keys, cached_files)
+from dimensions import encode_dimensions
+from schema import SALES_SCHEMA, coerce_schema
+from excel_stream import read_excel_streaming
+from dataset_registry import DatasetRegistry, discover_datasets, file_version, save_upload
+from filter_index import FilterIndex
+import sql_backend
+from memo_cache import ByteLRUCache, frame_digest
+import analytics
+from analytics import FilterSpec
+from cooccurrence import top_partners
 
 # 设置页面配置
 st.set_page_config(
@@ -155,27 +169,91 @@ def format_yuan(value):
         return f"{value:,.0f}元"
 
 
-# 加载数据函数
+# 解析销售Excel并计算派生列
+def parse_sales_workbook(file_path, streaming=False, memory_limit_mb=None, progress=None):
+    if streaming and not (isinstance(file_path, str) and file_path.endswith('.xls')):
+        # 大文件流式读取，限制峰值内存
+        df = read_excel_streaming(file_path, memory_limit_mb=memory_limit_mb, progress=progress)
+    else:
+        df = pd.read_excel(file_path)
+
+    # 按声明的结构统一转换列类型（发运月份按明确格式解析），不符合时报告具体问题
+    coerce_schema(df, SALES_SCHEMA, "销售")
+
+    # 数据预处理
+    df['销售额'] = df['单价（箱）'] * df['数量（箱）']
+
+    # 添加简化产品名称列
+    df['简化产品名称'] = simplify_product_names(df)
+
+    # 维度列编码为分类类型
+    encode_dimensions(df)
+
+    return df
+
+
+# 派生列逻辑变化时递增，使旧的列式缓存失效
+SALES_CACHE_VERSION = 4
+
+
+# 月度汇总（预聚合），追加数据时只对新月份计算
+def monthly_summary(df):
+    months = df['发运月份'].dt.strftime('%Y-%m')
+    summary = df.groupby(months.rename('月份')).agg(
+        行数=('销售额', 'size'),
+        销售额=('销售额', 'sum'),
+        客户数=('客户简称', 'nunique'),
+        产品数=('产品代码', 'nunique')
+    ).reset_index()
+    return summary
+
+
+# 追加新月份的数据文件到本地文件的列式缓存中
+def append_month_data(file_path, month_file):
+    base = load_cached_frame(file_path, parse_sales_workbook, version=SALES_CACHE_VERSION, key_column='发运月份')
+    return append_segment(file_path, month_file, parse_sales_workbook, '发运月份',
+                          existing_keys=month_keys(base['发运月份']), version=SALES_CACHE_VERSION,
+                          summarize=monthly_summary)
+
+
+# 已加载月份的汇总：主文件汇总一次，追加的月份直接使用追加时保存的汇总
 @st.cache_data
-def load_data(file_path=None):
+def load_month_summary(file_path):
+    base = load_cached_frame(file_path, parse_sales_workbook, version=SALES_CACHE_VERSION, key_column='发运月份')
+    summaries = [monthly_summary(base)]
+    base_months = month_keys(base['发运月份'])
+    for segment in read_segment_index(file_path):
+        if segment['summary'] and not set(segment['months']) & base_months:
+            summaries.append(pd.DataFrame(segment['summary']))
+    return pd.concat(summaries, ignore_index=True).sort_values('月份').reset_index(drop=True)
+
+
+# 加载数据函数（结果由数据集注册表按内存预算常驻，不再逐次复制）
+def load_data(file_path=None, streaming=False, memory_limit_mb=None):
     # 如果提供了文件路径，从文件加载
     if file_path:
         try:
-            df = pd.read_excel(file_path)
-            # 数据预处理
-            df['销售额'] = df['单价（箱）'] * df['数量（箱）']
-
-            # 确保发运月份是日期类型
-            try:
-                df['发运月份'] = pd.to_datetime(df['发运月份'])
-            except:
-                pass
-
-            # 添加简化产品名称列
-            df['简化产品名称'] = df.apply(lambda row: get_simplified_product_name(row['产品代码'], row['产品名称']),
-                                          axis=1)
-
-            return df
+            progress = None
+            if streaming:
+                progress_bar = st.progress(0.0, text="正在流式读取数据...")
+
+                def progress(rows_read, total_rows):
+                    if total_rows:
+                        progress_bar.progress(min(rows_read / total_rows, 1.0),
+                                              text=f"正在流式读取数据... {rows_read:,}/{total_rows:,} 行")
+
+            parse = partial(parse_sales_workbook, streaming=streaming, memory_limit_mb=memory_limit_mb,
+                            progress=progress)
+            if isinstance(file_path, str):
+                # 本地文件使用列式缓存，只有源文件变化时才重新解析Excel
+                df = load_cached_frame(file_path, parse, version=SALES_CACHE_VERSION, key_column='发运月份')
+                # 合并按月追加的数据段，各段有自己的缓存，不重新解析历史数据
+                segments = load_segment_frames(file_path, parse, existing_keys=month_keys(df['发运月份']),
+                                               version=SALES_CACHE_VERSION)
+                if segments:
+                    df = pd.concat(encode_dimensions(df, *segments), ignore_index=True)
+                return df
+            return parse(file_path)
         except Exception as e:
             st.error(f"文件加载失败: {str(e)}。使用示例数据进行演示。")
             return load_sample_data()
@@ -184,6 +262,10 @@ def load_data(file_path=None):
         return load_sample_data()
 
 
+# 产品名称中的规格部分（数字和单位）
+PRODUCT_SPEC_PATTERN = re.compile(r'\d+\w*\s*')
+
+
 # 创建产品代码到简化产品名称的映射函数
 def get_simplified_product_name(product_code, product_name):
     # 从产品名称中提取关键部分
@@ -196,7 +278,7 @@ def get_simplified_product_name(product_code, product_name):
                 name_parts = name_parts.split(suffix)[0]
 
         # 去掉可能的数字和单位
-        simple_name = re.sub(r'\d+\w*\s*', '', name_parts).strip()
+        simple_name = PRODUCT_SPEC_PATTERN.sub('', name_parts).strip()
 
         # 始终包含产品代码以确保唯一性
         return f"{simple_name} ({product_code})"
@@ -205,6 +287,90 @@ def get_simplified_product_name(product_code, product_name):
         return product_code
 
 
+# 批量计算简化产品名称：只对不同的(产品代码, 产品名称)组合调用一次，再按行广播回去
+def simplify_product_names(df):
+    keys = ['产品代码', '产品名称']
+    group_ids = df.groupby(keys, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    unique_products = df.drop_duplicates(keys)
+    simplified = np.array([get_simplified_product_name(code, name)
+                           for code, name in zip(unique_products['产品代码'], unique_products['产品名称'])],
+                          dtype=object)
+    return pd.Series(simplified[group_ids], index=df.index)
+
+
+# 提取包装类型
+def extract_packaging(product_name):
+    """
+    提取产品名称中的包装类型，处理优先级从高到低
+    首先检查组合类型，然后检查单一类型
+    """
+    # 检查组合类型
+    if '分享装袋装' in product_name:
+        return '分享装袋装'
+    elif '分享装盒装' in product_name:
+        return '分享装盒装'
+
+    # 按包装大小分类（从大到小）
+    elif '随手包' in product_name:
+        return '随手包'
+    elif '迷你包' in product_name:
+        return '迷你包'
+    elif '分享装' in product_name:
+        return '分享装'
+
+    # 按包装形式分类
+    elif '袋装' in product_name:
+        return '袋装'
+    elif '盒装' in product_name:
+        return '盒装'
+
+    # 处理特殊规格
+    elif 'KG' in product_name or 'kg' in product_name:
+        if '1.5KG' in product_name or '1.5kg' in product_name:
+            return '大包装'
+        elif '2KG' in product_name or '2kg' in product_name:
+            return '大包装'
+        else:
+            return '散装'
+    elif 'G' in product_name:
+        match = re.search(r'(\d+)G', product_name)
+        if match:
+            weight = int(match.group(1))
+            if weight <= 50:
+                return '小包装'
+            elif weight <= 100:
+                return '中包装'
+            else:
+                return '大包装'
+
+    # 默认分类
+    return '其他'
+
+
+# 产品名称中的重量规格，例如250G、1.5KG
+PRODUCT_WEIGHT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(KG|kg|G|g)')
+
+
+# 提取产品重量（克），无法识别时返回NaN
+def extract_weight(product_name):
+    match = PRODUCT_WEIGHT_PATTERN.search(product_name)
+    if not match:
+        return np.nan
+    weight = float(match.group(1))
+    return weight * 1000 if match.group(2).lower() == 'kg' else weight
+
+
+# 构建产品维度表：每个产品代码一行，包含简化名称、包装类型、重量和是否新品
+# 只扫描一次数据，各标签页通过产品代码查表，不再逐行重复计算
+def build_product_dimension(df, new_products):
+    products = df.drop_duplicates('产品代码')[['产品代码', '产品名称', '简化产品名称']]
+    products = products.astype({'产品代码': object}).set_index('产品代码')
+    products['包装类型'] = [extract_packaging(name) for name in products['产品名称']]
+    products['重量(克)'] = [extract_weight(name) for name in products['产品名称']]
+    products['是否新品'] = products.index.isin(new_products)
+    return products
+
+
 # 创建示例数据（以防用户没有上传文件）
 @st.cache_data
 def load_sample_data():
@@ -238,6 +404,7 @@ def load_sample_data():
     }
 
     df = pd.DataFrame(data)
+    coerce_schema(df, SALES_SCHEMA, "示例")
     df['销售额'] = df['单价（箱）'] * df['数量（箱）']
 
     # 增加销售额的变化性，避免所有区域都有相同的销售额
@@ -249,45 +416,142 @@ def load_sample_data():
         mask = df['所属区域'] == region
         df.loc[mask, '销售额'] = df.loc[mask, '销售额'] * factor
 
-    df['简化产品名称'] = df.apply(lambda row: get_simplified_product_name(row['产品代码'], row['产品名称']), axis=1)
+    df['简化产品名称'] = simplify_product_names(df)
+    encode_dimensions(df)
     return df
 
 
 # 定义默认文件路径
 DEFAULT_FILE_PATH = "Q1xlsx.xlsx"
 
-# 侧边栏 - 上传文件区域
+# 常驻内存的数据集总大小上限 (MB)，超过时淘汰最久未使用的数据集
+DATASET_MEMORY_BUDGET_MB = 2048
+
+# 侧边栏筛选的维度列，为这些列建立行号索引
+FILTER_COLUMNS = ['所属区域', '客户简称', '产品代码', '申请人']
+
+# 各标签页计算结果缓存的字节预算（MB）和条目数上限
+RESULT_CACHE_MAX_MB = 256
+RESULT_CACHE_MAX_ENTRIES = 256
+
+
+# 已加载数据集的注册表，在所有会话之间共享，切换到常驻的数据集无需重新加载
+@st.cache_resource
+def get_dataset_registry():
+    return DatasetRegistry(max_bytes=DATASET_MEMORY_BUDGET_MB * 1024 * 1024)
+
+
+# 进程内的SQL计算引擎（需要安装duckdb），在所有会话之间共享；超出内存时溢写到temp_directory
+@st.cache_resource
+def get_sql_backend(temp_directory):
+    return sql_backend.DuckDBBackend(temp_directory=temp_directory)
+
+
+# 多进程的pandas计算引擎，客户级指标按客户分区并行汇总
+@st.cache_resource
+def get_parallel_backend():
+    return analytics.ParallelSalesMetrics()
+
+
+# 各标签页的计算结果缓存，在所有会话之间共享
+@st.cache_resource
+def get_result_cache():
+    return ByteLRUCache(max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024, max_entries=RESULT_CACHE_MAX_ENTRIES)
+
+
+# 侧边栏 - 数据集选择与上传
 st.sidebar.markdown('<div class="sidebar-header">数据导入</div>', unsafe_allow_html=True)
-use_default_file = st.sidebar.checkbox("使用默认文件", value=True, help="使用指定的本地文件路径")
-uploaded_file = st.sidebar.file_uploader("或上传Excel销售数据文件", type=["xlsx", "xls"], disabled=use_default_file)
+uploaded_file = st.sidebar.file_uploader("上传Excel销售数据文件", type=["xlsx", "xls"])
+use_streaming = st.sidebar.checkbox("大文件流式读取", value=False, help="分块读取Excel，降低内存峰值，适合几十万行以上的数据")
+memory_limit_mb = None
+if use_streaming:
+    memory_limit_mb = st.sidebar.number_input("内存上限 (MB)", min_value=64, value=1024, step=64,
+                                              help="读取过程中数据占用超过该值时停止加载")
+
+# 汇总计算引擎：默认使用pandas；多核机器上可选多进程pandas；安装duckdb后可选SQL引擎，多线程执行，超出内存时溢写磁盘
+engine_options = (['pandas'] + (['pandas（多进程）'] if (os.cpu_count() or 1) > 1 else [])
+                  + (['DuckDB'] if sql_backend.available() else []))
+compute_engine = st.sidebar.selectbox("计算引擎", engine_options,
+                                      help="数据量达到千万行时，DuckDB引擎的分组汇总更快且占用内存更少；"
+                                           "多进程pandas按客户分区在各核心上并行计算客户级指标")
+
+# 登记本地按季度命名的数据文件（Q1、Q2……），文件变化时版本标记随之变化
+registry = get_dataset_registry()
+local_datasets = discover_datasets()
+for dataset_name, dataset_path in local_datasets.items():
+    registry.register(dataset_name, partial(load_data, dataset_path, use_streaming, memory_limit_mb),
+                      version=file_version(dataset_path))
+
+# 上传的文件按内容哈希保存和命名，同一文件重复上传不会重复加载；只在上传它的会话中列出
+session_uploads = st.session_state.setdefault('uploaded_datasets', [])
+upload_paths = st.session_state.setdefault('uploaded_dataset_paths', {})
+uploaded_name = None
+if uploaded_file is not None:
+    uploaded_name, upload_path = save_upload(uploaded_file.getvalue(), uploaded_file.name)
+    upload_paths[uploaded_name] = upload_path
+    registry.register(uploaded_name, partial(load_data, upload_path, use_streaming, memory_limit_mb),
+                      version=file_version(upload_path))
+    if uploaded_name not in session_uploads:
+        session_uploads.append(uploaded_name)
 
 # 加载数据
-if use_default_file:
-    # 使用默认文件路径
-    if os.path.exists(DEFAULT_FILE_PATH):
-        df = load_data(DEFAULT_FILE_PATH)
-        st.sidebar.success(f"已成功加载默认文件: {DEFAULT_FILE_PATH}")
-    else:
-        st.sidebar.error(f"默认文件路径不存在: {DEFAULT_FILE_PATH}")
-        df = load_sample_data()
-        st.sidebar.info("正在使用示例数据。请上传您的数据文件获取真实分析。")
-elif uploaded_file is not None:
-    # 使用上传的文件
-    df = load_data(uploaded_file)
+dataset_options = list(local_datasets) + session_uploads
+if dataset_options:
+    default_dataset = next((name for name, path in local_datasets.items()
+                            if os.path.basename(path) == DEFAULT_FILE_PATH), dataset_options[0])
+    selected_dataset = st.sidebar.selectbox(
+        "选择数据集", dataset_options,
+        index=dataset_options.index(uploaded_name or default_dataset),
+        help="已加载的数据集常驻内存，切换时无需重新读取")
+    df = registry.get(selected_dataset)
+    filter_index = registry.derived(selected_dataset, 'filter_index',
+                                    partial(FilterIndex, columns=FILTER_COLUMNS))
+    dataset_digest = registry.derived(selected_dataset, 'digest', frame_digest)
+    # 数据集的源文件，SQL引擎直接扫描它的列式缓存
+    dataset_file = local_datasets.get(selected_dataset) or upload_paths.get(selected_dataset)
+    st.sidebar.success(f"已成功加载数据集: {selected_dataset}")
+
+    # 按月追加新数据，只解析新月份的文件（仅本地数据文件）
+    if selected_dataset in local_datasets:
+        dataset_path = local_datasets[selected_dataset]
+        with st.sidebar.expander("追加月度数据"):
+            month_file = st.file_uploader("上传新月份的销售数据", type=["xlsx"], key="append_month_file")
+            if month_file is not None and st.button("追加到当前数据"):
+                try:
+                    append_month_data(dataset_path, month_file)
+                    registry.invalidate(selected_dataset)
+                    load_month_summary.clear()
+                    st.rerun()
+                except ValueError as e:
+                    st.error(f"追加失败: {str(e)}")
+            try:
+                st.dataframe(load_month_summary(dataset_path), hide_index=True)
+            except Exception as e:
+                st.info(f"无法生成月度汇总: {str(e)}")
+
+    # 各数据集的内存占用
+    with st.sidebar.expander("数据集内存占用"):
+        st.dataframe(registry.footprint(), hide_index=True)
+        st.caption(f"常驻内存: {registry.resident_bytes() / 1024 / 1024:.1f}MB / "
+                   f"预算 {DATASET_MEMORY_BUDGET_MB}MB")
+        if registry.over_budget():
+            st.warning("当前数据集超过内存预算，已淘汰其他数据集；可在DATASET_MEMORY_BUDGET_MB中调高预算")
 else:
-    # 没有文件，使用示例数据
+    # 没有数据文件，使用示例数据
+    st.sidebar.error(f"默认文件路径不存在: {DEFAULT_FILE_PATH}")
     df = load_sample_data()
+    filter_index = FilterIndex(df, FILTER_COLUMNS)
+    dataset_digest = frame_digest(df)
+    dataset_file = None
     st.sidebar.info("正在使用示例数据。请上传您的数据文件获取真实分析。")
 
 # 定义新品产品代码
 new_products = ['F0110C', 'F0183F', 'F01K8A', 'F0183K', 'F0101P']
 new_products_df = df[df['产品代码'].isin(new_products)]
 
-# 创建产品代码到简化名称的映射字典（用于图表显示）
-product_name_mapping = {
-    code: df[df['产品代码'] == code]['简化产品名称'].iloc[0] if len(df[df['产品代码'] == code]) > 0 else code
-    for code in df['产品代码'].unique()
-}
+# 产品维度表，以及产品代码到简化名称的映射字典（用于图表显示）
+product_dim = build_product_dimension(df, new_products)
+product_name_mapping = product_dim['简化产品名称'].to_dict()
 
 # 侧边栏 - 筛选器
 st.sidebar.markdown('<div class="sidebar-header">筛选数据</div>', unsafe_allow_html=True)
@@ -314,20 +578,34 @@ selected_products = st.sidebar.multiselect(
 all_applicants = sorted(df['申请人'].astype(str).unique())
 selected_applicants = st.sidebar.multiselect("选择申请人", all_applicants, default=[])
 
-# 应用筛选条件
-filtered_df = df.copy()
-
-if selected_regions:
-    filtered_df = filtered_df[filtered_df['所属区域'].isin(selected_regions)]
+# 应用筛选条件：在预建的行号索引上求交集，只取出选中的行；没有限制时直接使用原数据（不复制，不可原地修改）
+# 各分析指标由analytics模块按同一筛选条件计算
+filter_spec = FilterSpec.of(regions=selected_regions, customers=selected_customers, products=selected_products,
+                            applicants=selected_applicants)
+filtered_df = analytics.select_sales(df, filter_spec, filter_index)
+
+# 标签页的计算结果按(数据集摘要, 计算引擎, 指标, 筛选条件)缓存：筛选条件不变的重绘（例如只展开了折叠面板）直接复用
+# 结果在会话之间共享，不可原地修改
+result_cache = get_result_cache()
+if compute_engine == 'DuckDB':
+    # 有列式缓存时扫描缓存文件（只读取用到的列，可以超出内存），否则扫描内存中的数据
+    if dataset_file:
+        metric_backend = get_sql_backend(sql_backend.temp_directory_for(dataset_file))
+        sql_files = registry.derived(selected_dataset, 'cache_files', lambda frame: cached_files(
+            dataset_file, '发运月份', version=SALES_CACHE_VERSION))
+        if sql_files:
+            metric_backend = metric_backend.over_files(sql_files)
+    else:
+        metric_backend = get_sql_backend(sql_backend.temp_directory_for(DEFAULT_FILE_PATH))
+elif compute_engine == 'pandas（多进程）':
+    metric_backend = get_parallel_backend()
+else:
+    metric_backend = analytics
 
-if selected_customers:
-    filtered_df = filtered_df[filtered_df['客户简称'].isin(selected_customers)]
 
-if selected_products:
-    filtered_df = filtered_df[filtered_df['产品代码'].isin(selected_products)]
+def tab_result(metric, compute):
+    return result_cache.get_or_compute((dataset_digest, compute_engine, metric, filter_spec), compute)
 
-if selected_applicants:
-    filtered_df = filtered_df[filtered_df['申请人'].isin(selected_applicants)]
 
 # 根据筛选后的数据筛选新品数据
 filtered_new_products_df = filtered_df[filtered_df['产品代码'].isin(new_products)]
@@ -383,7 +661,7 @@ with tabs[0]:  # 销售概览
 
     with col1:
         # 区域销售额柱状图 - 使用go.Figure和go.Bar代替px.bar以修复标签问题
-        region_sales = filtered_df.groupby('所属区域')['销售额'].sum().reset_index()
+        region_sales = tab_result('region_sales', partial(metric_backend.region_sales, df, filter_spec, filter_index))
 
         # 创建空figure
         fig_region = go.Figure()
@@ -463,58 +741,9 @@ with tabs[0]:  # 销售概览
         'modeBarButtonsToAdd': []
     }
 
-
-    # 提取包装类型
-    def extract_packaging(product_name):
-        """
-        提取产品名称中的包装类型，处理优先级从高到低
-        首先检查组合类型，然后检查单一类型
-        """
-        # 检查组合类型
-        if '分享装袋装' in product_name:
-            return '分享装袋装'
-        elif '分享装盒装' in product_name:
-            return '分享装盒装'
-
-        # 按包装大小分类（从大到小）
-        elif '随手包' in product_name:
-            return '随手包'
-        elif '迷你包' in product_name:
-            return '迷你包'
-        elif '分享装' in product_name:
-            return '分享装'
-
-        # 按包装形式分类
-        elif '袋装' in product_name:
-            return '袋装'
-        elif '盒装' in product_name:
-            return '盒装'
-
-        # 处理特殊规格
-        elif 'KG' in product_name or 'kg' in product_name:
-            if '1.5KG' in product_name or '1.5kg' in product_name:
-                return '大包装'
-            elif '2KG' in product_name or '2kg' in product_name:
-                return '大包装'
-            else:
-                return '散装'
-        elif 'G' in product_name:
-            match = re.search(r'(\d+)G', product_name)
-            if match:
-                weight = int(match.group(1))
-                if weight <= 50:
-                    return '小包装'
-                elif weight <= 100:
-                    return '中包装'
-                else:
-                    return '大包装'
-
-        # 默认分类
-        return '其他'
-
-
-    filtered_df['包装类型'] = filtered_df['产品名称'].apply(extract_packaging)
-    packaging_sales = filtered_df.groupby('包装类型')['销售额'].sum().reset_index()
+    # 包装类型从产品维度表查找
+    packaging = filtered_df['产品代码'].map(product_dim['包装类型']).rename('包装类型')
+    packaging_sales = filtered_df.groupby(packaging, observed=True)['销售额'].sum().reset_index()
 
     col1, col2 = st.columns(2)
 
@@ -599,7 +828,8 @@ with tabs[0]:  # 销售概览
 
     # 申请人销售业绩
     st.markdown('<div class="sub-header section-gap"> 👨‍💼 申请人销售业绩</div>', unsafe_allow_html=True)
-    applicant_performance = filtered_df.groupby('申请人')['销售额'].sum().sort_values(ascending=False).reset_index()
+    applicant_performance = filtered_df.groupby('申请人', observed=True)['销售额'].sum().sort_values(
+        ascending=False).reset_index()
 
     # 申请人销售业绩 - 使用go.Figure修复标签问题
     fig_applicant = go.Figure()
@@ -685,7 +915,8 @@ with tabs[1]:  # 新品分析
 
     if not filtered_new_products_df.empty:
         # 使用简化产品名称
-        product_sales = filtered_new_products_df.groupby(['产品代码', '简化产品名称'])['销售额'].sum().reset_index()
+        product_sales = filtered_new_products_df.groupby(['产品代码', '简化产品名称'], observed=True)[
+            '销售额'].sum().reset_index()
         product_sales = product_sales.sort_values('销售额', ascending=False)
 
         # 使用go.Figure修复标签问题
@@ -736,7 +967,8 @@ with tabs[1]:  # 新品分析
 
         with col1:
             # 区域新品销售额堆叠柱状图
-            region_product_sales = filtered_new_products_df.groupby(['所属区域', '简化产品名称'])[
+            region_product_sales = filtered_new_products_df.groupby(['所属区域', '简化产品名称'],
+                                                                    observed=True)[
                 '销售额'].sum().reset_index()
             fig_region_product = px.bar(
                 region_product_sales,
@@ -789,10 +1021,12 @@ with tabs[1]:  # 新品分析
         st.markdown('<div class="sub-header section-gap">各区域内新品销售占比</div>', unsafe_allow_html=True)
 
         # 计算各区域的新品总销售额
-        region_total_sales = filtered_new_products_df.groupby('所属区域')['销售额'].sum().reset_index()
+        region_total_sales = filtered_new_products_df.groupby('所属区域', observed=True)[
+            '销售额'].sum().reset_index()
 
         # 计算各区域各新品的销售占比
-        region_product_sales = filtered_new_products_df.groupby(['所属区域', '产品代码', '简化产品名称'])[
+        region_product_sales = filtered_new_products_df.groupby(['所属区域', '产品代码', '简化产品名称'],
+                                                                observed=True)[
             '销售额'].sum().reset_index()
         region_product_sales = region_product_sales.merge(region_total_sales, on='所属区域', suffixes=('', '_区域总计'))
         region_product_sales['销售占比'] = region_product_sales['销售额'] / region_product_sales[
@@ -807,7 +1041,8 @@ with tabs[1]:  # 新品分析
             values='销售占比',
             index='所属区域',
             columns='显示名称',  # 使用简化名称作为列名
-            fill_value=0
+            fill_value=0,
+            observed=True
         )
 
         # 使用Plotly创建热力图
@@ -857,37 +1092,13 @@ with tabs[2]:  # 客户细分
 
     if not filtered_df.empty:
         # 计算客户特征
-        customer_features = filtered_df.groupby('客户简称').agg({
-            '销售额': 'sum',  # 总销售额
-            '产品代码': lambda x: len(set(x)),  # 购买的不同产品数量
-            '数量（箱）': 'sum',  # 总购买数量
-            '单价（箱）': 'mean'  # 平均单价
-        }).reset_index()
-
-        # 添加新品购买指标
-        new_products_by_customer = filtered_new_products_df.groupby('客户简称')['销售额'].sum().reset_index()
-        customer_features = customer_features.merge(new_products_by_customer, on='客户简称', how='left',
-                                                    suffixes=('', '_新品'))
-        customer_features['销售额_新品'] = customer_features['销售额_新品'].fillna(0)
-        customer_features['新品占比'] = customer_features['销售额_新品'] / customer_features['销售额'] * 100
-
-        # 简单客户分类
-        customer_features['客户类型'] = pd.cut(
-            customer_features['新品占比'],
-            bins=[0, 10, 30, 100],
-            labels=['保守型客户', '平衡型客户', '创新型客户']
-        )
+        customer_features = tab_result('customer_segments', partial(
+            metric_backend.customer_segments, df, filter_spec, new_products, filter_index))
 
         # 客户分类展示
         st.markdown('<div class="sub-header section-gap">客户类型分布</div>', unsafe_allow_html=True)
 
-        simple_segments = customer_features.groupby('客户类型').agg({
-            '客户简称': 'count',
-            '销售额': 'mean',
-            '新品占比': 'mean'
-        }).reset_index()
-
-        simple_segments.columns = ['客户类型', '客户数量', '平均销售额', '平均新品占比']
+        simple_segments = tab_result('segment_summary', partial(analytics.segment_summary, customer_features))
 
         # 使用go.Figure修复标签问题 - 客户类型分布图
         fig_customer_types = go.Figure()
@@ -1136,26 +1347,15 @@ with tabs[3]:  # 产品组合
         st.markdown('<div class="sub-header section-gap">产品共现矩阵分析</div>', unsafe_allow_html=True)
         st.info("共现矩阵显示不同产品一起被同一客户购买的频率，有助于发现产品间的关联。")
 
-        # 准备数据 - 创建交易矩阵
-        transaction_data = filtered_df.groupby(['客户简称', '产品代码'])['销售额'].sum().unstack().fillna(0)
-        # 转换为二进制格式（是否购买）
-        transaction_binary = transaction_data.applymap(lambda x: 1 if x > 0 else 0)
+        # 准备数据 - 客户-产品购买矩阵（是否购买）
+        transaction_binary = tab_result('purchase_matrix', partial(
+            metric_backend.purchase_matrix, df, filter_spec, filter_index))
 
         # 创建产品共现矩阵
-        co_occurrence = pd.DataFrame(0, index=transaction_binary.columns, columns=transaction_binary.columns)
-
-        # 创建产品代码到简化名称的映射
-        name_mapping = {code: df[df['产品代码'] == code]['简化产品名称'].iloc[0]
-        if len(df[df['产品代码'] == code]) > 0 else code
-                        for code in transaction_binary.columns}
+        co_occurrence = tab_result('co_occurrence', partial(analytics.co_occurrence_matrix, transaction_binary))
 
-        # 计算共现次数
-        for _, row in transaction_binary.iterrows():
-            bought_products = row.index[row == 1].tolist()
-            for p1 in bought_products:
-                for p2 in bought_products:
-                    if p1 != p2:
-                        co_occurrence.loc[p1, p2] += 1
+        # 产品代码到简化名称的映射
+        name_mapping = product_name_mapping
 
         # 筛选新品的共现情况
         new_product_co_occurrence = pd.DataFrame()
@@ -1163,7 +1363,7 @@ with tabs[3]:  # 产品组合
 
         if valid_new_products:
             for np_code in valid_new_products:
-                top_co = co_occurrence.loc[np_code].sort_values(ascending=False).head(5)
+                top_co = top_partners(co_occurrence, np_code, 5)
                 new_product_co_occurrence[np_code] = top_co
 
             # 可视化每个新品的前5个共现产品
@@ -1171,7 +1371,7 @@ with tabs[3]:  # 产品组合
                 np_name = name_mapping.get(np_code, np_code)  # 获取新品的简化名称
                 st.markdown(f'<div class="sub-header">与"{np_name}"共同购买最多的产品</div>', unsafe_allow_html=True)
 
-                co_data = co_occurrence.loc[np_code].sort_values(ascending=False).head(5).reset_index()
+                co_data = top_partners(co_occurrence, np_code, 5).reset_index()
                 co_data.columns = ['产品代码', '共现次数']
 
                 # 添加简化产品名称
@@ -1222,8 +1422,8 @@ with tabs[3]:  # 产品组合
             st.info("热力图显示产品之间的共现关系，颜色越深表示两个产品一起购买的频率越高。")
 
             # 筛选主要产品以避免图表过于复杂
-            top_products = filtered_df.groupby('产品代码')['销售额'].sum().sort_values(ascending=False).head(
-                10).index.tolist()
+            top_products = filtered_df.groupby('产品代码', observed=True)['销售额'].sum().sort_values(
+                ascending=False).head(10).index.tolist()
             # 确保所有新品都包含在内
             for np in valid_new_products:
                 if np not in top_products:
@@ -1341,6 +1541,34 @@ with tabs[3]:  # 产品组合
 
         st.plotly_chart(fig_products_dist, use_container_width=True)
 
+        # 新品关联规则：共现次数分不清"都很畅销"和"真正相互带动"，规则的提升度可以区分
+        st.markdown('<div class="sub-header section-gap">新品关联规则</div>', unsafe_allow_html=True)
+        st.info("置信度表示购买了前项产品的客户中同时购买后项产品的比例；提升度大于1说明两者的关联强于各自的流行程度。")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            min_support = st.slider("最小支持度", min_value=0.01, max_value=0.5, value=0.05, step=0.01,
+                                    help="同时购买规则中所有产品的客户占全部客户的比例下限")
+        with col2:
+            min_confidence = st.slider("最小置信度", min_value=0.05, max_value=1.0, value=0.3, step=0.05)
+
+        rules = tab_result(('association_rules', min_support, min_confidence), partial(
+            analytics.association_rules, df, filter_spec, new_products, filter_index,
+            min_support=min_support, min_confidence=min_confidence))
+
+        if not rules.empty:
+            display_rules = rules.copy()
+            display_rules['前项'] = display_rules['前项'].map(
+                lambda codes: ' + '.join(name_mapping.get(code, code) for code in codes))
+            display_rules['后项'] = display_rules['后项'].map(lambda code: name_mapping.get(code, code))
+            display_rules['支持度'] = (display_rules['支持度'] * 100).round(2)
+            display_rules['置信度'] = (display_rules['置信度'] * 100).round(2)
+            display_rules['提升度'] = display_rules['提升度'].round(2)
+            display_rules.columns = ['前项', '后项', '客户数', '支持度(%)', '置信度(%)', '提升度']
+            st.dataframe(display_rules, hide_index=True)
+        else:
+            st.warning("在当前筛选条件和阈值下没有找到包含新品的关联规则，可以降低最小支持度或置信度。")
+
         # 产品组合表格
         with st.expander("查看产品共现矩阵"):
             # 转换产品代码为简化名称
@@ -1356,9 +1584,11 @@ with tabs[4]:  # 市场渗透率
 
     if not filtered_df.empty:
         # 计算总体渗透率
-        total_customers = filtered_df['客户简称'].nunique()
-        new_product_customers = filtered_new_products_df['客户简称'].nunique()
-        penetration_rate = (new_product_customers / total_customers * 100) if total_customers > 0 else 0
+        overall_penetration = tab_result('penetration', partial(
+            metric_backend.penetration, df, filter_spec, new_products, filter_index))
+        total_customers = overall_penetration.at[0, '客户总数']
+        new_product_customers = overall_penetration.at[0, '购买新品客户数']
+        penetration_rate = overall_penetration.at[0, '渗透率']
 
         # KPI指标
         col1, col2, col3 = st.columns(3)
@@ -1392,16 +1622,8 @@ with tabs[4]:  # 市场渗透率
 
         if 'selected_regions' in locals() and selected_regions:
             # 按区域计算渗透率
-            region_customers = filtered_df.groupby('所属区域')['客户简称'].nunique().reset_index()
-            region_customers.columns = ['所属区域', '客户总数']
-
-            new_region_customers = filtered_new_products_df.groupby('所属区域')['客户简称'].nunique().reset_index()
-            new_region_customers.columns = ['所属区域', '购买新品客户数']
-
-            region_penetration = region_customers.merge(new_region_customers, on='所属区域', how='left')
-            region_penetration['购买新品客户数'] = region_penetration['购买新品客户数'].fillna(0)
-            region_penetration['渗透率'] = (
-                    region_penetration['购买新品客户数'] / region_penetration['客户总数'] * 100).round(2)
+            region_penetration = tab_result('region_penetration', partial(
+                metric_backend.region_penetration, df, filter_spec, new_products, filter_index))
 
             # 使用go.Figure修复标签问题 - 区域渗透率
             fig_region_penetration = go.Figure()
@@ -1451,7 +1673,8 @@ with tabs[4]:  # 市场渗透率
             st.markdown('<div class="sub-header section-gap">渗透率与销售额的关系</div>', unsafe_allow_html=True)
 
             # 计算每个区域的新品销售额
-            region_new_sales = filtered_new_products_df.groupby('所属区域')['销售额'].sum().reset_index()
+            region_new_sales = filtered_new_products_df.groupby('所属区域', observed=True)[
+                '销售额'].sum().reset_index()
             region_new_sales.columns = ['所属区域', '新品销售额']
 
             # 合并渗透率和销售额数据
@@ -1507,25 +1730,9 @@ with tabs[4]:  # 市场渗透率
             st.markdown('<div class="sub-header section-gap">新品渗透率趋势</div>', unsafe_allow_html=True)
 
             try:
-                # 确保发运月份是日期类型
-                filtered_df['发运月份'] = pd.to_datetime(filtered_df['发运月份'])
-                filtered_new_products_df['发运月份'] = pd.to_datetime(filtered_new_products_df['发运月份'])
-
-                # 按月分组
-                monthly_customers = filtered_df.groupby(pd.Grouper(key='发运月份', freq='M'))[
-                    '客户简称'].nunique().reset_index()
-                monthly_customers.columns = ['月份', '客户总数']
-
-                monthly_new_customers = filtered_new_products_df.groupby(pd.Grouper(key='发运月份', freq='M'))[
-                    '客户简称'].nunique().reset_index()
-                monthly_new_customers.columns = ['月份', '购买新品客户数']
-
-                # 合并月度数据
-                monthly_penetration = monthly_customers.merge(monthly_new_customers, on='月份', how='left')
-                monthly_penetration['购买新品客户数'] = monthly_penetration['购买新品客户数'].fillna(0)
-                monthly_penetration['渗透率'] = (
-                        monthly_penetration['购买新品客户数'] / monthly_penetration['客户总数'] * 100).round(2)
-                monthly_penetration['月份_str'] = monthly_penetration['月份'].dt.strftime('%Y-%m')
+                # 按月计算渗透率（发运月份在加载时已转换为日期类型）
+                monthly_penetration = tab_result('monthly_penetration', partial(
+                    metric_backend.monthly_penetration, df, filter_spec, new_products, filter_index))
 
                 # 创建趋势线图
                 fig_trend = px.line(
@@ -1576,7 +1783,7 @@ def generate_excel_report(df, new_products_df):
     new_products_df.to_excel(writer, sheet_name='新品销售数据', index=False)
 
     # 区域销售汇总
-    region_summary = df.groupby('所属区域').agg({
+    region_summary = df.groupby('所属区域', observed=True).agg({
         '销售额': 'sum',
         '客户简称': pd.Series.nunique,
         '产品代码': pd.Series.nunique,
@@ -1586,7 +1793,7 @@ def generate_excel_report(df, new_products_df):
     region_summary.to_excel(writer, sheet_name='区域销售汇总', index=False)
 
     # 产品销售汇总
-    product_summary = df.groupby(['产品代码', '简化产品名称']).agg({
+    product_summary = df.groupby(['产品代码', '简化产品名称'], observed=True).agg({
         '销售额': 'sum',
         '客户简称': pd.Series.nunique,
         '数量（箱）': 'sum'
@@ -1612,6 +1819,14 @@ st.download_button(
 )
 st.markdown('</div>', unsafe_allow_html=True)
 
+# 标签页计算结果缓存的命中情况（所有标签页计算完成后统计）
+cache_stats = result_cache.stats()
+with st.sidebar.expander("计算结果缓存"):
+    st.caption(f"命中率: {cache_stats['hit_rate']:.1%} "
+               f"(命中 {cache_stats['hits']} 次 / 未命中 {cache_stats['misses']} 次)")
+    st.caption(f"缓存条目: {cache_stats['entries']} / {RESULT_CACHE_MAX_ENTRIES}，"
+               f"占用 {cache_stats['bytes'] / 1024 / 1024:.1f}MB / 预算 {RESULT_CACHE_MAX_MB}MB")
+
 # 底部注释
 st.markdown("""
 <div style="text-align: center; margin-top: 30px; color: #666;">
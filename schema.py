@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+# 发运月份允许的格式，按顺序尝试
+MONTH_FORMATS = ['%Y-%m', '%Y-%m-%d', '%Y/%m', '%Y/%m/%d', '%Y%m', '%Y年%m月']
+
+# 列定义：type为month/number/str，unit仅用于说明数值单位
+SALES_SCHEMA = {
+    '客户简称': {'type': 'str'},
+    '所属区域': {'type': 'str'},
+    '发运月份': {'type': 'month', 'formats': MONTH_FORMATS},
+    '申请人': {'type': 'str'},
+    '产品代码': {'type': 'str'},
+    '产品名称': {'type': 'str'},
+    '订单类型': {'type': 'str', 'required': False},
+    '单价（箱）': {'type': 'number', 'unit': '元/箱'},
+    '数量（箱）': {'type': 'number', 'unit': '箱'}
+}
+
+MATERIAL_SCHEMA = {
+    '发运月份': {'type': 'month', 'formats': MONTH_FORMATS},
+    '所属区域': {'type': 'str'},
+    '省份': {'type': 'str'},
+    '城市': {'type': 'str'},
+    '经销商名称': {'type': 'str'},
+    '客户代码': {'type': 'str'},
+    '物料代码': {'type': 'str'},
+    '物料名称': {'type': 'str'},
+    '物料数量': {'type': 'number', 'unit': '件'},
+    '申请人': {'type': 'str'}
+}
+
+MATERIAL_SALES_SCHEMA = {
+    '发运月份': {'type': 'month', 'formats': MONTH_FORMATS},
+    '所属区域': {'type': 'str'},
+    '省份': {'type': 'str'},
+    '城市': {'type': 'str'},
+    '经销商名称': {'type': 'str'},
+    '客户代码': {'type': 'str'},
+    '产品代码': {'type': 'str'},
+    '产品名称': {'type': 'str'},
+    '求和项:数量（箱）': {'type': 'number', 'unit': '箱'},
+    '求和项:单价（箱）': {'type': 'number', 'unit': '元/箱'},
+    '申请人': {'type': 'str'}
+}
+
+MATERIAL_PRICE_SCHEMA = {
+    '物料代码': {'type': 'str'},
+    '物料名称': {'type': 'str', 'required': False},
+    '单价（元）': {'type': 'number', 'unit': '元'}
+}
+
+
+# 数据不符合声明的结构时抛出，problems为逐列的问题说明
+class SchemaError(ValueError):
+    def __init__(self, name, problems):
+        self.problems = problems
+        super().__init__(f"{name}数据格式错误:\n" + "\n".join(f"- {problem}" for problem in problems))
+
+
+def _examples(values, limit=5):
+    return ', '.join(repr(value) for value in list(values)[:limit])
+
+
+# 按给定格式解析月份，只对不同的取值解析一次再映射回整列
+def coerce_month(series, formats):
+    if is_datetime64_any_dtype(series):
+        return series, []
+
+    uniques = pd.Series(series.dropna().unique())
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    # Excel中已经是日期的单元格直接转换
+    is_date = uniques.map(lambda value: isinstance(value, pd.Timestamp) or hasattr(value, 'year'))
+    if is_date.any():
+        parsed[is_date] = pd.to_datetime(uniques[is_date])
+    text = uniques.astype(str).str.strip()
+    for fmt in formats:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=fmt, errors='coerce')
+
+    bad = uniques[parsed.isna()]
+    problems = []
+    if len(bad):
+        problems.append(f"{len(bad)} 个取值无法按格式 {' / '.join(formats)} 解析为月份，例如: {_examples(bad)}")
+    mapping = pd.Series(parsed.values, index=uniques.values)
+    return series.map(mapping).astype('datetime64[ns]'), problems
+
+
+def coerce_numeric(series):
+    if is_numeric_dtype(series):
+        return series, []
+    converted = pd.to_numeric(series, errors='coerce')
+    bad = series[converted.isna() & series.notna()].unique()
+    problems = []
+    if len(bad):
+        problems.append(f"{len(bad)} 个取值不是数字，例如: {_examples(bad)}")
+    return converted, problems
+
+
+def _to_text(value):
+    # 含空单元格的代码列会被读成浮点数，整数值去掉'.0'，与整数类型读入的同一代码一致
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# 文本列中混入数字（例如纯数字的客户代码）时统一转为字符串，保证排序和合并一致；只对不同的取值转换一次
+def coerce_str(series):
+    if isinstance(series.dtype, pd.CategoricalDtype) or infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series, []
+    uniques = series.dropna().unique()
+    mapping = pd.Series([_to_text(value) for value in uniques], index=uniques, dtype=object)
+    return series.map(mapping).astype(object), []
+
+
+# 按声明的结构一次性转换所有列，并汇总所有问题后统一报错
+def coerce_schema(df, schema, name="输入"):
+    problems = []
+    for column, spec in schema.items():
+        if column not in df.columns:
+            if spec.get('required', True):
+                problems.append(f"缺少列 '{column}'")
+            continue
+
+        kind = spec['type']
+        if kind == 'month':
+            converted, column_problems = coerce_month(df[column], spec.get('formats', MONTH_FORMATS))
+        elif kind == 'number':
+            converted, column_problems = coerce_numeric(df[column])
+        else:
+            converted, column_problems = coerce_str(df[column])
+
+        problems.extend(f"列 '{column}': {problem}" for problem in column_problems)
+        df[column] = converted
+
+    if problems:
+        raise SchemaError(name, problems)
+    return df
@@ -0,0 +1,198 @@
+import copy
+import os
+import threading
+from typing import Optional, Sequence
+
+import pandas as pd
+
+from analytics import FilterSpec, segment_customers
+from data_cache import CACHE_DIR_NAME
+from filter_index import FilterIndex
+
+try:
+    import duckdb
+except ImportError:  # 没有安装duckdb时只能使用pandas计算
+    duckdb = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_ds
+except ImportError:  # 没有安装pyarrow时只能扫描内存中的DataFrame
+    pa = None
+    pa_ds = None
+
+# DuckDB的线程数（None表示使用全部核心）和内存上限
+SQL_THREADS = None
+SQL_MEMORY_LIMIT = '4GB'
+# 超出内存时的溢写目录名，放在数据文件旁边的缓存目录中
+SQL_TEMP_DIR_NAME = 'duckdb_tmp'
+
+# 查询中销售明细的表名
+SALES_TABLE = 'sales'
+
+
+def available():
+    return duckdb is not None
+
+
+# 数据文件对应的溢写目录
+def temp_directory_for(file_path):
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME, SQL_TEMP_DIR_NAME)
+
+
+# 字典编码列的索引统一为int32：各文件的分类字典大小不同，索引类型（int8/int16）可能不同
+def _widen(arrow_type):
+    if pa.types.is_dictionary(arrow_type):
+        return pa.dictionary(pa.int32(), arrow_type.value_type)
+    return arrow_type
+
+
+# 多个列式缓存文件（Arrow IPC/feather，例如主文件和追加的数据段）组成的扫描源，各文件的结构统一后按批读取
+# DuckDB只读取查询用到的列，数据不需要整体载入内存
+def file_dataset(files):
+    schemas = [pa.schema([field.with_type(_widen(field.type)) for field in pa_ds.dataset(path, format='feather').schema])
+               for path in files]
+    schema = pa.unify_schemas(schemas, promote_options='permissive')
+    return pa_ds.dataset(list(files), format='feather', schema=schema)
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+# 把筛选条件转换为WHERE子句和参数；维度按字符串取值比较，与筛选索引一致
+def _where(spec, extra=()):
+    clauses = list(extra)
+    params = []
+    for column, values in spec.selections().items():
+        clauses.append(f"list_contains(?, CAST({_quote(column)} AS VARCHAR))")
+        params.append(list(values))
+    if spec.has_dates:
+        clauses.append('"发运月份" BETWEEN ? AND ?')
+        params.extend([spec.start_date.to_pydatetime(), spec.end_date.to_pydatetime()])
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+# 查询结果的分组列恢复为原数据的类型（例如分类类型），并按分组列排序，与pandas分组的输出顺序一致
+# 只扫描文件、没有内存中的数据（df为None）时保留查询结果的类型
+def _restore_keys(result, df, keys):
+    if df is not None:
+        for key in keys:
+            result[key] = result[key].astype(df[key].dtype)
+    return result.sort_values(keys, ignore_index=True)
+
+
+# 在进程内的DuckDB上按与analytics相同的指标定义计算销售明细的汇总
+# 每个方法的参数与analytics中的同名函数相同（筛选索引只为兼容而接受，过滤条件直接下推到SQL）
+# 查询多线程执行，中间结果超过内存上限时溢写到temp_directory（见temp_directory_for）
+# 默认扫描传入的pandas DataFrame；over_files得到的引擎直接扫描列式缓存文件，不依赖内存中的数据
+class DuckDBBackend:
+    name = 'duckdb'
+
+    def __init__(self, threads=SQL_THREADS, memory_limit=SQL_MEMORY_LIMIT, temp_directory=None):
+        if duckdb is None:
+            raise ImportError("SQL计算引擎需要安装duckdb: pip install duckdb")
+        self._connection = duckdb.connect()
+        if threads:
+            self._connection.execute(f"SET threads = {int(threads)}")
+        if memory_limit:
+            self._connection.execute(f"SET memory_limit = '{memory_limit}'")
+        if temp_directory:
+            os.makedirs(temp_directory, exist_ok=True)
+            self._connection.execute("SET temp_directory = '{}'".format(temp_directory.replace("'", "''")))
+        self._lock = threading.Lock()
+        self.source = None
+
+    # 扫描列式缓存文件（见data_cache.cached_files）的引擎，与当前引擎共享连接和设置
+    # 各方法的df参数只用于恢复分组列的类型，可以为None
+    def over_files(self, files: Sequence[str]) -> 'DuckDBBackend':
+        if pa_ds is None:
+            raise ImportError("扫描列式缓存文件需要安装pyarrow")
+        backend = copy.copy(self)
+        backend.source = file_dataset(files)
+        return backend
+
+    # 在销售明细上执行查询；每次查询使用独立的游标，可以在多个线程中同时调用
+    def query(self, df: Optional[pd.DataFrame], sql: str, params: Sequence = ()) -> pd.DataFrame:
+        with self._lock:
+            cursor = self._connection.cursor()
+        try:
+            cursor.register(SALES_TABLE, self.source if self.source is not None else df)
+            return cursor.execute(sql, list(params)).df()
+        finally:
+            cursor.close()
+
+    # 各区域销售额
+    def region_sales(self, df: pd.DataFrame, spec: FilterSpec, index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        where, params = _where(spec, ['"所属区域" IS NOT NULL'])
+        result = self.query(df, f'SELECT "所属区域", SUM("销售额") AS "销售额" FROM {SALES_TABLE}{where} '
+                                f'GROUP BY "所属区域"', params)
+        return _restore_keys(result, df, ['所属区域'])
+
+    # 客户特征与简单分类
+    def customer_segments(self, df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                          index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        where, params = _where(spec, ['"客户简称" IS NOT NULL'])
+        result = self.query(df, f'''
+            SELECT "客户简称",
+                   SUM("销售额") AS "销售额",
+                   COUNT(DISTINCT "产品代码") AS "产品代码",
+                   SUM("数量（箱）") AS "数量（箱）",
+                   AVG("单价（箱）") AS "单价（箱）",
+                   SUM(CASE WHEN list_contains(?, CAST("产品代码" AS VARCHAR)) THEN "销售额" END) AS "销售额_新品"
+            FROM {SALES_TABLE}{where}
+            GROUP BY "客户简称"''', [list(new_products)] + params)
+        features = _restore_keys(result, df, ['客户简称'])
+        features['销售额_新品'] = features['销售额_新品'].fillna(0)
+        return segment_customers(features)
+
+    # 客户-产品购买矩阵
+    def purchase_matrix(self, df: pd.DataFrame, spec: FilterSpec, index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        where, params = _where(spec, ['"客户简称" IS NOT NULL', '"产品代码" IS NOT NULL'])
+        result = self.query(df, f'SELECT "客户简称", "产品代码", SUM("销售额") AS "销售额" FROM {SALES_TABLE}{where} '
+                                f'GROUP BY "客户简称", "产品代码"', params)
+        result = _restore_keys(result, df, ['客户简称', '产品代码'])
+        # 在已汇总的结果上按与pandas相同的方式展开，行列顺序与pandas一致
+        sales = result.groupby(['客户简称', '产品代码'], observed=True)['销售额'].sum().unstack().fillna(0)
+        return sales.applymap(lambda x: 1 if x > 0 else 0)
+
+    def _penetration_query(self, df, spec, new_products, group=None, extra=()):
+        where, params = _where(spec, ['"客户简称" IS NOT NULL'] + list(extra))
+        select = f'{group} AS "分组", ' if group else ''
+        group_by = ' GROUP BY 1' if group else ''
+        return self.query(df, f'''
+            SELECT {select}COUNT(DISTINCT "客户简称") AS "客户总数",
+                   COUNT(DISTINCT CASE WHEN list_contains(?, CAST("产品代码" AS VARCHAR)) THEN "客户简称" END)
+                       AS "购买新品客户数"
+            FROM {SALES_TABLE}{where}{group_by}''', [list(new_products)] + params)
+
+    # 新品总体渗透率
+    def penetration(self, df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                    index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        counts = self._penetration_query(df, spec, new_products)
+        total_customers = int(counts.at[0, '客户总数'])
+        new_product_customers = int(counts.at[0, '购买新品客户数'])
+        rate = (new_product_customers / total_customers * 100) if total_customers > 0 else 0
+        return pd.DataFrame({'客户总数': [total_customers], '购买新品客户数': [new_product_customers], '渗透率': [rate]})
+
+    # 各区域新品渗透率
+    def region_penetration(self, df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                           index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        counts = self._penetration_query(df, spec, new_products, '"所属区域"', ['"所属区域" IS NOT NULL'])
+        result = _restore_keys(counts.rename(columns={'分组': '所属区域'}), df, ['所属区域'])
+        result['渗透率'] = (result['购买新品客户数'] / result['客户总数'] * 100).round(2)
+        return result
+
+    # 按月新品渗透率；与按月分组一致，以月末日期标记月份，区间内没有数据的月份计为0
+    def monthly_penetration(self, df: pd.DataFrame, spec: FilterSpec, new_products: Sequence[str],
+                            index: Optional[FilterIndex] = None) -> pd.DataFrame:
+        counts = self._penetration_query(df, spec, new_products, 'date_trunc(\'month\', "发运月份")',
+                                         ['"发运月份" IS NOT NULL'])
+        months = pd.to_datetime(counts['分组']) + pd.offsets.MonthEnd(0)
+        counts = counts.drop(columns='分组').set_index(months).sort_index()
+        if len(counts):
+            counts = counts.reindex(pd.date_range(counts.index[0], counts.index[-1], freq='M'), fill_value=0)
+        result = counts.rename_axis('月份').reset_index()
+        result['渗透率'] = (result['购买新品客户数'] / result['客户总数'] * 100).round(2)
+        result['月份_str'] = result['月份'].dt.strftime('%Y-%m')
+        return result
@@ -0,0 +1,181 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# 各维度的默认名称，数量超过默认名称时自动补充编号名称
+REGION_NAMES = ['华北区', '华东区', '华南区', '西南区', '东北区']
+PROVINCE_NAMES = ['北京', '上海', '广东', '四川', '浙江', '江苏', '湖北', '辽宁', '黑龙江', '河南']
+CITY_NAMES = ['北京', '上海', '广州', '成都', '杭州', '南京', '武汉', '沈阳', '哈尔滨', '郑州']
+MATERIAL_NAMES = ['促销海报', '展示架', '货架陈列', '柜台展示', '地贴', '吊旗', '宣传册', '样品', '门店招牌', '促销礼品']
+MATERIAL_PRICES = [100, 500, 300, 200, 50, 80, 20, 5, 1000, 10]
+PRODUCT_NAMES = ['口力薄荷糖', '口力泡泡糖', '口力果味糖', '口力清新糖', '口力夹心糖', '口力棒棒糖', '口力软糖',
+                 '口力硬糖', '口力奶糖', '口力巧克力']
+PRODUCT_PRICES = [20, 25, 18, 22, 30, 15, 28, 26, 35, 40]
+
+# 各维度的默认基数
+DEFAULT_CARDINALITY = {
+    'regions': 5,
+    'provinces': 10,
+    'cities': 10,
+    'distributors': 20,
+    'materials': 10,
+    'products': 10,
+    'sales_persons': 10
+}
+
+# 各维度的默认偏斜度（Zipf指数），0表示均匀分布
+DEFAULT_SKEW = {dimension: 0.0 for dimension in DEFAULT_CARDINALITY}
+
+
+def _names(defaults, count, prefix):
+    return list(defaults[:count]) + [f'{prefix}{i}' for i in range(len(defaults) + 1, count + 1)]
+
+
+# 按Zipf偏斜度生成抽样概率
+def _weights(count, skew):
+    if not skew:
+        return None
+    weights = 1.0 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+
+def _sample(rng, count, rows, skew):
+    weights = _weights(count, skew)
+    if weights is None:
+        return rng.integers(0, count, size=rows)
+    return rng.choice(count, size=rows, p=weights)
+
+
+# 生成模拟维度表（区域、省份、城市、经销商、物料、产品、销售人员）
+def make_dimensions(rng, cardinality):
+    n_materials = cardinality['materials']
+    n_products = cardinality['products']
+    n_distributors = cardinality['distributors']
+
+    material_prices = MATERIAL_PRICES[:n_materials]
+    material_prices += rng.choice(MATERIAL_PRICES, size=n_materials - len(material_prices)).tolist()
+    product_prices = PRODUCT_PRICES[:n_products]
+    product_prices += rng.integers(15, 41, size=n_products - len(product_prices)).tolist()
+
+    return {
+        'regions': _names(REGION_NAMES, cardinality['regions'], '区域'),
+        'provinces': _names(PROVINCE_NAMES, cardinality['provinces'], '省份'),
+        'cities': _names(CITY_NAMES, cardinality['cities'], '城市'),
+        'distributors': [f'经销商{i}' for i in range(1, n_distributors + 1)],
+        'customer_codes': [f'C{i:04d}' for i in range(1, n_distributors + 1)],
+        'sales_persons': [f'销售{i}' for i in range(1, cardinality['sales_persons'] + 1)],
+        'material_codes': [f'M{i:04d}' for i in range(1, n_materials + 1)],
+        'material_names': _names(MATERIAL_NAMES, n_materials, '物料'),
+        'material_prices': material_prices,
+        'product_codes': [f'P{i:04d}' for i in range(1, n_products + 1)],
+        'product_names': _names(PRODUCT_NAMES, n_products, '口力产品'),
+        'product_prices': product_prices
+    }
+
+
+# 按整数编码一次性生成整列，字符串列直接用分类类型表示，避免逐行创建Python对象
+def _common_columns(rng, dims, months, rows, cardinality, skew):
+    distributor_idx = _sample(rng, cardinality['distributors'], rows, skew['distributors'])
+    return {
+        '发运月份': months[rng.integers(0, len(months), size=rows)],
+        '所属区域': pd.Categorical.from_codes(_sample(rng, cardinality['regions'], rows, skew['regions']),
+                                          dims['regions']),
+        '省份': pd.Categorical.from_codes(_sample(rng, cardinality['provinces'], rows, skew['provinces']),
+                                        dims['provinces']),
+        '城市': pd.Categorical.from_codes(_sample(rng, cardinality['cities'], rows, skew['cities']),
+                                        dims['cities']),
+        '经销商名称': pd.Categorical.from_codes(distributor_idx, dims['distributors']),
+        '客户代码': pd.Categorical.from_codes(distributor_idx, dims['customer_codes'])
+    }
+
+
+# 生成物料、销售和物料单价三张表，结构与真实数据文件一致
+# cardinality/skew可按维度覆盖默认值，seed相同则结果相同
+def generate_material_data(material_rows=500, sales_rows=600, seed=None, cardinality=None, skew=None,
+                           start_date='2024-01-01', end_date='2024-12-31'):
+    rng = np.random.default_rng(seed)
+    cardinality = {**DEFAULT_CARDINALITY, **(cardinality or {})}
+    skew = {**DEFAULT_SKEW, **(skew or {})}
+    dims = make_dimensions(rng, cardinality)
+    months = pd.date_range(start=start_date, end=end_date, freq='MS').values
+
+    df_material_price = pd.DataFrame({
+        '物料代码': dims['material_codes'],
+        '物料名称': dims['material_names'],
+        '单价（元）': dims['material_prices']
+    })
+
+    material = _common_columns(rng, dims, months, material_rows, cardinality, skew)
+    material_idx = _sample(rng, cardinality['materials'], material_rows, skew['materials'])
+    material['物料代码'] = pd.Categorical.from_codes(material_idx, dims['material_codes'])
+    material['物料名称'] = pd.Categorical.from_codes(material_idx, dims['material_names'])
+    material['物料数量'] = rng.integers(1, 100, size=material_rows)
+    material['申请人'] = pd.Categorical.from_codes(
+        _sample(rng, cardinality['sales_persons'], material_rows, skew['sales_persons']), dims['sales_persons'])
+    df_material = pd.DataFrame(material)
+
+    sales = _common_columns(rng, dims, months, sales_rows, cardinality, skew)
+    product_idx = _sample(rng, cardinality['products'], sales_rows, skew['products'])
+    sales['产品代码'] = pd.Categorical.from_codes(product_idx, dims['product_codes'])
+    sales['产品名称'] = pd.Categorical.from_codes(product_idx, dims['product_names'])
+    sales['求和项:数量（箱）'] = rng.integers(10, 1000, size=sales_rows)
+    sales['求和项:单价（箱）'] = np.asarray(dims['product_prices'])[product_idx]
+    sales['申请人'] = pd.Categorical.from_codes(
+        _sample(rng, cardinality['sales_persons'], sales_rows, skew['sales_persons']), dims['sales_persons'])
+    df_sales = pd.DataFrame(sales)
+
+    return df_material, df_sales, df_material_price
+
+
+# 写出Parquet文件，文件名与真实数据文件对应
+def write_parquet(df_material, df_sales, df_material_price, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {
+        'material': os.path.join(output_dir, '2025物料源数据.parquet'),
+        'sales': os.path.join(output_dir, '25物料源销售数据.parquet'),
+        'material_price': os.path.join(output_dir, '物料单价.parquet')
+    }
+    df_material.to_parquet(paths['material'], index=False)
+    df_sales.to_parquet(paths['sales'], index=False)
+    df_material_price.to_parquet(paths['material_price'], index=False)
+    return paths
+
+
+def _parse_dimension_values(values, cast):
+    result = {}
+    for item in values or []:
+        dimension, value = item.split('=')
+        if dimension not in DEFAULT_CARDINALITY:
+            raise argparse.ArgumentTypeError(f"未知维度: {dimension}")
+        result[dimension] = cast(value)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成物料分析仪表盘的模拟数据")
+    parser.add_argument('--material-rows', type=int, default=500)
+    parser.add_argument('--sales-rows', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--cardinality', nargs='*', metavar='维度=数量',
+                        help="例如 distributors=10000 materials=100")
+    parser.add_argument('--skew', nargs='*', metavar='维度=指数', help="Zipf偏斜度，例如 distributors=1.1")
+    parser.add_argument('--output', default='synthetic_data', help="Parquet输出目录")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    frames = generate_material_data(args.material_rows, args.sales_rows, seed=args.seed,
+                                    cardinality=_parse_dimension_values(args.cardinality, int),
+                                    skew=_parse_dimension_values(args.skew, float))
+    generated = time.perf_counter()
+    paths = write_parquet(*frames, args.output)
+    print(f"生成 {args.material_rows:,} 条物料记录和 {args.sales_rows:,} 条销售记录，"
+          f"用时 {generated - start:.2f}s，写入用时 {time.perf_counter() - generated:.2f}s")
+    for path in paths.values():
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
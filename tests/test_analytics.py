@@ -0,0 +1,23 @@
+import warnings
+
+import pandas as pd
+import pytest
+
+from analytics import segment_customers, segment_summary
+
+
+def test_segment_summary_lists_only_observed_segments():
+    features = segment_customers(pd.DataFrame({
+        '客户简称': ['甲', '乙', '丙', '丁'],
+        '销售额': [100.0, 200.0, 300.0, 100.0],
+        '销售额_新品': [5.0, 10.0, 150.0, 80.0]
+    }))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', FutureWarning)
+        summary = segment_summary(features)
+
+    assert list(summary.columns) == ['客户类型', '客户数量', '平均销售额', '平均新品占比']
+    assert summary['客户类型'].astype(str).tolist() == ['保守型客户', '创新型客户']
+    assert summary['客户数量'].tolist() == [2, 2]
+    assert summary['平均销售额'].tolist() == [150.0, 200.0]
+    assert summary['平均新品占比'].tolist() == pytest.approx([5.0, 65.0])
@@ -0,0 +1,65 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import data_cache
+from data_cache import append_segment, cache_paths, cached_files, cached_month_keys, load_cached_frame
+
+pytest.importorskip('pyarrow')
+
+
+# 源文件内容是CSV，解析后的月份为文本，与Excel中的月份列一样由month_keys统一
+def parse(source):
+    return pd.read_csv(source)
+
+
+def month_csv(months):
+    return pd.DataFrame({'发运月份': months, '销售额': range(len(months))}).to_csv(index=False).encode('utf-8')
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / 'sales.csv'
+    path.write_bytes(month_csv(['2025-01', '2025-01', '2025-02']))
+    return str(path)
+
+
+def test_month_keys_recorded_when_cache_is_written(data_file, monkeypatch):
+    load_cached_frame(data_file, parse, key_column='发运月份')
+    with open(cache_paths(data_file)[1], encoding='utf-8') as f:
+        assert json.load(f)['keys'] == {'发运月份': ['2025-01', '2025-02']}
+
+    # 列出缓存文件时不再打开缓存数据
+    def fail(*args, **kwargs):
+        raise AssertionError("不应读取缓存数据")
+
+    monkeypatch.setattr(data_cache.pa, 'memory_map', fail)
+    assert cached_files(data_file, '发运月份') == [cache_paths(data_file)[0]]
+
+
+def test_month_keys_read_once_for_old_cache(data_file, monkeypatch):
+    load_cached_frame(data_file, parse)
+    assert cached_month_keys(data_file, '发运月份') == {'2025-01', '2025-02'}
+    with open(cache_paths(data_file)[1], encoding='utf-8') as f:
+        assert json.load(f)['keys'] == {'发运月份': ['2025-01', '2025-02']}
+
+    monkeypatch.setattr(data_cache.pa, 'memory_map', None)
+    assert cached_month_keys(data_file, '发运月份') == {'2025-01', '2025-02'}
+
+
+def test_cached_files_include_new_segments(data_file):
+    load_cached_frame(data_file, parse, key_column='发运月份')
+    segment = io.BytesIO(month_csv(['2025-03']))
+    segment.name = 'march.csv'
+    append_segment(data_file, segment, parse, '发运月份', existing_keys={'2025-01', '2025-02'})
+
+    files = cached_files(data_file, '发运月份')
+    assert len(files) == 2 and files[0] == cache_paths(data_file)[0]
+
+    # 源文件变化后缓存失效
+    with open(data_file, 'ab') as f:
+        f.write(b'2025-04,9\n')
+    assert cached_files(data_file, '发运月份') == []
+    assert cached_month_keys(data_file, '发运月份') is None
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from dataset_registry import DatasetRegistry
+from filter_index import FilterIndex
+from memo_cache import ByteLRUCache, frame_digest
+
+
+def make_frame(rows=5_000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        '所属区域': rng.choice(['东', '南', '西', '北'], rows),
+        '客户简称': rng.choice([f'客户{i}' for i in range(50)], rows),
+        '销售额': rng.random(rows)
+    })
+
+
+class CountingLoader:
+    def __init__(self, df):
+        self.df = df
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.df.copy()
+
+
+# 与sales_dashboard每次刷新的访问顺序相同：取数据集、筛选索引和摘要
+def rerun(registry, name):
+    df = registry.get(name)
+    registry.derived(name, 'filter_index', lambda frame: FilterIndex(frame, ['所属区域', '客户简称']))
+    registry.derived(name, 'digest', frame_digest)
+    return df
+
+
+def test_over_budget_dataset_loaded_once_per_rerun():
+    loader = CountingLoader(make_frame())
+    registry = DatasetRegistry(max_bytes=1024)
+    registry.register('Q1', loader)
+
+    rerun(registry, 'Q1')
+    assert loader.calls == 1
+    rerun(registry, 'Q1')
+    assert loader.calls == 1
+    assert registry.is_resident('Q1')
+    assert registry.over_budget()
+    assert registry.footprint().loc[0, '状态'] == '常驻内存（超出预算）'
+
+
+# 数据集本身在预算内，加上派生结构后超过预算：淘汰其他数据集，当前数据集保持常驻
+def test_derived_growth_keeps_current_dataset():
+    df = make_frame()
+    loaders = {'Q1': CountingLoader(df), 'Q2': CountingLoader(df)}
+    budget = int(df.memory_usage(index=True, deep=True).sum()) + 1024
+    registry = DatasetRegistry(max_bytes=budget)
+    for name, loader in loaders.items():
+        registry.register(name, loader)
+
+    rerun(registry, 'Q1')
+    rerun(registry, 'Q2')
+    rerun(registry, 'Q2')
+    assert loaders['Q2'].calls == 1
+    assert registry.is_resident('Q2')
+    assert not registry.is_resident('Q1')
+
+
+def test_oversize_put_keeps_existing_entry():
+    cache = ByteLRUCache(max_bytes=100)
+    cache.put('a', 'small', nbytes=10)
+    cache.put('a', 'large', nbytes=1000)
+    assert cache.get('a') == 'small'
+    cache.put('b', 'large', nbytes=1000)
+    assert 'b' not in cache
+    assert cache.total_bytes == 10
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from dimensions import concat_frames, encode_dimensions
+from join_index import JoinIndex
+
+REGIONS = ['东北区', '华东区', '华北区', '华南区', '西南区']
+
+
+def categorical(values, categories):
+    return pd.Categorical(values, categories=categories)
+
+
+def test_existing_categorical_gets_sorted_shared_categories():
+    material = pd.DataFrame({'所属区域': categorical(['华北区', '西南区', '东北区'],
+                                                 ['华北区', '华东区', '华南区', '西南区', '东北区'])})
+    sales = pd.DataFrame({'所属区域': ['华南区', '华东区', None]})
+    encode_dimensions(material, sales)
+
+    for df in (material, sales):
+        assert list(df['所属区域'].cat.categories) == REGIONS
+    assert material['所属区域'].tolist() == ['华北区', '西南区', '东北区']
+    assert sales['所属区域'].tolist()[:2] == ['华南区', '华东区']
+    assert sales['所属区域'].isna().tolist() == [False, False, True]
+
+
+def test_concat_unifies_category_order():
+    first = pd.DataFrame({'所属区域': categorical(['华北区', '华东区'], ['华北区', '华东区'])})
+    second = pd.DataFrame({'所属区域': categorical(['华东区', '华北区'], ['华东区', '华北区'])})
+    result = concat_frames([first, second])
+
+    assert isinstance(result['所属区域'].dtype, pd.CategoricalDtype)
+    assert list(result['所属区域'].cat.categories) == ['华东区', '华北区']
+    assert result['所属区域'].tolist() == ['华北区', '华东区', '华东区', '华北区']
+
+
+def test_join_extra_key_with_different_category_order():
+    left = pd.DataFrame({
+        '发运月份': pd.to_datetime(['2025-01-01'] * 3),
+        '客户代码': ['C1', 'C1', 'C2'],
+        '所属区域': categorical(['华北区', '华东区', '华北区'], ['华北区', '华东区']),
+        '物料数量': [1, 2, 3]
+    })
+    right = pd.DataFrame({
+        '发运月份': pd.to_datetime(['2025-01-01'] * 3),
+        '客户代码': ['C1', 'C1', 'C2'],
+        '所属区域': categorical(['华北区', '华东区', '华东区'], ['华东区', '华北区']),
+        '销售总额': [10.0, 20.0, 30.0]
+    })
+    linked = JoinIndex(left, right).link(left, right, ['发运月份', '客户代码', '所属区域', '物料数量'],
+                                         ['发运月份', '客户代码', '所属区域', '销售总额'], extra_keys=['所属区域'])
+    expected = pd.merge(left.astype({'所属区域': object}), right.astype({'所属区域': object}),
+                        on=['发运月份', '客户代码', '所属区域'])
+
+    assert linked['所属区域'].astype(object).tolist() == expected['所属区域'].tolist() == ['华北区', '华东区']
+    assert linked['物料数量'].tolist() == expected['物料数量'].tolist()
+    assert linked['销售总额'].tolist() == expected['销售总额'].tolist()
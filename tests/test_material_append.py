@@ -0,0 +1,102 @@
+import importlib
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from aggregates import AggregationStore
+from analytics import MaterialAnalytics
+from data_cache import read_segment_index, segment_paths
+from schema import MATERIAL_SCHEMA, MATERIAL_SALES_SCHEMA
+
+
+@pytest.fixture(scope='module')
+def app():
+    module = importlib.import_module('物料分析')
+    module.SYNTHETIC_SEED = 1
+    return module
+
+
+@pytest.fixture(scope='module')
+def frames(app):
+    df_material, df_sales, df_material_price = app.load_data()
+    return df_material, df_sales, df_material_price
+
+
+# 去掉最后一个月物料数据的看板：该月份只有销售数据
+def split_last_month(df_material, df_sales):
+    last = df_material['发运月份'].max()
+    old = df_material[df_material['发运月份'] < last].reset_index(drop=True)
+    new = df_material[df_material['发运月份'] == last].reset_index(drop=True)
+    analytics = MaterialAnalytics(old, df_sales, AggregationStore(old, df_sales))
+    return analytics, new, last
+
+
+# 上传的Excel文件：只包含源数据的列，维度列还原为普通文本
+def excel_upload(df, schema, name):
+    raw = df[[column for column in schema if column in df.columns]].copy()
+    for column in raw.columns:
+        if isinstance(raw[column].dtype, pd.CategoricalDtype):
+            raw[column] = raw[column].astype(object)
+    buffer = io.BytesIO()
+    raw.to_excel(buffer, index=False)
+    buffer.name = name
+    return buffer
+
+
+def test_material_month_with_only_sales_can_be_appended(frames):
+    df_material, df_sales, _ = frames
+    analytics, new_material, last = split_last_month(df_material, df_sales)
+
+    analytics.append(new_material, df_sales.iloc[:0])
+    assert (analytics.frames['material']['发运月份'] == last).sum() == len(new_material)
+    assert analytics.store.tables['material']['发运月份'].max() == last
+
+
+def test_existing_month_is_rejected_per_table(frames):
+    df_material, df_sales, _ = frames
+    analytics, new_material, last = split_last_month(df_material, df_sales)
+
+    with pytest.raises(ValueError, match='销售数据'):
+        analytics.append(df_material.iloc[:0], df_sales[df_sales['发运月份'] == last])
+    with pytest.raises(ValueError, match='物料数据'):
+        analytics.append(df_material[df_material['发运月份'] < last].head(5), df_sales.iloc[:0])
+    assert len(analytics.frames['material']) == len(df_material) - len(new_material)
+
+
+# 追加时指向临时目录中的数据文件，保存的数据段写在它们旁边
+@pytest.fixture
+def data_files(app, tmp_path, monkeypatch):
+    paths = {}
+    for attribute, name in (('MATERIAL_FILE_PATH', 'material.xlsx'), ('SALES_FILE_PATH', 'sales.xlsx')):
+        path = str(tmp_path / name)
+        open(path, 'wb').close()
+        monkeypatch.setattr(app, attribute, path)
+        paths[attribute] = path
+    return paths
+
+
+def test_failed_append_removes_saved_segments(app, frames, data_files, monkeypatch):
+    df_material, df_sales, df_material_price = frames
+    analytics, new_material, last = split_last_month(df_material, df_sales)
+    material_upload = excel_upload(new_material, MATERIAL_SCHEMA, 'material_new.xlsx')
+    sales_upload = excel_upload(df_sales.head(20).assign(发运月份=last + pd.DateOffset(months=1)),
+                                MATERIAL_SALES_SCHEMA, 'sales_new.xlsx')
+
+    def fail(new_material, new_sales):
+        raise RuntimeError("更新失败")
+
+    monkeypatch.setattr(analytics, 'append', fail)
+    with pytest.raises(RuntimeError):
+        app.append_month_files(analytics, df_material_price, material_upload, sales_upload)
+    for path in data_files.values():
+        assert read_segment_index(path) == []
+        assert [files for _, _, files in os.walk(segment_paths(path)[1]) if files] == []
+
+    monkeypatch.undo()
+    monkeypatch.setattr(app, 'MATERIAL_FILE_PATH', data_files['MATERIAL_FILE_PATH'])
+    monkeypatch.setattr(app, 'SALES_FILE_PATH', data_files['SALES_FILE_PATH'])
+    app.append_month_files(analytics, df_material_price, material_upload, sales_upload)
+    assert [len(read_segment_index(path)) for path in data_files.values()] == [1, 1]
+    assert (analytics.frames['material']['发运月份'] == last).sum() == len(new_material)
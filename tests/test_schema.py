@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from schema import MATERIAL_SALES_SCHEMA, MATERIAL_SCHEMA, coerce_schema, coerce_str
+
+
+def test_float_code_column_with_blank_cells():
+    # 含空单元格的整数代码列被读成浮点数
+    codes = pd.Series([1001.0, np.nan, 20035.0])
+    converted, problems = coerce_str(codes)
+    assert problems == []
+    assert converted.tolist()[0] == '1001'
+    assert pd.isna(converted.iloc[1])
+    assert converted.tolist()[2] == '20035'
+
+
+def test_mixed_code_column():
+    converted, _ = coerce_str(pd.Series(['A01', 12, 7.0, 2.5, None], dtype=object))
+    assert converted.tolist()[:4] == ['A01', '12', '7', '2.5']
+    assert pd.isna(converted.iloc[4])
+
+
+# 一个文件中的客户代码含空单元格（浮点数），另一个文件中是整数，转换后仍能关联
+def test_codes_join_across_files():
+    material = pd.DataFrame({
+        '发运月份': ['2025-01', '2025-01', '2025-02'],
+        '所属区域': ['东', '东', '南'],
+        '省份': ['上海', '上海', '广东'],
+        '城市': ['上海', '上海', '广州'],
+        '经销商名称': ['甲', '乙', '丙'],
+        '客户代码': [101.0, np.nan, 303.0],
+        '物料代码': ['M1', 'M2', 'M1'],
+        '物料名称': ['海报', '货架', '海报'],
+        '物料数量': [10, 5, 8],
+        '申请人': ['张三', '李四', '王五']
+    })
+    sales = pd.DataFrame({
+        '发运月份': ['2025-01', '2025-02'],
+        '所属区域': ['东', '南'],
+        '省份': ['上海', '广东'],
+        '城市': ['上海', '广州'],
+        '经销商名称': ['甲', '丙'],
+        '客户代码': [101, 303],
+        '产品代码': ['P1', 'P2'],
+        '产品名称': ['产品1', '产品2'],
+        '求和项:数量（箱）': [3, 4],
+        '求和项:单价（箱）': [100.0, 120.0],
+        '申请人': ['张三', '王五']
+    })
+    coerce_schema(material, MATERIAL_SCHEMA, "物料")
+    coerce_schema(sales, MATERIAL_SALES_SCHEMA, "销售")
+    linked = pd.merge(material, sales, on=['发运月份', '客户代码'])
+    assert sorted(linked['客户代码']) == ['101', '303']
@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+from analytics import FilterSpec
+from data_cache import write_arrow_frame
+from dimensions import encode_dimensions
+from filter_index import FilterIndex
+import sql_backend
+
+if not sql_backend.available():
+    pytest.skip("需要安装duckdb", allow_module_level=True)
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Q1xlsx.xlsx')
+FILTER_COLUMNS = ['所属区域', '客户简称', '产品代码', '申请人']
+NEW_PRODUCTS = ['F0110C', 'F0183F', 'F01K8A', 'F0183K', 'F0101P']
+ROWS = 50_000
+
+# 两个引擎都实现的指标及其额外参数
+METRICS = {
+    'region_sales': (),
+    'customer_segments': (NEW_PRODUCTS,),
+    'purchase_matrix': (),
+    'penetration': (NEW_PRODUCTS,),
+    'region_penetration': (NEW_PRODUCTS,),
+    'monthly_penetration': (NEW_PRODUCTS,),
+}
+
+SCENARIOS = ['不筛选', '两个区域', '一个客户', '区域+五个产品', '最后一个月']
+
+
+# 把Q1数据复制放大到ROWS行（与仪表盘加载后的形态相同）
+@pytest.fixture(scope='module')
+def sales():
+    base = pd.read_excel(DATA_FILE)
+    base['发运月份'] = pd.to_datetime(base['发运月份'])
+    base['销售额'] = base['单价（箱）'] * base['数量（箱）']
+    repeat = int(np.ceil(ROWS / len(base)))
+    df = pd.concat([base] * repeat, ignore_index=True).iloc[:ROWS].copy()
+    return encode_dimensions(df)[0]
+
+
+@pytest.fixture(scope='module')
+def index(sales):
+    return FilterIndex(sales, FILTER_COLUMNS)
+
+
+@pytest.fixture(scope='module')
+def backend(tmp_path_factory):
+    return sql_backend.DuckDBBackend(temp_directory=str(tmp_path_factory.mktemp('duckdb_tmp')))
+
+
+# 按月份切成主文件和追加数据段两个缓存文件，各自编码分类字典（与按月追加后的缓存相同）
+@pytest.fixture(scope='module')
+def file_backend(sales, backend, tmp_path_factory):
+    directory = tmp_path_factory.mktemp('cache')
+    last_month = sales['发运月份'].max()
+    files = []
+    for name, part in (('main', sales[sales['发运月份'] < last_month]), ('segment', sales[sales['发运月份'] >= last_month])):
+        part = part.astype({column: object for column in part.columns
+                            if isinstance(part[column].dtype, pd.CategoricalDtype)})
+        path = os.path.join(directory, f'{name}.arrow')
+        write_arrow_frame(encode_dimensions(part.reset_index(drop=True))[0], path)
+        files.append(path)
+    return backend.over_files(files)
+
+
+def make_spec(name, df):
+    regions = sorted(df['所属区域'].astype(str).unique())
+    customers = sorted(df['客户简称'].dropna().astype(str).unique())
+    products = sorted(df['产品代码'].astype(str).unique())
+    months = sorted(df['发运月份'].dropna().unique())
+    return {
+        '不筛选': FilterSpec(),
+        '两个区域': FilterSpec.of(regions=regions[:2]),
+        '一个客户': FilterSpec.of(customers=customers[len(customers) // 2:len(customers) // 2 + 1]),
+        '区域+五个产品': FilterSpec.of(regions=regions[:2], products=products[:5]),
+        '最后一个月': FilterSpec.of(start_date=months[-1], end_date=months[-1]),
+    }[name]
+
+
+# 浮点数按相对误差比较，整数类型宽度可以不同
+def assert_same(result, expected):
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_exact=False, rtol=1e-9,
+                                  check_index_type=False, check_column_type=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+@pytest.mark.parametrize('metric', list(METRICS))
+def test_dataframe_scan_matches_pandas(sales, index, backend, metric, scenario):
+    spec = make_spec(scenario, sales)
+    args = METRICS[metric]
+    expected = getattr(analytics, metric)(sales, spec, *args, index=index)
+    assert_same(getattr(backend, metric)(sales, spec, *args, index=index), expected)
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+@pytest.mark.parametrize('metric', list(METRICS))
+def test_cache_file_scan_matches_pandas(sales, index, file_backend, metric, scenario):
+    spec = make_spec(scenario, sales)
+    args = METRICS[metric]
+    expected = getattr(analytics, metric)(sales, spec, *args, index=index)
+    assert_same(getattr(file_backend, metric)(sales, spec, *args, index=index), expected)
+
+
+# 扫描文件的引擎不使用传入的DataFrame
+def test_cache_file_scan_reads_files(sales, file_backend):
+    counts = file_backend.query(None, f'SELECT COUNT(*) AS rows, SUM("销售额") AS sales FROM {sql_backend.SALES_TABLE}')
+    assert counts.at[0, 'rows'] == len(sales)
+    assert counts.at[0, 'sales'] == pytest.approx(sales['销售额'].sum())
+
+
+def test_temp_directory_next_to_data_file(tmp_path):
+    data_file = tmp_path / 'Q2.xlsx'
+    assert sql_backend.temp_directory_for(str(data_file)) == str(tmp_path / '.data_cache' / 'duckdb_tmp')
@@ -7,19 +7,70 @@ import dash
 from dash import dcc, html, callback, Input, Output, State
 import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
+import base64
 import calendar
+import io
+import os
 import warnings
+from functools import partial
+
+from data_cache import load_cached_frames, load_segment_frames, append_segment, remove_segment, month_keys
+from dimensions import encode_dimensions
+from schema import MATERIAL_SCHEMA, MATERIAL_SALES_SCHEMA, MATERIAL_PRICE_SCHEMA, coerce_schema
+from excel_stream import read_excel_streaming, print_progress
+from synthetic_data import generate_material_data
+from filter_index import sort_by_month
+from aggregates import AggregationStore
+from analytics import FilterSpec, MaterialAnalytics
+from attribution import AttributionWindow
+from allocation import SPEND_CAP_MULTIPLE
 
 warnings.filterwarnings('ignore')
 
+# 数据文件路径
+MATERIAL_FILE_PATH = "2025物料源数据.xlsx"
+SALES_FILE_PATH = "25物料源销售数据.xlsx"
+MATERIAL_PRICE_FILE_PATH = "物料单价.xlsx"
+
+# 大文件流式读取模式及其内存上限（MB），None表示不限制
+STREAMING_READ = False
+STREAMING_MEMORY_LIMIT_MB = None
+
+# 找不到数据文件时生成的模拟数据规模和随机种子（None表示每次随机）
+SYNTHETIC_MATERIAL_ROWS = 500
+SYNTHETIC_SALES_ROWS = 600
+SYNTHETIC_SEED = None
+
+# 筛选结果缓存的字节预算（MB）和条目数上限，所有回调共享
+FILTER_CACHE_MAX_MB = 512
+FILTER_CACHE_MAX_ENTRIES = 64
+
+# 构建聚合存储的进程数，以及启用多进程的最小数据行数（数据量小时进程启动的开销大于收益）
+AGGREGATION_WORKERS = os.cpu_count()
+AGGREGATION_PARALLEL_MIN_ROWS = 500_000
+
+# 物料ROI、物料-销售关联和物料分配使用的滞后归因：物料发运后0-3个月内该客户的销售额按物料成本分摊，
+# 滞后每多一个月权重乘以衰减系数
+ATTRIBUTION_MIN_LAG = 0
+ATTRIBUTION_MAX_LAG = 3
+ATTRIBUTION_DECAY = 0.5
+
 
 # 加载数据
-def load_data():
+def load_data(streaming=STREAMING_READ, memory_limit_mb=STREAMING_MEMORY_LIMIT_MB):
     try:
-        # 尝试加载真实数据
-        df_material = pd.read_excel("2025物料源数据.xlsx")
-        df_sales = pd.read_excel("25物料源销售数据.xlsx")
-        df_material_price = pd.read_excel("物料单价.xlsx")
+        # 尝试加载真实数据：三个文件并行解析，未变化的文件直接读取列式缓存
+        if streaming:
+            read_workbook = partial(read_excel_streaming, memory_limit_mb=memory_limit_mb, progress=print_progress)
+        else:
+            read_workbook = pd.read_excel
+        df_material, df_sales, df_material_price = load_cached_frames(
+            [MATERIAL_FILE_PATH, SALES_FILE_PATH, MATERIAL_PRICE_FILE_PATH], read_workbook)
+        # 合并仪表盘中按月追加的数据段（各段有自己的列式缓存）
+        df_material = pd.concat([df_material] + load_segment_frames(
+            MATERIAL_FILE_PATH, read_workbook, existing_keys=month_keys(df_material['发运月份'])), ignore_index=True)
+        df_sales = pd.concat([df_sales] + load_segment_frames(
+            SALES_FILE_PATH, read_workbook, existing_keys=month_keys(df_sales['发运月份'])), ignore_index=True)
 
         print("成功加载真实数据文件")
 
@@ -28,239 +79,120 @@ def load_data():
         print("创建模拟数据用于演示...")
 
         # 创建模拟数据
-        # 生成日期范围
-        date_range = pd.date_range(start='2024-01-01', end='2024-12-31', freq='MS')
-
-        # 区域、省份、城市和经销商数据
-        regions = ['华北区', '华东区', '华南区', '西南区', '东北区']
-        provinces = ['北京', '上海', '广东', '四川', '浙江', '江苏', '湖北', '辽宁', '黑龙江', '河南']
-        cities = ['北京', '上海', '广州', '成都', '杭州', '南京', '武汉', '沈阳', '哈尔滨', '郑州']
-        distributors = [f'经销商{i}' for i in range(1, 21)]
-        customer_codes = [f'C{i:04d}' for i in range(1, 21)]
-        sales_persons = [f'销售{i}' for i in range(1, 11)]
-
-        # 物料数据
-        material_codes = [f'M{i:04d}' for i in range(1, 11)]
-        material_names = ['促销海报', '展示架', '货架陈列', '柜台展示', '地贴', '吊旗', '宣传册', '样品', '门店招牌',
-                          '促销礼品']
-        material_prices = [100, 500, 300, 200, 50, 80, 20, 5, 1000, 10]
-
-        # 产品数据
-        product_codes = [f'P{i:04d}' for i in range(1, 11)]
-        product_names = ['口力薄荷糖', '口力泡泡糖', '口力果味糖', '口力清新糖', '口力夹心糖', '口力棒棒糖', '口力软糖',
-                         '口力硬糖', '口力奶糖', '口力巧克力']
-        product_prices = [20, 25, 18, 22, 30, 15, 28, 26, 35, 40]
-
-        # 创建物料单价数据
-        material_price_data = {
-            '物料代码': material_codes,
-            '物料名称': material_names,
-            '单价（元）': material_prices
-        }
-        df_material_price = pd.DataFrame(material_price_data)
-
-        # 创建物料数据
-        material_data = []
-        for _ in range(500):  # 生成500条记录
-            date = np.random.choice(date_range)
-            region = np.random.choice(regions)
-            province = np.random.choice(provinces)
-            city = np.random.choice(cities)
-            distributor_idx = np.random.randint(0, len(distributors))
-            distributor = distributors[distributor_idx]
-            customer_code = customer_codes[distributor_idx]
-            material_idx = np.random.randint(0, len(material_codes))
-            material_code = material_codes[material_idx]
-            material_name = material_names[material_idx]
-            material_quantity = np.random.randint(1, 100)
-            sales_person = np.random.choice(sales_persons)
-
-            material_data.append({
-                '发运月份': date,
-                '所属区域': region,
-                '省份': province,
-                '城市': city,
-                '经销商名称': distributor,
-                '客户代码': customer_code,
-                '物料代码': material_code,
-                '物料名称': material_name,
-                '物料数量': material_quantity,
-                '申请人': sales_person
-            })
-
-        df_material = pd.DataFrame(material_data)
-
-        # 创建销售数据
-        sales_data = []
-        for _ in range(600):  # 生成600条记录
-            date = np.random.choice(date_range)
-            region = np.random.choice(regions)
-            province = np.random.choice(provinces)
-            city = np.random.choice(cities)
-            distributor_idx = np.random.randint(0, len(distributors))
-            distributor = distributors[distributor_idx]
-            customer_code = customer_codes[distributor_idx]
-            product_idx = np.random.randint(0, len(product_codes))
-            product_code = product_codes[product_idx]
-            product_name = product_names[product_idx]
-            product_price = product_prices[product_idx]
-            product_quantity = np.random.randint(10, 1000)
-            sales_person = np.random.choice(sales_persons)
-
-            sales_data.append({
-                '发运月份': date,
-                '所属区域': region,
-                '省份': province,
-                '城市': city,
-                '经销商名称': distributor,
-                '客户代码': customer_code,
-                '产品代码': product_code,
-                '产品名称': product_name,
-                '求和项:数量（箱）': product_quantity,
-                '求和项:单价（箱）': product_price,
-                '申请人': sales_person
-            })
-
-        df_sales = pd.DataFrame(sales_data)
-
-    # 清理和标准化数据 (与原始代码相同)
-    # 确保日期格式一致
-    df_material['发运月份'] = pd.to_datetime(df_material['发运月份'])
-    df_sales['发运月份'] = pd.to_datetime(df_sales['发运月份'])
+        df_material, df_sales, df_material_price = generate_material_data(
+            SYNTHETIC_MATERIAL_ROWS, SYNTHETIC_SALES_ROWS, seed=SYNTHETIC_SEED)
+
+    coerce_schema(df_material_price, MATERIAL_PRICE_SCHEMA, "物料单价")
+    prepare_material(df_material, df_material_price)
+    prepare_sales(df_sales)
+
+    # 维度列编码为分类类型，物料和销售数据共享同一套类别字典
+    encode_dimensions(df_material, df_sales)
+
+    # 按发运月份排序存放，日期筛选可以直接取连续的行区间
+    df_material = sort_by_month(df_material)
+    df_sales = sort_by_month(df_sales)
+
+    return df_material, df_sales, df_material_price
+
+
+# 清理和标准化数据并计算派生列（直接修改传入的DataFrame），加载时和追加新月份的数据时共用
+# 按声明的结构统一转换列类型，发运月份按明确格式解析
+def prepare_material(df_material, df_material_price):
+    coerce_schema(df_material, MATERIAL_SCHEMA, "物料")
 
     # 处理物料单价数据，创建查找字典
     material_price_dict = dict(zip(df_material_price['物料代码'], df_material_price['单价（元）']))
 
-    # 将物料单价添加到物料数据中
-    df_material['物料单价'] = df_material['物料代码'].map(material_price_dict)
+    # 将物料单价添加到物料数据中（物料代码可能是分类类型，按索引查找保证得到数值列）
+    df_material['物料单价'] = pd.Series(material_price_dict).reindex(df_material['物料代码']).to_numpy()
 
     # 计算物料总成本
     df_material['物料总成本'] = df_material['物料数量'] * df_material['物料单价']
 
+
+def prepare_sales(df_sales):
+    coerce_schema(df_sales, MATERIAL_SALES_SCHEMA, "销售")
+
     # 计算销售总额
     df_sales['销售总额'] = df_sales['求和项:数量（箱）'] * df_sales['求和项:单价（箱）']
 
-    return df_material, df_sales, df_material_price
+
+# 解析dcc.Upload上传的Excel文件内容，返回带文件名的字节流（可直接交给pd.read_excel和append_segment）
+def read_upload(contents, file_name):
+    buffer = io.BytesIO(base64.b64decode(contents.split(',', 1)[1]))
+    buffer.name = file_name
+    return buffer
+
+
+# 追加新月份的物料和/或销售数据文件：先在内存中校验月份不与已有数据重叠，再更新仪表盘的数据；
+# 使用真实数据文件时同时保存为追加数据段（见append_segment），下次启动时自动合并。
+# 保存或更新任何一步失败时撤销已保存的数据段，磁盘上的数据与内存中的保持一致
+def append_month_files(analytics, df_material_price, material_upload=None, sales_upload=None):
+    # 没有上传的一侧使用同结构的空表
+    if material_upload is not None:
+        new_material = pd.read_excel(material_upload)
+        prepare_material(new_material, df_material_price)
+    else:
+        new_material = analytics.frames['material'].iloc[:0]
+    if sales_upload is not None:
+        new_sales = pd.read_excel(sales_upload)
+        prepare_sales(new_sales)
+    else:
+        new_sales = analytics.frames['sales'].iloc[:0]
+    analytics.store.check_new_months(new_material, new_sales)
+
+    saved = []
+    try:
+        for upload, file_path, name in ((material_upload, MATERIAL_FILE_PATH, 'material'),
+                                        (sales_upload, SALES_FILE_PATH, 'sales')):
+            if upload is not None and os.path.exists(file_path):
+                upload.seek(0)
+                append_segment(file_path, upload, pd.read_excel, '发运月份',
+                               existing_keys=month_keys(analytics.frames[name]['发运月份']))
+                saved.append((file_path, upload))
+        analytics.append(new_material, new_sales)
+    except Exception:
+        for file_path, upload in saved:
+            remove_segment(file_path, upload)
+        raise
+    return new_material, new_sales
+
+
+# KPI卡片上的总物料成本、总销售额、总体费比和平均物料效益
+def kpi_texts(df_material, df_sales):
+    total_material_cost = df_material['物料总成本'].sum()
+    total_sales = df_sales['销售总额'].sum()
+    overall_cost_sales_ratio = (total_material_cost / total_sales) * 100
+    avg_material_effectiveness = total_sales / df_material['物料数量'].sum()
+    return [f"￥{total_material_cost:,.2f}", f"￥{total_sales:,.2f}", f"{overall_cost_sales_ratio:.2f}%",
+            f"￥{avg_material_effectiveness:.2f}"]
 
 
 # 创建聚合数据和计算指标
+# 返回按筛选条件汇总的聚合存储，仪表盘回调直接从中读取；仍可按原来的名称（region_metrics等）取未筛选的汇总表
+# 数据量较大时按客户代码分区在多个进程中构建
 def create_aggregations(df_material, df_sales):
-    # 按区域、省份、城市、客户代码、经销商名称进行聚合物料数据
-    material_by_region = df_material.groupby('所属区域').agg({
-        '物料数量': 'sum',
-        '物料总成本': 'sum'
-    }).reset_index()
-
-    material_by_province = df_material.groupby('省份').agg({
-        '物料数量': 'sum',
-        '物料总成本': 'sum'
-    }).reset_index()
-
-    material_by_customer = df_material.groupby(['客户代码', '经销商名称']).agg({
-        '物料数量': 'sum',
-        '物料总成本': 'sum'
-    }).reset_index()
-
-    material_by_time = df_material.groupby(['发运月份']).agg({
-        '物料数量': 'sum',
-        '物料总成本': 'sum'
-    }).reset_index()
-
-    # 按区域、省份、城市、客户代码、经销商名称聚合销售数据
-    sales_by_region = df_sales.groupby('所属区域').agg({
-        '求和项:数量（箱）': 'sum',
-        '销售总额': 'sum'
-    }).reset_index()
-
-    sales_by_province = df_sales.groupby('省份').agg({
-        '求和项:数量（箱）': 'sum',
-        '销售总额': 'sum'
-    }).reset_index()
-
-    sales_by_customer = df_sales.groupby(['客户代码', '经销商名称']).agg({
-        '求和项:数量（箱）': 'sum',
-        '销售总额': 'sum'
-    }).reset_index()
-
-    sales_by_time = df_sales.groupby(['发运月份']).agg({
-        '求和项:数量（箱）': 'sum',
-        '销售总额': 'sum'
-    }).reset_index()
-
-    # 合并区域数据计算费比
-    region_metrics = pd.merge(material_by_region, sales_by_region, on='所属区域', how='outer')
-    region_metrics['费比'] = (region_metrics['物料总成本'] / region_metrics['销售总额']) * 100
-    region_metrics['物料单位效益'] = region_metrics['销售总额'] / region_metrics['物料数量']
-
-    # 合并省份数据计算费比
-    province_metrics = pd.merge(material_by_province, sales_by_province, on='省份', how='outer')
-    province_metrics['费比'] = (province_metrics['物料总成本'] / province_metrics['销售总额']) * 100
-    province_metrics['物料单位效益'] = province_metrics['销售总额'] / province_metrics['物料数量']
-
-    # 合并客户数据计算费比
-    customer_metrics = pd.merge(material_by_customer, sales_by_customer, on=['客户代码', '经销商名称'], how='outer')
-    customer_metrics['费比'] = (customer_metrics['物料总成本'] / customer_metrics['销售总额']) * 100
-    customer_metrics['物料单位效益'] = customer_metrics['销售总额'] / customer_metrics['物料数量']
-
-    # 合并时间数据计算费比
-    time_metrics = pd.merge(material_by_time, sales_by_time, on='发运月份', how='outer')
-    time_metrics['费比'] = (time_metrics['物料总成本'] / time_metrics['销售总额']) * 100
-    time_metrics['物料单位效益'] = time_metrics['销售总额'] / time_metrics['物料数量']
-
-    # 按销售人员聚合
-    salesperson_metrics = pd.merge(
-        df_material.groupby('申请人').agg({'物料总成本': 'sum'}),
-        df_sales.groupby('申请人').agg({'销售总额': 'sum'}),
-        on='申请人'
-    )
-    salesperson_metrics['费比'] = (salesperson_metrics['物料总成本'] / salesperson_metrics['销售总额']) * 100
-    salesperson_metrics = salesperson_metrics.reset_index()
-
-    # 物料-产品关联分析
-    # 合并物料数据和销售数据，按客户代码和月份
-    material_product_link = pd.merge(
-        df_material[['发运月份', '客户代码', '经销商名称', '物料代码', '物料名称', '物料数量']],
-        df_sales[['发运月份', '客户代码', '经销商名称', '产品代码', '产品名称', '求和项:数量（箱）', '销售总额']],
-        on=['发运月份', '客户代码', '经销商名称'],
-        how='inner'
-    )
-
-    # 创建物料-产品关联度量
-    material_product_corr = material_product_link.groupby(['物料代码', '物料名称', '产品代码', '产品名称']).agg({
-        '物料数量': 'sum',
-        '求和项:数量（箱）': 'sum',
-        '销售总额': 'sum'
-    }).reset_index()
-
-    material_product_corr['关联强度'] = material_product_corr['销售总额'] / material_product_corr['物料数量']
-
-    # 计算物料组合效益
-    material_combinations = material_product_link.groupby(['客户代码', '发运月份']).agg({
-        '物料代码': lambda x: ','.join(sorted(set(x))),
-        '销售总额': 'sum'
-    }).reset_index()
-
-    material_combo_performance = material_combinations.groupby('物料代码').agg({
-        '销售总额': ['mean', 'sum', 'count']
-    }).reset_index()
-    material_combo_performance.columns = ['物料组合', '平均销售额', '总销售额', '使用次数']
-    material_combo_performance = material_combo_performance.sort_values('平均销售额', ascending=False)
-
-    return {
-        'region_metrics': region_metrics,
-        'province_metrics': province_metrics,
-        'customer_metrics': customer_metrics,
-        'time_metrics': time_metrics,
-        'salesperson_metrics': salesperson_metrics,
-        'material_product_corr': material_product_corr,
-        'material_combo_performance': material_combo_performance
-    }
+    parallel = len(df_material) + len(df_sales) >= AGGREGATION_PARALLEL_MIN_ROWS
+    return AggregationStore(df_material, df_sales, workers=AGGREGATION_WORKERS if parallel else None)
 
 
 # 创建仪表盘
-def create_dashboard(df_material, df_sales, aggregations):
+# df_material_price用于追加新月份的物料数据时计算物料单价，未提供时使用已有物料数据中的单价
+def create_dashboard(df_material, df_sales, aggregations, df_material_price=None):
     app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
+    # 各项指标由analytics模块计算，回调只负责把筛选条件转换为FilterSpec并绘图
+    # 明细的筛选结果缓存在其中，同一次筛选变化触发的所有回调共享同一份筛选结果
+    analytics = MaterialAnalytics(df_material, df_sales, aggregations,
+                                  cache_max_bytes=FILTER_CACHE_MAX_MB * 1024 * 1024,
+                                  cache_max_entries=FILTER_CACHE_MAX_ENTRIES,
+                                  window=AttributionWindow(ATTRIBUTION_MIN_LAG, ATTRIBUTION_MAX_LAG, ATTRIBUTION_DECAY))
+
+    if df_material_price is None:
+        prices = analytics.unit_prices()
+        df_material_price = pd.DataFrame({'物料代码': prices.index, '单价（元）': prices.to_numpy()})
+
     # 获取所有过滤选项
     regions = sorted(df_material['所属区域'].unique())
     provinces = sorted(df_material['省份'].unique())
@@ -270,10 +202,7 @@ def create_dashboard(df_material, df_sales, aggregations):
     salespersons = sorted(df_material['申请人'].unique())
 
     # 计算KPI
-    total_material_cost = df_material['物料总成本'].sum()
-    total_sales = df_sales['销售总额'].sum()
-    overall_cost_sales_ratio = (total_material_cost / total_sales) * 100
-    avg_material_effectiveness = total_sales / df_material['物料数量'].sum()
+    material_cost_text, sales_text, cost_sales_ratio_text, effectiveness_text = kpi_texts(df_material, df_sales)
 
     # 构建布局
     app.layout = dbc.Container([
@@ -285,19 +214,19 @@ def create_dashboard(df_material, df_sales, aggregations):
         dbc.Row([
             dbc.Col(dbc.Card([
                 dbc.CardHeader("总物料成本"),
-                dbc.CardBody(html.H4(f"￥{total_material_cost:,.2f}", className="card-title"))
+                dbc.CardBody(html.H4(material_cost_text, id="kpi-material-cost", className="card-title"))
             ]), width=3),
             dbc.Col(dbc.Card([
                 dbc.CardHeader("总销售额"),
-                dbc.CardBody(html.H4(f"￥{total_sales:,.2f}", className="card-title"))
+                dbc.CardBody(html.H4(sales_text, id="kpi-sales", className="card-title"))
             ]), width=3),
             dbc.Col(dbc.Card([
                 dbc.CardHeader("总体费比"),
-                dbc.CardBody(html.H4(f"{overall_cost_sales_ratio:.2f}%", className="card-title"))
+                dbc.CardBody(html.H4(cost_sales_ratio_text, id="kpi-cost-sales-ratio", className="card-title"))
             ]), width=3),
             dbc.Col(dbc.Card([
                 dbc.CardHeader("平均物料效益"),
-                dbc.CardBody(html.H4(f"￥{avg_material_effectiveness:.2f}", className="card-title"))
+                dbc.CardBody(html.H4(effectiveness_text, id="kpi-material-effectiveness", className="card-title"))
             ]), width=3)
         ], className="mb-4"),
 
@@ -333,6 +262,25 @@ def create_dashboard(df_material, df_sales, aggregations):
             ], width=6)
         ], className="mb-4"),
 
+        # 追加新月份的数据：只为新月份构建聚合单元，不重新加载历史数据
+        dbc.Row([
+            dbc.Col([
+                html.Label("追加月度数据:"),
+                dcc.Upload(id='append-material-upload', children=html.Div("上传新月份的物料数据"),
+                           accept='.xlsx', className="border rounded p-2 text-center")
+            ], width=4),
+            dbc.Col([
+                dcc.Upload(id='append-sales-upload', children=html.Div("上传新月份的销售数据"),
+                           accept='.xlsx', className="border rounded p-2 text-center")
+            ], width=4),
+            dbc.Col([
+                html.Div([
+                    dbc.Button("追加到当前数据", id='append-button', color="primary", className="mr-2"),
+                    html.Span(id='append-status')
+                ])
+            ], width=4)
+        ], className="mb-4 align-items-end"),
+
         # 选项卡布局
         dbc.Tabs([
             # 区域性能分析选项卡
@@ -492,6 +440,16 @@ def create_dashboard(df_material, df_sales, aggregations):
                 dbc.Row([
                     dbc.Col([
                         html.H4("最优物料分配建议", className="text-center"),
+                        html.Div([
+                            html.Label("每月物料预算 (元):", className="mr-2"),
+                            dcc.Input(
+                                id='allocation-budget',
+                                type='number',
+                                min=0,
+                                debounce=True,
+                                placeholder="默认为当前月均物料投入"
+                            )
+                        ], className="mb-3"),
                         html.Div(id="optimal-material-allocation")
                     ], width=12)
                 ])
@@ -501,6 +459,60 @@ def create_dashboard(df_material, df_sales, aggregations):
 
     # 回调函数
 
+    # 追加新月份的数据：明细、预聚合存储和索引一起更新后，刷新KPI、筛选选项和日期范围
+    # 日期范围被重新设置后，所有图表都会按更新后的数据重新计算
+    @app.callback(
+        [Output("append-status", "children"),
+         Output("kpi-material-cost", "children"),
+         Output("kpi-sales", "children"),
+         Output("kpi-cost-sales-ratio", "children"),
+         Output("kpi-material-effectiveness", "children"),
+         Output("region-filter", "options"),
+         Output("province-filter", "options"),
+         Output("date-filter", "min_date_allowed"),
+         Output("date-filter", "max_date_allowed"),
+         Output("date-filter", "start_date"),
+         Output("date-filter", "end_date")],
+        [Input("append-button", "n_clicks")],
+        [State("append-material-upload", "contents"),
+         State("append-material-upload", "filename"),
+         State("append-sales-upload", "contents"),
+         State("append-sales-upload", "filename"),
+         State("date-filter", "start_date"),
+         State("date-filter", "end_date")],
+        prevent_initial_call=True
+    )
+    def append_month_data(n_clicks, material_contents, material_name, sales_contents, sales_name,
+                          start_date, end_date):
+        if not material_contents and not sales_contents:
+            raise PreventUpdate
+        old_first = analytics.frames['material']['发运月份'].min().date()
+        old_last = analytics.frames['material']['发运月份'].max().date()
+        try:
+            new_material, new_sales = append_month_files(
+                analytics, df_material_price,
+                read_upload(material_contents, material_name) if material_contents else None,
+                read_upload(sales_contents, sales_name) if sales_contents else None)
+        except (ValueError, KeyError) as e:
+            status = html.Span(f"追加失败: {str(e)}", className="text-danger")
+            return [status] + [dash.no_update] * 10
+
+        material, sales = analytics.frames['material'], analytics.frames['sales']
+        first = material['发运月份'].min().date()
+        last = material['发运月份'].max().date()
+        # 原来选中了完整的日期范围时，扩展到包含新月份
+        if start_date is None or pd.Timestamp(start_date).date() == old_first:
+            start_date = first
+        if end_date is None or pd.Timestamp(end_date).date() == old_last:
+            end_date = last
+        status = html.Span(f"已追加物料 {len(new_material):,} 行、销售 {len(new_sales):,} 行",
+                           className="text-success")
+        return [status] + kpi_texts(material, sales) + [
+            [{'label': i, 'value': i} for i in sorted(material['所属区域'].dropna().unique())],
+            [{'label': i, 'value': i} for i in sorted(material['省份'].dropna().unique())],
+            first, last, start_date, end_date
+        ]
+
     # 区域销售表现图表
     @app.callback(
         Output("region-sales-chart", "figure"),
@@ -509,11 +521,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_region_sales_chart(selected_regions, start_date, end_date):
-        filtered_sales = filter_data(df_sales, selected_regions, None, start_date, end_date)
-
-        region_sales = filtered_sales.groupby('所属区域').agg({
-            '销售总额': 'sum'
-        }).reset_index().sort_values('销售总额', ascending=False)
+        spec = FilterSpec.of(selected_regions, start_date=start_date, end_date=end_date)
+        region_sales = analytics.region_sales(spec)
 
         # 创建更现代化的图表
         fig = px.bar(
@@ -582,18 +591,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_region_efficiency_chart(selected_regions, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, None, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, None, start_date, end_date)
-
-        region_material = filtered_material.groupby('所属区域').agg({
-            '物料数量': 'sum'
-        }).reset_index()
-
-        region_sales = filtered_sales.groupby('所属区域').agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        region_efficiency = pd.merge(region_material, region_sales, on='所属区域', how='outer')
+        spec = FilterSpec.of(selected_regions, start_date=start_date, end_date=end_date)
+        region_efficiency = analytics.metrics('所属区域', ['物料数量'], ['销售总额'], spec, how='outer')
         region_efficiency['物料效率'] = region_efficiency['销售总额'] / region_efficiency['物料数量']
         region_efficiency = region_efficiency.sort_values('物料效率', ascending=False)
 
@@ -668,19 +667,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_region_cost_sales_chart(selected_regions, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, None, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, None, start_date, end_date)
-
-        region_material = filtered_material.groupby('所属区域').agg({
-            '物料总成本': 'sum'
-        }).reset_index()
-
-        region_sales = filtered_sales.groupby('所属区域').agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        region_cost_sales = pd.merge(region_material, region_sales, on='所属区域', how='outer')
-        region_cost_sales['费比'] = (region_cost_sales['物料总成本'] / region_cost_sales['销售总额']) * 100
+        spec = FilterSpec.of(selected_regions, start_date=start_date, end_date=end_date)
+        region_cost_sales = analytics.cost_sales_ratio('所属区域', spec)
         region_cost_sales = region_cost_sales.sort_values('费比')
 
         # 添加平均费比线
@@ -792,18 +780,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_time_trend_chart(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        time_material = filtered_material.groupby('发运月份').agg({
-            '物料总成本': 'sum'
-        }).reset_index()
-
-        time_sales = filtered_sales.groupby('发运月份').agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        time_trends = pd.merge(time_material, time_sales, on='发运月份', how='outer')
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        time_trends = analytics.metrics('发运月份', ['物料总成本'], ['销售总额'], spec, how='outer')
         time_trends = time_trends.sort_values('发运月份')
 
         # 计算月度同比增长率
@@ -923,19 +901,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_monthly_cost_sales_chart(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        time_material = filtered_material.groupby('发运月份').agg({
-            '物料总成本': 'sum'
-        }).reset_index()
-
-        time_sales = filtered_sales.groupby('发运月份').agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        time_cost_sales = pd.merge(time_material, time_sales, on='发运月份', how='outer')
-        time_cost_sales['费比'] = (time_cost_sales['物料总成本'] / time_cost_sales['销售总额']) * 100
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        time_cost_sales = analytics.cost_sales_ratio('发运月份', spec)
         time_cost_sales = time_cost_sales.sort_values('发运月份')
 
         # 添加平均费比
@@ -1062,18 +1029,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_material_effectiveness_trend(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        time_material = filtered_material.groupby('发运月份').agg({
-            '物料数量': 'sum'
-        }).reset_index()
-
-        time_sales = filtered_sales.groupby('发运月份').agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        time_effectiveness = pd.merge(time_material, time_sales, on='发运月份', how='outer')
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        time_effectiveness = analytics.metrics('发运月份', ['物料数量'], ['销售总额'], spec, how='outer')
         time_effectiveness['物料效益'] = time_effectiveness['销售总额'] / time_effectiveness['物料数量']
         time_effectiveness = time_effectiveness.sort_values('发运月份')
 
@@ -1206,9 +1163,10 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_customer_value_chart(selected_regions, selected_provinces, start_date, end_date):
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        filtered_sales = analytics.cells('sales', spec)
 
-        customer_value = filtered_sales.groupby(['客户代码', '经销商名称']).agg({
+        customer_value = filtered_sales.groupby(['客户代码', '经销商名称'], observed=True).agg({
             '销售总额': 'sum'
         }).reset_index().sort_values('销售总额', ascending=False).head(10)
 
@@ -1305,19 +1263,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_customer_roi_chart(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        customer_material = filtered_material.groupby(['客户代码', '经销商名称']).agg({
-            '物料总成本': 'sum'
-        }).reset_index()
-
-        customer_sales = filtered_sales.groupby(['客户代码', '经销商名称']).agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        customer_roi = pd.merge(customer_material, customer_sales, on=['客户代码', '经销商名称'], how='inner')
-        customer_roi['投入产出比'] = customer_roi['销售总额'] / customer_roi['物料总成本']
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        customer_roi = analytics.customer_roi(spec)
 
         # 筛选条件：只显示物料成本至少超过1000元的客户，避免小额客户ROI过高
         customer_roi = customer_roi[customer_roi['物料总成本'] > 1000]
@@ -1409,16 +1356,19 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_material_effectiveness_chart(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        filtered_material = analytics.cells('material', spec)
+        filtered_sales = analytics.cells('sales', spec)
 
         # 按客户和月份聚合数据
-        material_by_customer = filtered_material.groupby(['客户代码', '经销商名称', '发运月份']).agg({
+        material_by_customer = filtered_material.groupby(['客户代码', '经销商名称', '发运月份'],
+                                                         observed=True).agg({
             '物料数量': 'sum',
             '物料总成本': 'sum'
         }).reset_index()
 
-        sales_by_customer = filtered_sales.groupby(['客户代码', '经销商名称', '发运月份']).agg({
+        sales_by_customer = filtered_sales.groupby(['客户代码', '经销商名称', '发运月份'],
+                                                   observed=True).agg({
             '销售总额': 'sum'
         }).reset_index()
 
@@ -1574,29 +1524,10 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_material_sales_correlation(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        # 按物料类型聚合数据
-        material_by_type = filtered_material.groupby('物料名称').agg({
-            '物料数量': 'sum'
-        }).reset_index()
-
-        # 合并客户物料和销售数据
-        material_sales_link = pd.merge(
-            filtered_material[['客户代码', '发运月份', '物料名称', '物料数量']],
-            filtered_sales[['客户代码', '发运月份', '销售总额']],
-            on=['客户代码', '发运月份'],
-            how='inner'
-        )
-
-        # 计算每种物料的相关销售额
-        material_sales_corr = material_sales_link.groupby('物料名称').agg({
-            '物料数量': 'sum',
-            '销售总额': 'sum'
-        }).reset_index()
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
 
-        material_sales_corr['单位物料销售额'] = material_sales_corr['销售总额'] / material_sales_corr['物料数量']
+        # 每种物料的归因销售额（发运后归因窗口内的销售额按成本分摊）和单位物料销售额
+        material_sales_corr = analytics.material_sales_correlation(spec)
         material_sales_corr = material_sales_corr.sort_values('单位物料销售额', ascending=False).head(10)
 
         # 创建更现代化的横条图
@@ -1686,9 +1617,10 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_province_sales_map(selected_regions, start_date, end_date):
-        filtered_sales = filter_data(df_sales, selected_regions, None, start_date, end_date)
+        spec = FilterSpec.of(selected_regions, start_date=start_date, end_date=end_date)
+        filtered_sales = analytics.cells('sales', spec)
 
-        province_sales = filtered_sales.groupby('省份').agg({
+        province_sales = filtered_sales.groupby('省份', observed=True).agg({
             '销售总额': 'sum'
         }).reset_index()
 
@@ -1777,9 +1709,10 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_city_material_map(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        filtered_material = analytics.cells('material', spec)
 
-        city_material = filtered_material.groupby('城市').agg({
+        city_material = filtered_material.groupby('城市', observed=True).agg({
             '物料数量': 'sum',
             '物料总成本': 'sum'
         }).reset_index()
@@ -1874,19 +1807,12 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_material_product_heatmap(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        # 合并物料和销售数据
-        material_product_link = pd.merge(
-            filtered_material[['发运月份', '客户代码', '物料名称', '物料数量']],
-            filtered_sales[['发运月份', '客户代码', '产品名称', '销售总额']],
-            on=['发运月份', '客户代码'],
-            how='inner'
-        )
+        # 物料-产品关联单元（按客户和月份关联）从聚合存储读取，不再逐行合并
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        material_product_link = analytics.cells('link', spec)
 
         # 计算每种物料-产品组合的销售额
-        material_product_sales = material_product_link.groupby(['物料名称', '产品名称']).agg({
+        material_product_sales = material_product_link.groupby(['物料名称', '产品名称'], observed=True).agg({
             '销售总额': 'sum'
         }).reset_index()
 
@@ -1895,12 +1821,15 @@ def create_dashboard(df_material, df_sales, aggregations):
             index='物料名称',
             columns='产品名称',
             values='销售总额',
-            fill_value=0
+            fill_value=0,
+            observed=True
         )
 
         # 获取前8种物料和前8种产品，避免图表过于拥挤
-        top_materials = material_product_sales.groupby('物料名称')['销售总额'].sum().nlargest(8).index
-        top_products = material_product_sales.groupby('产品名称')['销售总额'].sum().nlargest(8).index
+        top_materials = material_product_sales.groupby('物料名称', observed=True)[
+            '销售总额'].sum().nlargest(8).index
+        top_products = material_product_sales.groupby('产品名称', observed=True)[
+            '销售总额'].sum().nlargest(8).index
 
         # 筛选数据
         filtered_pivot = pivot_data.loc[pivot_data.index.isin(top_materials), pivot_data.columns.isin(top_products)]
@@ -1984,33 +1913,10 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_best_material_combinations(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        # 合并物料和销售数据
-        material_sales_link = pd.merge(
-            filtered_material[['发运月份', '客户代码', '物料代码', '物料名称']],
-            filtered_sales[['发运月份', '客户代码', '销售总额']],
-            on=['发运月份', '客户代码'],
-            how='inner'
-        )
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
 
-        # 创建物料组合
-        material_combinations = material_sales_link.groupby(['客户代码', '发运月份']).agg({
-            '物料名称': lambda x: ' + '.join(sorted(set(x))),
-            '销售总额': 'mean'  # 使用平均值，因为每个客户-月份组合只有一个销售总额
-        }).reset_index()
-
-        # 分析物料组合表现
-        combo_performance = material_combinations.groupby('物料名称').agg({
-            '销售总额': ['mean', 'count']
-        }).reset_index()
-
-        combo_performance.columns = ['物料组合', '平均销售额', '使用次数']
-
-        # 筛选使用次数>1的组合，并按平均销售额排序
-        top_combos = combo_performance[combo_performance['使用次数'] > 1].sort_values('平均销售额',
-                                                                                      ascending=False).head(10)
+        # 使用次数>1的物料组合中平均销售额最高的10个
+        top_combos = analytics.top_combinations(spec, min_uses=2, n=10)
 
         # 创建现代化的横向条形图
         fig = px.bar(
@@ -2103,19 +2009,9 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_distributor_efficiency(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        distributor_material = filtered_material.groupby('经销商名称').agg({
-            '物料数量': 'sum'
-        }).reset_index()
-
-        distributor_sales = filtered_sales.groupby('经销商名称').agg({
-            '销售总额': 'sum',
-            '求和项:数量（箱）': 'sum'
-        }).reset_index()
-
-        distributor_efficiency = pd.merge(distributor_material, distributor_sales, on='经销商名称', how='inner')
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        distributor_efficiency = analytics.metrics('经销商名称', ['物料数量'], ['销售总额', '求和项:数量（箱）'], spec,
+                                                   how='inner')
         distributor_efficiency['销售效率'] = distributor_efficiency['销售总额'] / distributor_efficiency['物料数量']
 
         # 选择前10名
@@ -2215,10 +2111,12 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_distributor_material_usage(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        filtered_material = analytics.select('material', spec)
 
         # 获取数量最多的物料类型
-        top_materials = filtered_material.groupby('物料名称')['物料数量'].sum().nlargest(5).index.tolist()
+        top_materials = filtered_material.groupby('物料名称', observed=True)[
+            '物料数量'].sum().nlargest(5).index.tolist()
 
         # 筛选数据
         filtered_for_chart = filtered_material[filtered_material['物料名称'].isin(top_materials)]
@@ -2229,7 +2127,8 @@ def create_dashboard(df_material, df_sales, aggregations):
             values='物料数量',
             index='经销商名称',
             columns='物料名称',
-            fill_value=0
+            fill_value=0,
+            observed=True
         ).reset_index()
 
         # 选择前10名经销商 - 按总物料使用量
@@ -2331,19 +2230,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_region_cost_sales_analysis(start_date, end_date):
-        filtered_material = filter_date_data(df_material, start_date, end_date)
-        filtered_sales = filter_date_data(df_sales, start_date, end_date)
-
-        region_material = filtered_material.groupby('所属区域').agg({
-            '物料总成本': 'sum'
-        }).reset_index()
-
-        region_sales = filtered_sales.groupby('所属区域').agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        region_cost_sales = pd.merge(region_material, region_sales, on='所属区域', how='outer')
-        region_cost_sales['费比'] = (region_cost_sales['物料总成本'] / region_cost_sales['销售总额']) * 100
+        spec = FilterSpec.of(start_date=start_date, end_date=end_date)
+        region_cost_sales = analytics.cost_sales_ratio('所属区域', spec)
 
         # 添加辅助列以便于绘制散点图
         region_cost_sales['销售额百分比'] = region_cost_sales['销售总额'] / region_cost_sales['销售总额'].sum() * 100
@@ -2493,20 +2381,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_salesperson_cost_sales_analysis(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        salesperson_material = filtered_material.groupby('申请人').agg({
-            '物料总成本': 'sum'
-        }).reset_index()
-
-        salesperson_sales = filtered_sales.groupby('申请人').agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        salesperson_cost_sales = pd.merge(salesperson_material, salesperson_sales, on='申请人', how='outer')
-        salesperson_cost_sales['费比'] = (salesperson_cost_sales['物料总成本'] / salesperson_cost_sales[
-            '销售总额']) * 100
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        salesperson_cost_sales = analytics.cost_sales_ratio('申请人', spec)
 
         # 处理可能的无穷大值
         salesperson_cost_sales.replace([np.inf, -np.inf], np.nan, inplace=True)
@@ -2633,21 +2509,8 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_distributor_cost_sales_analysis(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        distributor_material = filtered_material.groupby(['经销商名称', '所属区域']).agg({
-            '物料总成本': 'sum'
-        }).reset_index()
-
-        distributor_sales = filtered_sales.groupby(['经销商名称', '所属区域']).agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        distributor_cost_sales = pd.merge(distributor_material, distributor_sales, on=['经销商名称', '所属区域'],
-                                          how='outer')
-        distributor_cost_sales['费比'] = (distributor_cost_sales['物料总成本'] / distributor_cost_sales[
-            '销售总额']) * 100
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        distributor_cost_sales = analytics.cost_sales_ratio(['经销商名称', '所属区域'], spec)
 
         # 处理可能的无穷大值和异常值
         distributor_cost_sales.replace([np.inf, -np.inf], np.nan, inplace=True)
@@ -2784,8 +2647,9 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_cost_sales_anomalies(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+        filtered_material = analytics.cells('material', spec)
+        filtered_sales = analytics.cells('sales', spec)
 
         # 计算总体费比
         total_material_cost = filtered_material['物料总成本'].sum()
@@ -2793,17 +2657,7 @@ def create_dashboard(df_material, df_sales, aggregations):
         overall_cost_sales_ratio = (total_material_cost / total_sales) * 100
 
         # 按经销商计算费比
-        distributor_material = filtered_material.groupby('经销商名称').agg({
-            '物料总成本': 'sum'
-        }).reset_index()
-
-        distributor_sales = filtered_sales.groupby('经销商名称').agg({
-            '销售总额': 'sum'
-        }).reset_index()
-
-        distributor_cost_sales = pd.merge(distributor_material, distributor_sales, on='经销商名称', how='outer')
-        distributor_cost_sales['费比'] = (distributor_cost_sales['物料总成本'] / distributor_cost_sales[
-            '销售总额']) * 100
+        distributor_cost_sales = analytics.cost_sales_ratio('经销商名称', spec)
 
         # 处理可能的无穷大值
         distributor_cost_sales.replace([np.inf, -np.inf], np.nan, inplace=True)
@@ -2929,33 +2783,10 @@ def create_dashboard(df_material, df_sales, aggregations):
          Input("date-filter", "end_date")]
     )
     def update_material_roi_analysis(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        # 合并数据分析物料ROI
-        material_sales_link = pd.merge(
-            filtered_material[['发运月份', '客户代码', '物料代码', '物料名称', '物料数量', '物料总成本']],
-            filtered_sales[['发运月份', '客户代码', '销售总额']],
-            on=['发运月份', '客户代码'],
-            how='inner'
-        )
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
 
-        # 按物料类型分析ROI
-        material_roi = material_sales_link.groupby(['物料代码', '物料名称']).agg({
-            '物料数量': 'sum',
-            '物料总成本': 'sum',
-            '销售总额': 'sum'
-        }).reset_index()
-
-        material_roi['ROI'] = material_roi['销售总额'] / material_roi['物料总成本']
-
-        # 处理可能的无穷大值和异常值
-        material_roi.replace([np.inf, -np.inf], np.nan, inplace=True)
-        material_roi.dropna(subset=['ROI'], inplace=True)
-
-        # 剔除极端异常值，保留可视化效果
-        upper_limit = material_roi['ROI'].quantile(0.95)  # 只保留95%分位数以内的数据
-        material_roi = material_roi[material_roi['ROI'] <= upper_limit]
+        # 按物料类型分析ROI（已剔除无穷大值和95%分位数以上的极端值）
+        material_roi = analytics.material_roi(spec)
 
         # 筛选数据 - 只显示成本和销售额都大于一定阈值的物料
         min_cost = 1000  # 最小物料成本阈值
@@ -3079,63 +2910,22 @@ def create_dashboard(df_material, df_sales, aggregations):
         [Input("region-filter", "value"),
          Input("province-filter", "value"),
          Input("date-filter", "start_date"),
-         Input("date-filter", "end_date")]
+         Input("date-filter", "end_date"),
+         Input("allocation-budget", "value")]
     )
-    def update_optimal_material_allocation(selected_regions, selected_provinces, start_date, end_date):
-        filtered_material = filter_data(df_material, selected_regions, selected_provinces, start_date, end_date)
-        filtered_sales = filter_data(df_sales, selected_regions, selected_provinces, start_date, end_date)
-
-        # 合并数据分析物料ROI
-        material_sales_link = pd.merge(
-            filtered_material[['发运月份', '客户代码', '经销商名称', '物料代码', '物料名称', '物料数量', '物料总成本']],
-            filtered_sales[['发运月份', '客户代码', '经销商名称', '销售总额']],
-            on=['发运月份', '客户代码', '经销商名称'],
-            how='inner'
-        )
-
-        # 按物料类型分析ROI
-        material_roi = material_sales_link.groupby(['物料代码', '物料名称']).agg({
-            '物料数量': 'sum',
-            '物料总成本': 'sum',
-            '销售总额': 'sum'
-        }).reset_index()
-
-        material_roi['ROI'] = material_roi['销售总额'] / material_roi['物料总成本']
-
-        # 处理可能的无穷大值和异常值
-        material_roi.replace([np.inf, -np.inf], np.nan, inplace=True)
-        material_roi.dropna(subset=['ROI'], inplace=True)
-
-        # 剔除极端异常值，保留可视化效果
-        upper_limit = material_roi['ROI'].quantile(0.95)  # 只保留95%分位数以内的数据
-        material_roi = material_roi[material_roi['ROI'] <= upper_limit]
-
-        # 按客户分析物料效果
-        customer_material_effect = material_sales_link.groupby(['客户代码', '经销商名称', '物料代码', '物料名称']).agg({
-            '物料数量': 'sum',
-            '物料总成本': 'sum',
-            '销售总额': 'sum'
-        }).reset_index()
-
-        customer_material_effect['ROI'] = customer_material_effect['销售总额'] / customer_material_effect['物料总成本']
-
-        # 处理可能的无穷大值
-        customer_material_effect.replace([np.inf, -np.inf], np.nan, inplace=True)
-        customer_material_effect.dropna(subset=['ROI'], inplace=True)
-
-        # 筛选数据 - 只考虑物料成本大于一定阈值的记录
-        min_cost = 500  # 最小物料成本阈值
-        material_roi = material_roi[material_roi['物料总成本'] > min_cost]
-        customer_material_effect = customer_material_effect[customer_material_effect['物料总成本'] > min_cost]
-
-        # 分析高效和低效物料
-        high_roi_materials = material_roi.sort_values('ROI', ascending=False).head(5)
-        low_roi_materials = material_roi.sort_values('ROI').head(5)
-
-        # 计算整体ROI
-        total_material_cost = filtered_material['物料总成本'].sum()
-        total_sales = filtered_sales['销售总额'].sum()
-        overall_roi = total_sales / total_material_cost
+    def update_optimal_material_allocation(selected_regions, selected_provinces, start_date, end_date, budget=None):
+        spec = FilterSpec.of(selected_regions, selected_provinces, start_date=start_date, end_date=end_date)
+
+        # 物料ROI、客户-物料ROI（物料成本500元以上）、高效和低效物料以及整体ROI
+        allocation = analytics.allocation(spec, min_cost=500)
+        # 预算约束下的推荐分配方案（未填写预算时使用当前月均物料投入）
+        budget_plan = analytics.budget_allocation(spec, budget)
+        customer_material_effect = allocation['customer_material']
+        high_roi_materials = allocation['high_roi']
+        low_roi_materials = allocation['low_roi']
+        total_material_cost = allocation['total_material_cost']
+        total_sales = allocation['total_sales']
+        overall_roi = allocation['overall_roi']
 
         # 创建现代化的信息卡片布局
         # 1. 现状分析卡片
@@ -3153,7 +2943,42 @@ def create_dashboard(df_material, df_sales, aggregations):
                     className="mb-3",
                     style={"height": "20px"}
                 ),
-                html.P("通过优化物料分配，预估可将整体ROI提高15-20%，直接提升销售业绩。"),
+                html.P(f"按下方推荐方案分配物料预算，预计月销售额可提升{budget_plan['uplift_rate']:.1f}%。"),
+            ])
+        ], className="mb-3")
+
+        # 推荐分配方案卡片：预算、预计销售额和提升，以及预计销售额最高的组合
+        plan_table = budget_plan['plan'].head(10)
+        plan_card = dbc.Card([
+            dbc.CardHeader(html.H5("预算分配推荐方案", className="m-0")),
+            dbc.CardBody([
+                html.P([
+                    f"每月预算: ¥{budget_plan['budget']:,.2f} | 计划投入: ¥{budget_plan['planned_spend']:,.2f} | ",
+                    "预计月销售额: ",
+                    html.Strong(f"¥{budget_plan['expected_sales']:,.2f}"),
+                    f" (按现有投入结构: ¥{budget_plan['baseline_sales']:,.2f}，",
+                    html.Strong(f"提升 ¥{budget_plan['uplift']:,.2f} / {budget_plan['uplift_rate']:.1f}%",
+                                className="text-success" if budget_plan['uplift'] >= 0 else "text-danger"),
+                    ")"
+                ]),
+                dbc.Table([
+                    html.Thead(html.Tr([html.Th(column) for column in
+                                        ['经销商', '物料', '建议数量', '建议投入', '较现状变化', '预计销售额']])),
+                    html.Tbody([
+                        html.Tr([
+                            html.Td(row['经销商名称']),
+                            html.Td(row['物料名称']),
+                            html.Td(f"{row['建议数量']:,}"),
+                            html.Td(f"¥{row['建议投入']:,.2f}"),
+                            html.Td(f"{row['投入变化']:+,.2f}",
+                                    className="text-success" if row['投入变化'] >= 0 else "text-danger"),
+                            html.Td(f"¥{row['预计销售额']:,.2f}")
+                        ])
+                        for _, row in plan_table.iterrows()
+                    ])
+                ], bordered=True, hover=True, size="sm", className="mb-2"),
+                html.Small(f"共{len(budget_plan['plan'])}个客户-物料组合获得投放。响应曲线由历史归因数据拟合（边际收益递减），"
+                           f"单个组合的投入不超过历史月均投入的{SPEND_CAP_MULTIPLE:g}倍。", className="text-muted")
             ])
         ], className="mb-3")
 
@@ -3249,7 +3074,7 @@ def create_dashboard(df_material, df_sales, aggregations):
                     dbc.ListGroup([
                         dbc.ListGroupItem([
                             html.Strong("投资重分配: "),
-                            "将物料预算从低ROI物料重新分配到高ROI物料，预计可提高整体ROI 15-20%"
+                            f"按推荐方案将物料预算从低ROI物料重新分配到高ROI物料，预计可提升月销售额{budget_plan['uplift_rate']:.1f}%"
                         ]),
                         dbc.ListGroupItem([
                             html.Strong("客户定制策略: "),
@@ -3290,6 +3115,7 @@ def create_dashboard(df_material, df_sales, aggregations):
         return [
             html.H5("最优物料分配策略", className="mb-3 text-primary"),
             status_card,
+            plan_card,
             dbc.Row([
                 dbc.Col(high_roi_card, width=6),
                 dbc.Col(low_roi_card, width=6)
@@ -3297,32 +3123,6 @@ def create_dashboard(df_material, df_sales, aggregations):
             optimization_card
         ]
 
-    # 辅助函数：按区域、省份和日期筛选数据
-    def filter_data(df, regions=None, provinces=None, start_date=None, end_date=None):
-        filtered_df = df.copy()
-
-        if regions and len(regions) > 0:
-            filtered_df = filtered_df[filtered_df['所属区域'].isin(regions)]
-
-        if provinces and len(provinces) > 0:
-            filtered_df = filtered_df[filtered_df['省份'].isin(provinces)]
-
-        if start_date and end_date:
-            filtered_df = filtered_df[(filtered_df['发运月份'] >= pd.to_datetime(start_date)) &
-                                      (filtered_df['发运月份'] <= pd.to_datetime(end_date))]
-
-        return filtered_df
-
-    # 辅助函数：只按日期筛选数据
-    def filter_date_data(df, start_date=None, end_date=None):
-        filtered_df = df.copy()
-
-        if start_date and end_date:
-            filtered_df = filtered_df[(filtered_df['发运月份'] >= pd.to_datetime(start_date)) &
-                                      (filtered_df['发运月份'] <= pd.to_datetime(end_date))]
-
-        return filtered_df
-
     return app
 
 
@@ -3335,7 +3135,7 @@ def main():
     aggregations = create_aggregations(df_material, df_sales)
 
     # 创建仪表盘
-    app = create_dashboard(df_material, df_sales, aggregations)
+    app = create_dashboard(df_material, df_sales, aggregations, df_material_price)
 
     # 运行仪表盘
     app.run_server(debug=True)